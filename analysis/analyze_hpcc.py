@@ -1,13 +1,42 @@
 #!/usr/bin/env python3
 
+import argparse
+import numbers
+import os
 import re
 import sys
-import pandas as pd
-import matplotlib.pyplot as plt
-import numpy as np
+from hpcc_parser import parse_hpcc_summary, legacy_metrics
+
+# pandas, NumPy, matplotlib, the build cache and the HTML report are imported
+# by the functions that need them, so parsing and plain comparisons start fast
+
+# Bump when parsing changes so cached parse results are invalidated
+PARSER_VERSION = 1
+
+# Bump when compare_platforms or comparison_stats change so cached comparisons are recomputed
+COMPARE_VERSION = 1
+
+# The pair every night compares; other platforms (bare metal, gVisor, Kata, ...)
+# follow them in the order they are found
+DEFAULT_PLATFORMS = ('VM', 'Container')
+
+# Chart colours of the usual platforms; the rest take matplotlib's cycle
+PLATFORM_COLORS = {'VM': 'blue', 'Container': 'red'}
 
 def parse_hpcc_results(file_path):
     """Parse HPCC results file and extract key metrics"""
+    # hpccoutf.txt carries a key=value summary block; use the last complete one
+    sections = parse_hpcc_summary(file_path)
+    if sections:
+        results = legacy_metrics(sections[-1])
+        if results:
+            return results
+    
+    # Plain stdout captures have no summary block
+    return parse_hpcc_results_regex(file_path)
+
+def parse_hpcc_results_regex(file_path):
+    """Parse HPCC stdout with the legacy regexes (first match of each metric)"""
     with open(file_path, 'r') as f:
         content = f.read()
     
@@ -43,8 +72,17 @@ def parse_hpcc_results(file_path):
     
     return results
 
-def compare_results(vm_results, container_results):
-    """Compare VM and container results and calculate differences"""
+def compare_results(vm_results, container_results, seed=None, platforms=DEFAULT_PLATFORMS):
+    """Compare VM and container results and calculate differences
+    
+    Values may be single numbers or lists of repeated runs. With repeated
+    runs every metric also gets a bootstrap CI of the difference and a
+    Mann-Whitney p-value, computed for all metrics in one batch. platforms
+    names the two sides; the difference is the second relative to the first.
+    """
+    if any(not isinstance(v, numbers.Number) for v in vm_results.values()):
+        return compare_samples_results(vm_results, container_results, seed, platforms)
+    
     comparison = {}
     
     for key in vm_results:
@@ -53,229 +91,311 @@ def compare_results(vm_results, container_results):
             container_val = container_results[key]
             diff_pct = (container_val - vm_val) / vm_val * 100
             comparison[key] = {
-                'VM': vm_val,
-                'Container': container_val,
+                platforms[0]: vm_val,
+                platforms[1]: container_val,
                 'Difference (%)': diff_pct
             }
     
     return comparison
 
-def create_comparison_chart(comparison, output_file):
-    """Create a bar chart comparing VM and container performance"""
-    metrics = list(comparison.keys())
-    vm_values = [comparison[m]['VM'] for m in metrics]
-    container_values = [comparison[m]['Container'] for m in metrics]
+def compare_samples_results(vm_samples, container_samples, seed=None, platforms=DEFAULT_PLATFORMS):
+    """Compare repeated VM and container runs with bootstrap CIs and significance tests"""
+    from comparison_stats import compare_samples
+    
+    stats = compare_samples(vm_samples, container_samples, seed=seed)
+    comparison = {}
+    for key, s in stats.items():
+        comparison[key] = {
+            platforms[0]: s['baseline_mean'],
+            platforms[1]: s['other_mean'],
+            'Difference (%)': s['diff_pct'],
+            'CI Low (%)': s['ci_low'],
+            'CI High (%)': s['ci_high'],
+            'p-value': s['p_value'],
+            'Runs': f"{s['baseline_n']}/{s['other_n']}",
+            'Significant': s['significant'],
+        }
+    return comparison
+
+def order_platforms(names):
+    """VM and container first, as the baseline pair, then the others as found"""
+    names = list(dict.fromkeys(names))
+    return [p for p in DEFAULT_PLATFORMS if p in names] + [p for p in names if p not in DEFAULT_PLATFORMS]
+
+def compare_platforms(results, seed=None):
+    """Compare any number of platforms: results is {platform: {metric: value or [values]}}
+    
+    Two platforms give the comparison of compare_results, the second relative
+    to the first. With more, every pair of platforms is compared for every
+    metric in one batch (comparison_stats.compare_matrix), and each metric's
+    row holds every platform's mean, the best platform and its margin over
+    the runner-up. Returns (comparison, matrix); matrix is None for two
+    platforms.
+    """
+    platforms = list(results)
+    if len(platforms) <= 2:
+        if len(platforms) < 2:
+            return {}, None
+        return compare_results(results[platforms[0]], results[platforms[1]], seed, platforms), None
+    
+    from comparison_stats import compare_matrix
+    
+    # Single runs become one-sample lists so every platform goes through the same batch
+    samples = {p: {m: v if not isinstance(v, numbers.Number) else [v] for m, v in r.items()}
+               for p, r in results.items()}
+    matrix = compare_matrix(samples, seed=seed)
+    return ranked_comparison(matrix), matrix
+
+def ranked_comparison(matrix):
+    """Per-metric rows of an N-way matrix: every mean, the best platform and its margin
     
-    # Create figure and axis
-    fig, ax = plt.subplots(figsize=(12, 8))
+    The margin is how much better the best platform is than the runner-up,
+    in percent of the runner-up, so it is positive whether higher or lower
+    values are better. With repeated runs it comes with a bootstrap CI and
+    the Mann-Whitney p-value of that pair.
+    """
+    from comparison_stats import rank_platforms
+    from regression import lower_is_better
     
-    # Set width of bars
-    bar_width = 0.35
+    platforms, means, counts = matrix['platforms'], matrix['means'], matrix['counts']
+    lower = [lower_is_better(m) for m in matrix['metrics']]
+    order = rank_platforms(means, lower)
+    comparison = {}
+    for k, metric in enumerate(matrix['metrics']):
+        best, runner_up = order[k][0], order[k][1]
+        row = {p: float(means[i, k]) for i, p in enumerate(platforms)}
+        sign = -1 if lower[k] else 1
+        low, high = sorted([sign * matrix['ci_low'][runner_up, best, k], sign * matrix['ci_high'][runner_up, best, k]])
+        row['Best'] = platforms[best]
+        row['Margin (%)'] = float(sign * matrix['diff_pct'][runner_up, best, k])
+        if counts[best, k] > 1 and counts[runner_up, k] > 1:
+            row.update({
+                'CI Low (%)': float(low),
+                'CI High (%)': float(high),
+                'p-value': float(matrix['p_value'][runner_up, best, k]),
+                'Significant': bool(matrix['significant'][runner_up, best, k]),
+            })
+        row['Runs'] = '/'.join(str(int(n)) for n in counts[:, k])
+        comparison[metric] = row
+    return comparison
+
+def pairwise_rows(matrix):
+    """Long-format rows (metric, baseline, platform, ratio, difference, CI, p, significant) of every pair"""
+    platforms = matrix['platforms']
+    rows = []
+    for k, metric in enumerate(matrix['metrics']):
+        for i, baseline in enumerate(platforms):
+            for j, platform in enumerate(platforms):
+                if i != j:
+                    rows.append((metric, baseline, platform, float(matrix['ratio'][i, j, k]),
+                                 float(matrix['diff_pct'][i, j, k]), float(matrix['ci_low'][i, j, k]),
+                                 float(matrix['ci_high'][i, j, k]), float(matrix['p_value'][i, j, k]),
+                                 bool(matrix['significant'][i, j, k])))
+    return rows
+
+PAIRWISE_COLUMNS = ['metric', 'baseline', 'platform', 'ratio', 'difference_pct', 'ci_low_pct', 'ci_high_pct',
+                    'p_value', 'significant']
+
+def comparison_platforms(comparison):
+    """Platform columns of a comparison, in order"""
+    from html_report import STAT_COLUMNS
     
-    # Set position of bars on x axis
-    r1 = np.arange(len(metrics))
-    r2 = [x + bar_width for x in r1]
+    first = next(iter(comparison.values()), {})
+    return [c for c in first if c not in STAT_COLUMNS]
+
+def create_comparison_chart(comparison, output_file):
+    """Create a bar chart comparing the platforms' performance"""
+    from render import figure_job, render_all
     
-    # Create bars
-    ax.bar(r1, vm_values, width=bar_width, label='VM', color='blue', alpha=0.7)
-    ax.bar(r2, container_values, width=bar_width, label='Container', color='red', alpha=0.7)
+    metrics = list(comparison.keys())
+    platforms = comparison_platforms(comparison)
+    job = figure_job('grouped_bar', output_file, {
+        'metrics': metrics,
+        'series': {p: [comparison[m][p] for m in metrics] for p in platforms},
+    }, {
+        'figsize': (12, 8),
+        'colors': PLATFORM_COLORS,
+        'title': 'HPC Performance Comparison: ' + ' vs '.join(platforms),
+        'bbox_inches': None,
+    })
+    
+    # Skipped when the data and style are unchanged since the last render
+    render_all([job])
+
+def create_heatmap_chart(matrix, output_file):
+    """Heatmap of every platform's mean as a percentage of the best platform's, per metric"""
+    import numpy as np
+    from regression import lower_is_better
+    from render import figure_job, render_all
+    
+    means = matrix['means']
+    lower = np.array([lower_is_better(m) for m in matrix['metrics']])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        best_high = np.nanmax(np.where(np.isnan(means), -np.inf, means), axis=0)
+        best_low = np.nanmin(np.where(np.isnan(means), np.inf, means), axis=0)
+        pct_of_best = np.where(lower[None, :], best_low / means, means / best_high) * 100
+    metrics, platforms = matrix['metrics'], matrix['platforms']
+    job = figure_job('heatmap', output_file, {
+        'z': pct_of_best.T,
+        'x_labels': platforms,
+        'y_labels': metrics,
+    }, {
+        # About a quarter inch per metric, so 200 metrics stay legible
+        'figsize': (max(8, len(platforms) * 0.9), min(max(6, len(metrics) * 0.25), 60)),
+        'dpi': 100,
+        'cmap': 'RdYlGn',
+        'title': 'Performance Relative to the Best Platform',
+        'colorbar_label': '% of best',
+        'xrotation': 45,
+    })
+    render_all([job])
+
+def create_html_report(comparison, output_file, runs=(), regressions=None, matrix=None, roofline=False):
+    """Create an HTML report with the comparison results
     
-    # Add labels and title
-    ax.set_xlabel('Metrics')
-    ax.set_ylabel('Performance')
-    ax.set_title('HPC Performance Comparison: VM vs Container')
-    ax.set_xticks([r + bar_width/2 for r in range(len(metrics))])
-    ax.set_xticklabels(metrics, rotation=45, ha='right')
+    Writes an index page with the summary embedded once as JSON, plus one or
+    more pages per benchmark that list the individual runs. With an N-way
+    matrix the benchmark pages also get each metric's pairwise differences.
+    Returns the paths of all written pages.
+    """
+    from html_report import write_report
+    
+    platforms = comparison_platforms(comparison) or list(DEFAULT_PLATFORMS)
+    charts = ['hpcc_comparison.png'] + (['hpcc_heatmap.png'] if matrix is not None else [])
+    charts += ['hpcc_roofline.png'] if roofline else []
+    return write_report(comparison, output_file, runs=runs, charts=charts, platforms=platforms,
+                        title='HPC Performance Comparison: ' + ' vs '.join(platforms),
+                        regressions=regressions, matrix=matrix)
+
+def parse_args(argv):
+    """Parse command line arguments"""
+    from build_cache import DEFAULT_CACHE_DIR
+    
+    parser = argparse.ArgumentParser(
+        description="Compare HPCC results between VMs, containers and other platforms",
+        usage="python analyze_hpcc.py <vm_results_file> <container_results_file>\n"
+              "       python analyze_hpcc.py <file> [<file> ...] --platforms VM,Container,Kata,...\n"
+              "       python analyze_hpcc.py --bulk <dir|glob> [<dir|glob> ...] [--workers N]")
+    parser.add_argument('inputs', nargs='+',
+                        help="one result file per platform, or directories/globs with --bulk")
+    parser.add_argument('--platforms', default=','.join(DEFAULT_PLATFORMS),
+                        help="comma separated platform of each result file (default: %(default)s); "
+                             "with --bulk the platforms come from the file names")
+    parser.add_argument('--bulk', action='store_true',
+                        help="ingest many runs per platform in parallel and compare them statistically")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="worker processes for --bulk (default: all cores)")
+    parser.add_argument('--store', default=None,
+                        help="results store directory to append the parsed runs to")
+    parser.add_argument('--host', default='',
+                        help="host name recorded with the runs in the results store")
+    parser.add_argument('--cache', default=DEFAULT_CACHE_DIR,
+                        help="build cache directory (default: %(default)s)")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="recompute every stage from scratch")
+    parser.add_argument('--baselines', default=None,
+                        help="regression baselines file; the runs are checked against it and added to it")
+    parser.add_argument('--cpuinfo', default=None,
+                        help="comma separated /proc/cpuinfo copy of each platform, or one for all; "
+                             "adds HPL efficiency and the rooflines (see roofline.py)")
+    args = parser.parse_args(argv)
+    args.platforms = [p for p in args.platforms.split(',') if p]
+    args.cpuinfo = [p for p in args.cpuinfo.split(',') if p] if args.cpuinfo else None
+    if args.cpuinfo and args.bulk:
+        parser.error("--cpuinfo needs one result file per platform, not --bulk")
+    if args.cpuinfo and len(args.cpuinfo) not in (1, len(args.platforms)):
+        parser.error("expected one cpuinfo file, or one per platform")
+    if not args.bulk and len(args.inputs) != len(args.platforms):
+        parser.error(f"expected one result file per platform ({', '.join(args.platforms)})")
+    if not args.bulk and len(set(args.platforms)) < 2:
+        parser.error("expected at least two different platforms")
+    return args
+
+def parse_cached(file_path, cache=None):
+    """parse_hpcc_results, reusing the cached result while the file is unchanged"""
+    if cache is None:
+        return parse_hpcc_results(file_path)
+    return cache.get_or_compute('parse_hpcc', lambda: parse_hpcc_results(file_path),
+                                inputs=[file_path], params=PARSER_VERSION)
+
+def load_bulk(patterns, workers=None, cache=None):
+    """Ingest every matching result file; returns (runs, {platform: {metric: [values]}})"""
+    from bulk_ingest import expand_inputs, format_stats, ingest, platform_samples
     
-    # Add legend
-    ax.legend()
+    paths = expand_inputs(patterns)
+    if not paths:
+        print("No result files matched: " + " ".join(patterns))
+        sys.exit(1)
     
-    # Add grid
-    ax.grid(True, linestyle='--', alpha=0.7)
+    runs, stats = ingest(paths, workers, cache)
+    print(format_stats(stats))
     
-    # Adjust layout
-    plt.tight_layout()
+    # Keep every run, not just the per-platform means
+    runs.to_csv('hpcc_runs.csv', index=False)
     
-    # Save figure
-    plt.savefig(output_file, dpi=300)
-    plt.close()
+    samples = platform_samples(runs)
+    return runs, {p: samples[p] for p in order_platforms(samples)}
 
-def create_html_report(comparison, output_file):
-    """Create an HTML report with the comparison results"""
-    html_content = """
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <title>HPC Performance Comparison: VMs vs Containers</title>
-        <style>
-            body {
-                font-family: Arial, sans-serif;
-                margin: 20px;
-                line-height: 1.6;
-            }
-            h1 {
-                color: #333;
-                text-align: center;
-            }
-            h2 {
-                color: #444;
-                margin-top: 30px;
-            }
-            table {
-                width: 100%;
-                border-collapse: collapse;
-                margin: 20px 0;
-            }
-            th, td {
-                border: 1px solid #ddd;
-                padding: 8px;
-                text-align: right;
-            }
-            th {
-                background-color: #f2f2f2;
-                text-align: center;
-            }
-            tr:nth-child(even) {
-                background-color: #f9f9f9;
-            }
-            .chart-container {
-                max-width: 800px;
-                margin: 30px auto;
-                box-shadow: 0 4px 8px rgba(0,0,0,0.1);
-                border-radius: 5px;
-                padding: 10px;
-                background: white;
-            }
-            .chart-container img {
-                width: 100%;
-                height: auto;
-            }
-            .positive {
-                color: green;
-            }
-            .negative {
-                color: red;
-            }
-        </style>
-    </head>
-    <body>
-        <h1>HPC Performance Comparison: VMs vs Containers</h1>
-        
-        <h2>Performance Metrics Comparison</h2>
-        
-        <table>
-            <tr>
-                <th>Benchmark</th>
-                <th>Metric</th>
-                <th>VM Performance</th>
-                <th>Container Performance</th>
-                <th>Difference (%)</th>
-            </tr>
-    """
+def store_runs(store_dir, runs, host=''):
+    """Append parsed runs (columns file, platform, metric, value) to the results store"""
+    from results_store import ResultsStore
+    
+    # The file modification time is the closest thing to a run timestamp
+    mtimes = {path: os.path.getmtime(path) for path in runs['file'].unique()}
+    records = [{'platform': platform, 'host': host, 'benchmark': 'HPCC',
+                'metric': metric, 'value': value, 'timestamp': mtimes[path]}
+               for path, platform, metric, value in runs[['file', 'platform', 'metric', 'value']].itertuples(index=False)]
+    count = ResultsStore(store_dir).append(records)
+    print(f"Appended {count} results to {store_dir}")
+
+def detect_regressions(baselines, runs):
+    """Feed parsed runs to the regression detector; returns the open regressions"""
+    from regression import RegressionDetector, format_event, write_regressions
+    
+    detector = RegressionDetector(baselines)
+    mtimes = {path: os.path.getmtime(path) for path in runs['file'].unique()}
+    records = [{'platform': platform, 'benchmark': 'HPCC', 'metric': metric, 'value': value,
+                'timestamp': mtimes[path]}
+               for path, platform, metric, value in runs[['file', 'platform', 'metric', 'value']].itertuples(index=False)]
+    for event in detector.feed(records):
+        print(format_event(event))
+    detector.save()
+    write_regressions('hpcc_regressions.json', detector)
+    return detector.regressions()
+
+def main(argv=None):
+    import pandas as pd
     
-    # Add rows for each metric
-    for metric, values in comparison.items():
-        vm_val = values['VM']
-        container_val = values['Container']
-        diff_pct = values['Difference (%)']
-        
-        # Determine if difference is positive or negative
-        diff_class = "positive" if diff_pct > 0 else "negative"
-        
-        # Extract benchmark and metric name
-        parts = metric.split('_')
-        benchmark = parts[0]
-        metric_name = '_'.join(parts[1:])
-        
-        html_content += f"""
-            <tr>
-                <td>{benchmark}</td>
-                <td>{metric_name}</td>
-                <td>{vm_val:.2f}</td>
-                <td>{container_val:.2f}</td>
-                <td class="{diff_class}">{diff_pct:.2f}%</td>
-            </tr>
-        """
-    
-    html_content += """
-        </table>
-        
-        <h2>Performance Comparison Chart</h2>
-        
-        <div class="chart-container">
-            <img src="hpcc_comparison.png" alt="HPC Performance Comparison Chart">
-        </div>
-        
-        <h2>Analysis</h2>
-        
-        <p>
-            This comparison shows the performance differences between Virtual Machines (VMs) and Containers
-            for High-Performance Computing (HPC) workloads using the HPC Challenge benchmark suite.
-        </p>
-        
-        <p>
-            <strong>Key observations:</strong>
-        </p>
-        
-        <ul>
-    """
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    from build_cache import BuildCache
     
-    # Add observations based on the results
-    better_in_container = []
-    better_in_vm = []
-    
-    for metric, values in comparison.items():
-        diff_pct = values['Difference (%)']
-        if diff_pct > 5:  # Container is significantly better
-            better_in_container.append(f"{metric} ({diff_pct:.2f}% better)")
-        elif diff_pct < -5:  # VM is significantly better
-            better_in_vm.append(f"{metric} ({-diff_pct:.2f}% better)")
-    
-    if better_in_container:
-        html_content += "            <li>Containers performed better in: " + ", ".join(better_in_container) + "</li>\n"
-    
-    if better_in_vm:
-        html_content += "            <li>VMs performed better in: " + ", ".join(better_in_vm) + "</li>\n"
-    
-    # Add overall conclusion
-    avg_diff = sum(values['Difference (%)'] for values in comparison.values()) / len(comparison)
-    if avg_diff > 5:
-        conclusion = "Overall, containers show better performance for HPC workloads."
-    elif avg_diff < -5:
-        conclusion = "Overall, VMs show better performance for HPC workloads."
-    else:
-        conclusion = "Overall, the performance difference between containers and VMs is minimal for HPC workloads."
-    
-    html_content += f"""
-            <li>{conclusion}</li>
-        </ul>
-        
-        <p>
-            The results indicate that the choice between VMs and containers for HPC workloads should be based on
-            specific requirements and the particular benchmarks that are most relevant to the intended application.
-        </p>
-    </body>
-    </html>
-    """
+    cache = None if args.no_cache else BuildCache(args.cache)
     
-    # Write the HTML file
-    with open(output_file, 'w') as f:
-        f.write(html_content)
-
-def main():
-    if len(sys.argv) < 3:
-        print("Usage: python analyze_hpcc.py <vm_results_file> <container_results_file>")
-        sys.exit(1)
+    # Parse results
+    if args.bulk:
+        runs, results = load_bulk(args.inputs, args.workers, cache)
+    else:
+        results = {p: parse_cached(path, cache) for p, path in zip(args.platforms, args.inputs)}
+        runs = pd.DataFrame(
+            [(path, p, m, v) for p, path in zip(args.platforms, args.inputs) for m, v in results[p].items()],
+            columns=['file', 'platform', 'metric', 'value'])
     
-    vm_results_file = sys.argv[1]
-    container_results_file = sys.argv[2]
+    # Record the runs so history survives the per-invocation CSV
+    if args.store:
+        store_runs(args.store, runs, args.host)
     
-    # Parse results
-    vm_results = parse_hpcc_results(vm_results_file)
-    container_results = parse_hpcc_results(container_results_file)
+    # Check the new runs against every earlier one, not just tonight's other platform
+    regressions = detect_regressions(args.baselines, runs) if args.baselines else None
     
-    # Compare results
-    comparison = compare_results(vm_results, container_results)
+    # Compare results; a fixed seed keeps cached and recomputed bootstraps identical
+    if cache is None:
+        comparison, matrix = compare_platforms(results, seed=0)
+    else:
+        comparison, matrix = cache.get_or_compute(
+            'compare', lambda: compare_platforms(results, seed=0), params=[COMPARE_VERSION, results])
+    if not comparison:
+        print("Need results of at least two platforms, found: " + ", ".join(results))
+        sys.exit(1)
     
     # Create comparison table
     df = pd.DataFrame(comparison).T
@@ -283,14 +403,52 @@ def main():
     
     # Save comparison table to CSV
     df.to_csv('hpcc_comparison.csv')
+    outputs = ['hpcc_comparison.csv', 'hpcc_comparison.png']
     
-    # Create comparison chart
+    # Create comparison chart (skipped by the renderer when unchanged)
     create_comparison_chart(comparison, 'hpcc_comparison.png')
     
-    # Create HTML report
-    create_html_report(comparison, 'hpcc_comparison.html')
-    
-    print("Results saved to hpcc_comparison.csv, hpcc_comparison.png, and hpcc_comparison.html")
+    # Every pair of platforms, and how far each falls behind the best one
+    if matrix is not None:
+        print("Best platform per metric: " + ", ".join(
+            f"{p} {sum(row['Best'] == p for row in comparison.values())}" for p in matrix['platforms']))
+        pd.DataFrame(pairwise_rows(matrix), columns=PAIRWISE_COLUMNS).to_csv('hpcc_pairwise.csv', index=False)
+        create_heatmap_chart(matrix, 'hpcc_heatmap.png')
+        outputs += ['hpcc_pairwise.csv', 'hpcc_heatmap.png']
+    
+    # Efficiency against theoretical peak, and whether compute or memory explains the differences
+    rooflines = None
+    if args.cpuinfo:
+        from roofline import (ROOFLINE_COLUMNS, attribute_overhead, build_rooflines, create_roofline_chart,
+                              format_attribution, roofline_rows)
+        try:
+            rooflines = build_rooflines(args.inputs, args.platforms, args.cpuinfo)
+        except (KeyError, ValueError) as e:
+            print(f"Skipping the rooflines: {e}")
+    if rooflines:
+        roofline_df = pd.DataFrame(roofline_rows(rooflines), columns=ROOFLINE_COLUMNS)
+        print(roofline_df.to_string(index=False))
+        for other in rooflines[1:]:
+            print(format_attribution(attribute_overhead(rooflines[0], other)))
+        roofline_df.to_csv('hpcc_roofline.csv', index=False)
+        create_roofline_chart(rooflines, 'hpcc_roofline.png')
+        outputs += ['hpcc_roofline.csv', 'hpcc_roofline.png']
+    roofline = bool(rooflines)
+    
+    # Create HTML report, streaming every run onto the per-benchmark pages
+    run_rows = runs[['file', 'platform', 'metric', 'value']].itertuples(index=False, name=None)
+    if cache is None:
+        create_html_report(comparison, 'hpcc_comparison.html', run_rows, regressions, matrix, roofline)
+    else:
+        from html_report import REPORT_VERSION
+        cache.materialize('html_report', 'hpcc_comparison.html',
+                          lambda out: create_html_report(comparison, out, run_rows, regressions, matrix, roofline),
+                          inputs=sorted(runs['file'].unique()),
+                          params=[REPORT_VERSION, comparison, regressions, matrix, roofline])
+        cache.save()
+        print(cache.summary())
+    
+    print(f"Results saved to {', '.join(outputs)} and hpcc_comparison*.html")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,414 @@
+#!/usr/bin/env python3
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import namedtuple
+
+import synth_corpus
+
+# One timed step of the nightly analysis. setup(context) returns the arguments
+# for run, untimed; context holds the corpus paths, a scratch directory and the
+# outputs of earlier setups so each stage starts from the previous one's results.
+Benchmark = namedtuple('Benchmark', ['name', 'stage', 'setup', 'run'])
+
+STAGES = ('startup', 'parse', 'compare', 'render', 'html')
+
+DEFAULT_SCALES = [10, 1000]
+
+# Timed calls per benchmark; the fastest is kept as the least disturbed by noise
+REPEAT = 5
+
+# A benchmark is flagged when it is this much slower (or uses this much more
+# memory) than its baseline, and by more than the absolute floor, so that
+# millisecond jitter on tiny inputs is not reported. Its fastest call must also
+# be slower than the slowest call of the baseline: a busy machine slows some
+# calls down, a slower implementation slows them all.
+SLOWDOWN = 1.25
+MIN_SLOWDOWN_SECONDS = 0.005
+MEMORY_GROWTH = 1.25
+MIN_MEMORY_GROWTH_MB = 1.0
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench_baseline.json')
+
+# Size of the N-way platform comparison; runs per platform follow the corpus, up to 50
+MATRIX_PLATFORMS = 10
+MATRIX_METRICS = 200
+
+CLOUDPERF = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cloudperf.py')
+
+# `cloudperf parse --json` must not import these, and its imports must take
+# at most STARTUP_IMPORT_BUDGET seconds as reported by python -X importtime
+HEAVY_MODULES = ('numpy', 'pandas', 'matplotlib', 'plotly', 'scipy')
+STARTUP_IMPORT_BUDGET = 0.075
+
+
+# ----- setups and runs -----
+
+def run_command(argv):
+    subprocess.run(argv, check=True, stdout=subprocess.DEVNULL)
+
+
+def startup_parse_setup(context):
+    return ([sys.executable, CLOUDPERF, 'parse', '--json', context['paths']['hpcc'][0]],)
+
+
+def startup_compare_setup(context):
+    return ([sys.executable, CLOUDPERF, 'compare', '--json'] + context['paths']['hpcc'][:2],)
+
+
+def hpcc_runs(context):
+    """Parsed HPCC runs of the corpus, shared by the later HPCC stages"""
+    if 'hpcc_runs' not in context:
+        from bulk_ingest import ingest
+        context['hpcc_runs'], _ = ingest(context['paths']['hpcc'], workers=1)
+    return context['hpcc_runs']
+
+
+def hpcc_comparison(context):
+    if 'hpcc_comparison' not in context:
+        from analyze_hpcc import compare_results
+        from bulk_ingest import platform_samples
+        samples = platform_samples(hpcc_runs(context))
+        context['hpcc_comparison'] = compare_results(samples['VM'], samples['Container'], seed=0)
+    return context['hpcc_comparison']
+
+
+def iozone_reports(context):
+    if 'iozone_reports' not in context:
+        from iozone_parser import parse_iozone_report
+        context['iozone_reports'] = [parse_iozone_report(p) for p in context['paths']['iozone']]
+    return context['iozone_reports']
+
+
+def parse_hpcc_setup(context):
+    return (context['paths']['hpcc'],)
+
+
+def parse_hpcc(paths):
+    from bulk_ingest import ingest
+    return ingest(paths, workers=1)
+
+
+def parse_iozone_setup(context):
+    return (context['paths']['iozone'],)
+
+
+def parse_iozone(paths):
+    from iozone_parser import parse_iozone_report
+    return [parse_iozone_report(p) for p in paths]
+
+
+def parse_tools_setup(context):
+    return ([synth_corpus.tool_dir(context['directory'], t) for t in ('sysbench', 'stress_ng', 'iperf')],)
+
+
+def parse_tools(directories):
+    from tool_parsers import load_results
+    return load_results(directories)
+
+
+def compare_hpcc_setup(context):
+    from bulk_ingest import platform_samples
+    samples = platform_samples(hpcc_runs(context))
+    return samples['VM'], samples['Container']
+
+
+def compare_hpcc(vm_samples, container_samples):
+    from analyze_hpcc import compare_results
+    return compare_results(vm_samples, container_samples, seed=0)
+
+
+def compare_platforms_setup(context):
+    runs = max(2, min(len(context['paths']['hpcc']) // 2, 50))
+    rng = random.Random(0)
+    results = {f'platform{p}': {f'Metric_{m}': [rng.lognormvariate(p * 0.01, 0.05) for _ in range(runs)]
+                                for m in range(MATRIX_METRICS)}
+               for p in range(MATRIX_PLATFORMS)}
+    return (results,)
+
+
+def compare_platforms(results):
+    from analyze_hpcc import compare_platforms
+    return compare_platforms(results, seed=0)
+
+
+def iozone_boundaries_setup(context):
+    return ([surfaces for surfaces, _ in iozone_reports(context)],)
+
+
+def iozone_boundaries(reports):
+    from iozone_boundaries import find_boundaries
+    return [find_boundaries(surfaces) for surfaces in reports]
+
+
+def render_hpcc_chart_setup(context):
+    return hpcc_comparison(context), os.path.join(context['scratch'], 'hpcc_comparison.png')
+
+
+def render_hpcc_chart(comparison, output):
+    from analyze_hpcc import create_comparison_chart
+    from render import MANIFEST_NAME
+    # Without its manifest the renderer cannot skip the chart as unchanged
+    manifest = os.path.join(os.path.dirname(output), MANIFEST_NAME)
+    if os.path.exists(manifest):
+        os.remove(manifest)
+    with contextlib.redirect_stdout(io.StringIO()):
+        create_comparison_chart(comparison, output)
+
+
+def render_iozone_surface_setup(context):
+    from iozone_parser import align_surfaces
+    from render import figure_job
+    reports = iozone_reports(context)
+    file_sizes, record_sizes, values, _ = align_surfaces(reports[0][0]['Writer'], reports[-1][0]['Writer'])
+    job = figure_job('surface3d', os.path.join(context['scratch'], 'iozone_write_perf.png'),
+                     {'x_labels': record_sizes.tolist(), 'y_labels': file_sizes.tolist(), 'z': values},
+                     {'figsize': (12, 8), 'xlabel': 'Record Size (KB)', 'ylabel': 'File Size (KB)',
+                      'zlabel': 'Write Performance', 'cmap': 'viridis', 'title': 'IOZone Write Performance'})
+    return (job,)
+
+
+def render_iozone_surface(job):
+    from render import render_job
+    render_job(job)
+
+
+def html_report_setup(context):
+    runs = hpcc_runs(context)
+    rows = list(runs[['file', 'platform', 'metric', 'value']].itertuples(index=False, name=None))
+    return hpcc_comparison(context), os.path.join(context['scratch'], 'hpcc_comparison.html'), rows
+
+
+def html_report(comparison, output, rows):
+    from html_report import write_report
+    write_report(comparison, output, runs=iter(rows))
+
+
+def iozone_lod_setup(context):
+    runs = [(os.path.basename(p), surfaces, units)
+            for p, (surfaces, units) in zip(context['paths']['iozone'], iozone_reports(context))]
+    return runs, os.path.join(context['scratch'], 'iozone_surfaces.html')
+
+
+def iozone_lod(runs, output):
+    from iozone_lod import write_lod_report
+    write_lod_report(runs, output)
+
+
+BENCHMARKS = [
+    Benchmark('startup_parse_json', 'startup', startup_parse_setup, run_command),
+    Benchmark('startup_compare_json', 'startup', startup_compare_setup, run_command),
+    Benchmark('parse_hpcc', 'parse', parse_hpcc_setup, parse_hpcc),
+    Benchmark('parse_iozone', 'parse', parse_iozone_setup, parse_iozone),
+    Benchmark('parse_tools', 'parse', parse_tools_setup, parse_tools),
+    Benchmark('compare_hpcc', 'compare', compare_hpcc_setup, compare_hpcc),
+    Benchmark('compare_platforms', 'compare', compare_platforms_setup, compare_platforms),
+    Benchmark('iozone_boundaries', 'compare', iozone_boundaries_setup, iozone_boundaries),
+    Benchmark('render_hpcc_chart', 'render', render_hpcc_chart_setup, render_hpcc_chart),
+    Benchmark('render_iozone_surface', 'render', render_iozone_surface_setup, render_iozone_surface),
+    Benchmark('html_report', 'html', html_report_setup, html_report),
+    Benchmark('iozone_lod', 'html', iozone_lod_setup, iozone_lod),
+]
+
+
+# ----- measuring -----
+
+def measure(run, args, repeat=REPEAT):
+    """(fastest and slowest seconds of repeat calls, peak traced MB of one more call)
+
+    Memory is traced in a separate call since tracemalloc slows Python code
+    down several times. Only allocations made through Python are traced, so
+    memory held inside matplotlib's C code is not counted.
+    """
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run(*args)
+        seconds.append(time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        run(*args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return min(seconds), max(seconds), peak / 1e6
+
+
+def import_profile(argv):
+    """(seconds spent importing, top-level modules imported) by one python -X importtime run"""
+    proc = subprocess.run([sys.executable, '-X', 'importtime'] + argv, check=True,
+                          stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    total, modules = 0, set()
+    for line in proc.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        fields = line[len('import time:'):].split('|') if line.startswith('import time:') else []
+        if len(fields) == 3 and fields[0].strip().isdigit():
+            total += int(fields[0])
+            modules.add(fields[2].strip().split('.')[0])
+    return total / 1e6, modules
+
+
+def check_startup(path):
+    """Problems with the import cost of `cloudperf parse --json` on one file, if any"""
+    seconds, modules = import_profile([CLOUDPERF, 'parse', '--json', path])
+    problems = [f"imports {name}" for name in HEAVY_MODULES if name in modules]
+    if seconds > STARTUP_IMPORT_BUDGET:
+        problems.append(f"imports take {seconds * 1000:.0f} ms (budget {STARTUP_IMPORT_BUDGET * 1000:.0f} ms)")
+    print(f"cloudperf parse --json: {seconds * 1000:.1f} ms of imports, {len(modules)} modules")
+    return problems
+
+
+def corpus(directory, runs, seed=0):
+    """Directory of a corpus of the given size, generated on first use"""
+    path = os.path.join(directory, f'runs_{runs}_seed_{seed}')
+    marker = os.path.join(path, '.complete')
+    if not os.path.exists(marker):
+        print(f"Generating a corpus of {runs} runs in {path}", file=sys.stderr)
+        synth_corpus.generate(path, runs, seed)
+        with open(marker, 'w') as f:
+            f.write(f'{runs} {seed}\n')
+    return path
+
+
+def run_benchmarks(directory, scale, benchmarks, repeat=REPEAT, log=print):
+    """Time every benchmark on one corpus; returns {'name@scale': {'seconds', 'max_seconds', 'peak_mb'}}"""
+    results = {}
+    scratch = tempfile.mkdtemp(prefix='bench_analysis_')
+    context = {'directory': directory, 'paths': synth_corpus.corpus_paths(directory), 'scratch': scratch}
+    try:
+        for bench in benchmarks:
+            args = bench.setup(context)
+            seconds, max_seconds, peak_mb = measure(bench.run, args, repeat)
+            results[f'{bench.name}@{scale}'] = {'seconds': seconds, 'max_seconds': max_seconds, 'peak_mb': peak_mb}
+            log(f"  {bench.name:<24} {seconds:>9.3f}s {peak_mb:>9.1f} MB")
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+    return results
+
+
+def machine():
+    """What the timings were taken on, stored with a baseline"""
+    return {'node': platform.node(), 'machine': platform.machine(), 'cpus': os.cpu_count(),
+            'python': platform.python_version()}
+
+
+def load_baseline(path):
+    if not path or not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_baseline(path, results):
+    """Merge results into the baseline file, keeping entries for other scales"""
+    baseline = load_baseline(path) or {'results': {}}
+    baseline['machine'] = machine()
+    baseline['saved'] = time.time()
+    baseline['results'].update(results)
+    with open(path, 'w') as f:
+        json.dump(baseline, f, indent=1, sort_keys=True)
+
+
+def compare(results, baseline):
+    """Rows (key, seconds, peak MB, baseline seconds, change %, flags) against a baseline"""
+    rows = []
+    for key, r in results.items():
+        base = (baseline or {}).get('results', {}).get(key)
+        flags = []
+        if base:
+            if (r['seconds'] > base['seconds'] * SLOWDOWN
+                    and r['seconds'] - base['seconds'] > MIN_SLOWDOWN_SECONDS
+                    and r['seconds'] > base.get('max_seconds', base['seconds'])):
+                flags.append('slower')
+            if (r['peak_mb'] > base['peak_mb'] * MEMORY_GROWTH
+                    and r['peak_mb'] - base['peak_mb'] > MIN_MEMORY_GROWTH_MB):
+                flags.append('more memory')
+        change = (r['seconds'] / base['seconds'] - 1) * 100 if base and base['seconds'] else None
+        rows.append((key, r['seconds'], r['peak_mb'], base['seconds'] if base else None, change, flags))
+    return rows
+
+
+def format_rows(rows):
+    lines = [f"{'Benchmark':<32} {'Seconds':>9} {'Peak MB':>9} {'Baseline':>9} {'Change':>8}  Flags"]
+    for key, seconds, peak_mb, base, change, flags in rows:
+        base_cell = f'{base:.3f}' if base is not None else '-'
+        change_cell = f'{change:+.0f}%' if change is not None else '-'
+        lines.append(f"{key:<32} {seconds:>9.3f} {peak_mb:>9.1f} {base_cell:>9} {change_cell:>8}  "
+                     f"{', '.join(flags)}")
+    return '\n'.join(lines)
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        description="Time the analysis scripts (parse, compare, render, html) on a synthetic corpus")
+    parser.add_argument('--scale', default=','.join(str(s) for s in DEFAULT_SCALES),
+                        help="Comma separated corpus sizes in runs per tool, e.g. 10,1000,100000 "
+                             "(default: %(default)s)")
+    parser.add_argument('--stage', default=','.join(STAGES), help="Comma separated stages (default: all)")
+    parser.add_argument('--bench', action='append', default=None, help="Only this benchmark (repeatable)")
+    parser.add_argument('--corpus', default=None,
+                        help="Keep generated corpora here and reuse them (default: a temporary directory)")
+    parser.add_argument('--seed', type=int, default=0, help="Corpus seed")
+    parser.add_argument('--repeat', type=int, default=REPEAT, help="Timed calls per benchmark")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="Baseline results (default: %(default)s)")
+    parser.add_argument('--save-baseline', action='store_true',
+                        help="Store these results as the new baseline instead of comparing")
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_args(sys.argv[1:])
+    scales = [int(s) for s in args.scale.split(',') if s]
+    stages = [s for s in args.stage.split(',') if s]
+    benchmarks = [b for b in BENCHMARKS if b.stage in stages and (not args.bench or b.name in args.bench)]
+    if not benchmarks:
+        print("No benchmarks selected; known: " + ', '.join(b.name for b in BENCHMARKS))
+        sys.exit(1)
+
+    corpus_root = args.corpus or tempfile.mkdtemp(prefix='bench_corpus_')
+    results = {}
+    startup_problems = []
+    try:
+        for scale in scales:
+            print(f"{scale} runs per tool")
+            directory = corpus(corpus_root, scale, args.seed)
+            results.update(run_benchmarks(directory, scale, benchmarks, args.repeat))
+        if any(b.stage == 'startup' for b in benchmarks):
+            startup_problems = check_startup(synth_corpus.corpus_paths(directory, ['hpcc'])['hpcc'][0])
+    finally:
+        if not args.corpus:
+            shutil.rmtree(corpus_root, ignore_errors=True)
+
+    if args.save_baseline:
+        save_baseline(args.baseline, results)
+        print(f"Baseline of {len(results)} results saved to {args.baseline}")
+        return
+
+    baseline = load_baseline(args.baseline)
+    if baseline and baseline.get('machine', {}).get('node') != machine()['node']:
+        print(f"Note: the baseline was taken on {baseline['machine'].get('node')}; timings from another "
+              f"machine are only roughly comparable")
+    rows = compare(results, baseline)
+    print(format_rows(rows))
+    flagged = [row for row in rows if row[5]]
+    if flagged:
+        print(f"{len(flagged)} of {len(rows)} benchmarks slower or larger than their baseline")
+    for problem in startup_problems:
+        print(f"Startup: cloudperf parse --json {problem}")
+    if flagged or startup_problems:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from analyze_hpcc import parse_hpcc_results_regex
+from hpcc_parser import parse_hpcc_summary
+
+# A representative slice of the summary block written by HPCC 1.5
+SUMMARY = """Begin of Summary section.
+VersionMajor=1
+VersionMinor=5
+LANG=C
+Success=1
+sizeof_char=1
+CommWorldProcs=2
+MPI_Wtick=1.000000e-06
+HPL_Tflops=0.0102484
+HPL_time=547.315
+HPL_eps=1.11022e-16
+HPL_N=20352
+HPL_NB=192
+HPL_nprow=1
+HPL_npcol=2
+StarDGEMM_Gflops=6.9147
+SingleDGEMM_Gflops=7.04112
+PTRANS_GBs=0.512306
+MPIRandomAccess_GUPs=0.00153
+StarRandomAccess_GUPs=0.0201
+SingleRandomAccess_GUPs=0.0341
+StarSTREAM_Copy=5.42032
+StarSTREAM_Scale=5.38015
+StarSTREAM_Add=5.89045
+StarSTREAM_Triad=5.91023
+SingleSTREAM_Copy=8.1032
+SingleSTREAM_Triad=8.9811
+StarFFT_Gflops=1.2345
+SingleFFT_Gflops=1.4012
+MPIFFT_Gflops=0.8567
+MaxPingPongLatency_usec=4.1231
+AvgPingPongLatency_usec=3.9981
+MinPingPongBandwidth_GBytes=1.0123
+AvgPingPongBandwidth_GBytes=1.2398
+NaturallyOrderedRingLatency_usec=4.511
+RandomlyOrderedRingBandwidth_GBytes=0.6541
+End of Summary section.
+"""
+
+# Verbose per-iteration output that precedes the summary in real logs
+NOISE = ("WR11C2R4       20352   192     1     2             547.32"
+         "              1.0248e+01\n"
+         "||Ax-b||_oo/(eps*(||A||_oo*||x||_oo+||b||_oo)*N)=  0.0021 ...... PASSED\n")
+
+
+def write_log(path, size_mb):
+    """Write a synthetic hpccoutf.txt of roughly size_mb megabytes"""
+    chunk = NOISE * 4096
+    with open(path, 'w') as f:
+        written = 0
+        while written < size_mb * 1024 * 1024:
+            f.write(chunk)
+            written += len(chunk)
+        # Regex output shaped like the stdout capture the legacy parser expects
+        f.write("Gflop/s = 10.2484\nSTREAM: Copy 5420.32 Scale 5380.15 Add 5890.45 Triad 5910.23\n")
+        f.write(SUMMARY)
+
+
+def measure(func, path):
+    """Return (seconds, peak traced bytes) for one call of func(path)"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    func(path)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    sizes = [int(s) for s in sys.argv[1:]] or [16, 128, 512]
+
+    print(f"{'size':>8} {'parser':>10} {'seconds':>9} {'MB/s':>9} {'peak MB':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for size_mb in sizes:
+            path = os.path.join(tmp, f'hpccoutf_{size_mb}.txt')
+            write_log(path, size_mb)
+            actual_mb = os.path.getsize(path) / (1024 * 1024)
+            for name, func in (('regex', parse_hpcc_results_regex), ('streaming', parse_hpcc_summary)):
+                elapsed, peak = measure(func, path)
+                print(f"{size_mb:>6}MB {name:>10} {elapsed:>9.3f} {actual_mb / elapsed:>9.0f} {peak / 1e6:>9.1f}")
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
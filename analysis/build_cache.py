@@ -0,0 +1,202 @@
+import hashlib
+import json
+import os
+import pickle
+import sys
+import uuid
+
+# Default cache location and size bound
+DEFAULT_CACHE_DIR = os.environ.get(
+    'CLOUDPERF_CACHE', os.path.join(os.path.expanduser('~'), '.cache', 'cloud_performance_test'))
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024
+
+# Read size when hashing input files
+_HASH_CHUNK = 1024 * 1024
+
+
+def update_hash(h, obj):
+    """Feed a nested structure of dicts, lists, arrays and scalars into a hash"""
+    # No array can exist before NumPy is imported, so callers that never use it don't load it
+    np = sys.modules.get('numpy')
+    if np is not None and isinstance(obj, np.ndarray):
+        h.update(f'nd{obj.dtype.str}{obj.shape}'.encode())
+        h.update(np.ascontiguousarray(obj).tobytes())
+    elif isinstance(obj, dict):
+        h.update(b'{')
+        for key in sorted(obj, key=repr):
+            h.update(repr(key).encode())
+            update_hash(h, obj[key])
+        h.update(b'}')
+    elif isinstance(obj, (list, tuple)):
+        h.update(b'[')
+        for item in obj:
+            update_hash(h, item)
+        h.update(b']')
+    else:
+        h.update(repr(obj).encode())
+
+
+class BuildCache:
+    """Content-addressed cache for the outputs of the analysis stages
+
+    Every entry is keyed on the stage name, the content hash of its input
+    files and its parameters, so a stage only reruns when something it
+    depends on changed. Entries live under objects/ and are evicted least
+    recently used first once the cache exceeds max_bytes.
+    """
+
+    def __init__(self, root=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(os.path.join(root, 'objects'), exist_ok=True)
+        self._digests_path = os.path.join(root, 'file_digests.json')
+        self._digests = self._load_digests()
+        self._digests_dirty = False
+
+    # ----- keys -----
+
+    def _load_digests(self):
+        try:
+            with open(self._digests_path) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def save(self):
+        """Persist the file digest index and enforce the size bound"""
+        self.evict()
+        if not self._digests_dirty:
+            return
+        tmp = f'{self._digests_path}.{uuid.uuid4().hex}'
+        with open(tmp, 'w') as f:
+            json.dump(self._digests, f)
+        os.replace(tmp, self._digests_path)
+        self._digests_dirty = False
+
+    def file_digest(self, path):
+        """SHA-256 of a file, reusing the last digest while size and mtime match"""
+        st = os.stat(path)
+        stamp = [st.st_size, st.st_mtime_ns, st.st_ino]
+        path = os.path.abspath(path)
+        known = self._digests.get(path)
+        if known and known[0] == stamp:
+            return known[1]
+
+        h = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(_HASH_CHUNK), b''):
+                h.update(chunk)
+        digest = h.hexdigest()
+        self._digests[path] = [stamp, digest]
+        self._digests_dirty = True
+        return digest
+
+    def key(self, stage, inputs=(), params=None):
+        """Cache key of a stage run over input files with the given parameters"""
+        h = hashlib.sha256()
+        update_hash(h, [stage, [self.file_digest(p) for p in inputs], params])
+        return h.hexdigest()
+
+    # ----- storage -----
+
+    def _object_path(self, key):
+        return os.path.join(self.root, 'objects', key[:2], key)
+
+    def _touch(self, path):
+        # The modification time doubles as the LRU clock
+        os.utime(path)
+
+    def _store(self, key, writer):
+        path = self._object_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f'{path}.{uuid.uuid4().hex}.tmp'
+        writer(tmp)
+        os.replace(tmp, path)
+
+    def get(self, key):
+        """Return (True, value) for a cached key, else (False, None)"""
+        path = self._object_path(key)
+        try:
+            with open(path, 'rb') as f:
+                value = pickle.load(f)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            self.misses += 1
+            return False, None
+        self._touch(path)
+        self.hits += 1
+        return True, value
+
+    def put(self, key, value):
+        """Store a picklable value under key"""
+        def write(tmp):
+            with open(tmp, 'wb') as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        self._store(key, write)
+
+    def get_or_compute(self, stage, compute, inputs=(), params=None):
+        """Return compute() from the cache, running and storing it on a miss"""
+        key = self.key(stage, inputs, params)
+        hit, value = self.get(key)
+        if not hit:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def materialize(self, stage, output_path, build, inputs=(), params=None):
+        """Produce output_path from the cache, or by calling build(output_path)
+
+        build may return a list of all files it wrote (e.g. a report and its
+        pages); they are cached and restored together. Returns True when the
+        artifacts came from the cache.
+        """
+        key = self.key(stage, inputs, params)
+        directory = os.path.dirname(os.path.abspath(output_path))
+        hit, files = self.get(key)
+        if hit:
+            for name, content in files.items():
+                with open(os.path.join(directory, name), 'wb') as f:
+                    f.write(content)
+            return True
+
+        written = build(output_path) or [output_path]
+        files = {}
+        for path in written:
+            with open(path, 'rb') as f:
+                files[os.path.relpath(os.path.abspath(path), directory)] = f.read()
+        self.put(key, files)
+        return False
+
+    def evict(self):
+        """Delete least recently used entries until the cache fits max_bytes"""
+        entries = []
+        total = 0
+        objects = os.path.join(self.root, 'objects')
+        for shard in os.scandir(objects):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.endswith('.tmp'):
+                    continue
+                st = entry.stat()
+                entries.append((st.st_mtime, st.st_size, entry.path))
+                total += st.st_size
+        if total <= self.max_bytes:
+            return 0
+
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            total -= size
+            removed += 1
+        return removed
+
+    def summary(self):
+        """One-line hit/miss summary"""
+        return f"Cache {self.root}: {self.hits} hits, {self.misses} misses"
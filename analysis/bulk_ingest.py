@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+
+import glob
+import itertools
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from analyze_hpcc import PARSER_VERSION, parse_hpcc_results
+from tool_parsers import PLATFORM_PREFIXES, infer_platform
+
+
+def is_result_file(name):
+    """HPCC output names: hpccoutf*, or a .txt with hpcc in it (not our own CSV/HTML)"""
+    return 'hpccoutf' in name or (name.endswith('.txt') and 'hpcc' in name)
+
+
+def expand_inputs(patterns):
+    """Expand directories and glob patterns into a sorted list of files
+
+    Directories are walked for HPCC result files only (see is_result_file);
+    glob patterns are taken as given.
+    """
+    paths = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            for root, _, files in os.walk(pattern):
+                for name in files:
+                    if is_result_file(name):
+                        paths.add(os.path.join(root, name))
+        else:
+            for path in glob.glob(pattern, recursive=True):
+                if os.path.isfile(path):
+                    paths.add(path)
+    return sorted(paths)
+
+
+def _parse_one(path):
+    """Worker: parse one file into plain tuples so results pickle cheaply"""
+    return path, os.path.getsize(path), list(parse_hpcc_results(path).items())
+
+
+def ingest(paths, workers=None, cache=None):
+    """Parse result files across a process pool into one long-format DataFrame
+
+    With a BuildCache, files whose content was parsed before are served from
+    the cache and only new or changed files reach the pool. Files whose
+    platform cannot be inferred are not parsed but listed under
+    'unrecognised' in the stats. Returns the DataFrame (columns file,
+    platform, metric, value) and a dict with the throughput of the run.
+    """
+    workers = workers or os.cpu_count() or 1
+    start = time.perf_counter()
+
+    platforms_of = {path: infer_platform(path) for path in paths}
+    unrecognised = [path for path in paths if not platforms_of[path]]
+    paths = [path for path in paths if platforms_of[path]]
+
+    cached, todo, keys = [], [], {}
+    for path in paths:
+        if cache is None:
+            todo.append(path)
+            continue
+        key = cache.key('parse_hpcc', [path], PARSER_VERSION)
+        # Shared with analyze_hpcc.parse_cached, which stores {metric: value}
+        hit, results = cache.get(key)
+        if hit:
+            cached.append((path, os.path.getsize(path), list(results.items())))
+        else:
+            keys[path] = key
+            todo.append(path)
+
+    if workers == 1 or len(todo) < 2:
+        parsed = map(_parse_one, todo)
+        executor = None
+    else:
+        # Large chunks amortise the IPC cost: each task returns a few dozen floats
+        chunksize = max(1, len(todo) // (workers * 4))
+        executor = ProcessPoolExecutor(max_workers=workers)
+        parsed = executor.map(_parse_one, todo, chunksize=chunksize)
+
+    files, platforms, metrics, values = [], [], [], []
+    total_bytes = 0
+    try:
+        for path, size, items in itertools.chain(cached, parsed):
+            if path in keys:
+                # Freshly parsed: remember it for the next run
+                cache.put(keys.pop(path), dict(items))
+            total_bytes += size
+            platform = platforms_of[path]
+            for metric, value in items:
+                files.append(path)
+                platforms.append(platform)
+                metrics.append(metric)
+                values.append(value)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+        if cache is not None:
+            cache.save()
+
+    elapsed = time.perf_counter() - start
+    df = pd.DataFrame({
+        'file': files,
+        'platform': pd.Categorical(platforms),
+        'metric': pd.Categorical(metrics),
+        'value': values,
+    })
+    stats = {
+        'files': len(paths),
+        'cached': len(cached),
+        'bytes': total_bytes,
+        'seconds': elapsed,
+        'workers': workers,
+        'unrecognised': unrecognised,
+        'files_per_sec': len(paths) / elapsed if elapsed else float('inf'),
+        'mb_per_sec': total_bytes / 1e6 / elapsed if elapsed else float('inf'),
+    }
+    return df, stats
+
+
+def platform_samples(df):
+    """Collect every run's value per platform: {platform: {metric: [values]}}"""
+    samples = df.groupby(['platform', 'metric'], observed=True)['value'].agg(list)
+    results = {}
+    for (platform, metric), values in samples.items():
+        results.setdefault(platform, {})[metric] = values
+    return results
+
+
+def format_stats(stats):
+    """Throughput summary for a bulk ingestion run, plus any skipped files"""
+    line = (f"Ingested {stats['files']} files ({stats['bytes'] / 1e6:.1f} MB, "
+            f"{stats.get('cached', 0)} from cache) in "
+            f"{stats['seconds']:.2f}s with {stats['workers']} workers: "
+            f"{stats['files_per_sec']:.0f} files/sec, {stats['mb_per_sec']:.0f} MB/sec")
+    unrecognised = stats.get('unrecognised')
+    if unrecognised:
+        line += (f"\nSkipped {len(unrecognised)} files with no known platform prefix "
+                 f"({', '.join(sorted(PLATFORM_PREFIXES))}): " + ', '.join(unrecognised))
+    return line
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: python bulk_ingest.py <dir|glob> [...]")
+        sys.exit(1)
+
+    df, stats = ingest(expand_inputs(sys.argv[1:]))
+    print(df.groupby(['platform', 'metric'], observed=True)['value'].describe())
+    print(format_stats(stats))
+
+
+if __name__ == "__main__":
+    main()
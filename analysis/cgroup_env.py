@@ -0,0 +1,464 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import os
+import re
+import shlex
+import signal
+import subprocess
+import sys
+import time
+from collections import namedtuple
+
+# Where the unified (v2) hierarchy is mounted
+CGROUP_ROOT = '/sys/fs/cgroup'
+
+# Every environment is a child of this cgroup, so leftovers are easy to find
+PARENT_NAME = 'cloudperf'
+
+# CFS bandwidth period written to cpu.max, in microseconds (the kernel default)
+CPU_PERIOD = 100000
+
+# Seconds to wait for the processes of a slice to exit before removing it
+TEARDOWN_TIMEOUT = 5.0
+
+# Seconds the CPU check keeps the slice busy
+VERIFY_SECONDS = 1.0
+
+# Set in the environment of everything run inside a slice
+ENV_VAR = 'CLOUDPERF_CGROUP'
+
+# io.max keys and the config entries they come from (bytes or operations per second)
+IO_KEYS = [('rbps', 'DISK_READ_BPS'), ('wbps', 'DISK_WRITE_BPS'),
+           ('riops', 'DISK_READ_IOPS'), ('wiops', 'DISK_WRITE_IOPS')]
+
+SIZE_SUFFIXES = {'': 1, 'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30, 'T': 1 << 40}
+
+# The limits of one environment, as they are written to the cgroup files
+Limits = namedtuple('Limits', 'cpus quota memory swap io_device io')
+
+
+def parse_config(path):
+    """{KEY: value} of a shell-style KEY=VALUE file such as vm_config.conf"""
+    config = {}
+    with open(path) as f:
+        for line in f:
+            for token in shlex.split(line, comments=True):
+                key, sep, value = token.partition('=')
+                if sep:
+                    config[key] = value
+    return config
+
+
+def parse_size(text):
+    """Bytes from '4096', '50M' or '1.5G'"""
+    match = re.fullmatch(r'\s*([\d.]+)\s*([KMGT]?)i?B?\s*', text, re.IGNORECASE)
+    if not match:
+        raise ValueError(f"not a size: {text!r}")
+    return int(float(match.group(1)) * SIZE_SUFFIXES[match.group(2).upper()])
+
+
+def parse_cpu_list(text):
+    """[0, 1, 4, 5] from the kernel's '0-1,4-5' list format"""
+    cpus = []
+    for part in text.strip().split(','):
+        if part:
+            low, _, high = part.partition('-')
+            cpus.extend(range(int(low), int(high or low) + 1))
+    return cpus
+
+
+def format_cpu_list(cpus):
+    return ','.join(str(c) for c in cpus)
+
+
+def block_device(path):
+    """'MAJ:MIN' of the whole disk holding path; io.max does not accept partitions"""
+    dev = os.stat(path).st_dev
+    node = f'{os.major(dev)}:{os.minor(dev)}'
+    sys_path = os.path.realpath(f'/sys/dev/block/{node}')
+    if not os.path.exists(sys_path):
+        raise ValueError(f"{path} is not on a block device (overlay or tmpfs?); set DISK_DEVICE")
+    if os.path.exists(os.path.join(sys_path, 'partition')):
+        with open(os.path.join(os.path.dirname(sys_path), 'dev')) as f:
+            node = f.read().strip()
+    return node
+
+
+def limits_from_config(config, available_cpus, io_path='.'):
+    """Limits for a config file's entries
+
+    CPU_CORES picks that many CPUs for cpuset.cpus (or CPU_SET names them)
+    and sets the same number of CPUs of bandwidth in cpu.max, unless
+    CPU_QUOTA gives a different number, e.g. 1.5. MEMORY_SIZE (MB) becomes
+    memory.max; MEMORY_SWAP (MB, default 0) memory.swap.max. io.max is only
+    written when one of the DISK_*_BPS / DISK_*_IOPS entries is set, for
+    DISK_DEVICE or else the disk holding io_path.
+    """
+    cores = int(config['CPU_CORES'])
+    if 'CPU_SET' in config:
+        cpus = parse_cpu_list(config['CPU_SET'])
+    else:
+        if cores > len(available_cpus):
+            raise ValueError(f"CPU_CORES={cores} but only {len(available_cpus)} CPUs are available")
+        cpus = available_cpus[:cores]
+    quota = float(config.get('CPU_QUOTA', cores))
+
+    io = {key: parse_size(config[entry]) for key, entry in IO_KEYS if config.get(entry)}
+    device = None
+    if io:
+        device = config.get('DISK_DEVICE')
+        if device and not re.fullmatch(r'\d+:\d+', device):
+            device = block_device(device)
+        device = device or block_device(io_path)
+    return Limits(cpus, quota, int(config['MEMORY_SIZE']) << 20,
+                  int(config.get('MEMORY_SWAP', 0)) << 20, device, io)
+
+
+def cgroup_files(limits):
+    """{file: value} to write into a slice, in the order they are written"""
+    files = {
+        'cpuset.cpus': format_cpu_list(limits.cpus),
+        'cpu.max': f'{int(limits.quota * CPU_PERIOD)} {CPU_PERIOD}',
+        'memory.max': str(limits.memory),
+        'memory.swap.max': str(limits.swap),
+    }
+    if limits.io:
+        files['io.max'] = limits.io_device + ' ' + ' '.join(f'{k}={v}' for k, v in limits.io.items())
+    return files
+
+
+def read_keyed(path):
+    """{key: int} of a flat-keyed cgroup file such as cpu.stat or memory.events"""
+    values = {}
+    with open(path) as f:
+        for line in f:
+            key, _, value = line.partition(' ')
+            if value.strip().lstrip('-').isdigit():
+                values[key] = int(value)
+    return values
+
+
+def read_io_stat(path):
+    """rbytes, wbytes, rios and wios summed over every device of io.stat"""
+    totals = dict.fromkeys(('rbytes', 'wbytes', 'rios', 'wios'), 0)
+    with open(path) as f:
+        for line in f:
+            for field in line.split()[1:]:
+                key, _, value = field.partition('=')
+                if key in totals:
+                    totals[key] += int(value)
+    return totals
+
+
+class CgroupEnvironment:
+    """One cgroup v2 slice with the limits of a simulated environment
+
+    Use as a context manager: the slice is created and its limits read back
+    on entry, and on exit every process left in it is killed and the slice
+    removed. Needs root (or a delegated subtree as `root`) and the cpu,
+    cpuset and memory controllers, plus io when disk limits are set.
+    """
+
+    def __init__(self, name, limits, root=CGROUP_ROOT):
+        self.name = name
+        self.limits = limits
+        self.root = root
+        self.parent = os.path.join(root, PARENT_NAME)
+        self.path = os.path.join(self.parent, name)
+
+    def _file(self, name, path=None):
+        return os.path.join(path or self.path, name)
+
+    def _read(self, name, path=None):
+        with open(self._file(name, path)) as f:
+            return f.read().strip()
+
+    def _write(self, name, value, path=None):
+        try:
+            with open(self._file(name, path), 'w') as f:
+                f.write(value)
+        except OSError as e:
+            raise RuntimeError(f"cannot write {value!r} to {self._file(name, path)}: {e.strerror}") from e
+
+    def controllers(self):
+        controllers = ['cpuset', 'cpu', 'memory']
+        return controllers + (['io'] if self.limits.io else [])
+
+    def create(self):
+        if not os.path.exists(self._file('cgroup.controllers', self.root)):
+            raise RuntimeError(f"no cgroup v2 hierarchy at {self.root} (cgroup v1 or hybrid host?)")
+        missing = set(self.controllers()) - set(self._read('cgroup.controllers', self.root).split())
+        if missing:
+            raise RuntimeError(f"cgroup controllers not available at {self.root}: {', '.join(sorted(missing))}")
+
+        # Controllers must be enabled on every level above the slice
+        os.makedirs(self.parent, exist_ok=True)
+        for path in (self.root, self.parent):
+            enabled = set(self._read('cgroup.subtree_control', path).split())
+            for controller in self.controllers():
+                if controller not in enabled:
+                    self._write('cgroup.subtree_control', '+' + controller, path)
+
+        if os.path.exists(self.path):
+            # Left behind by a run that was killed before it could clean up
+            self.destroy(remove_parent=False)
+        os.mkdir(self.path)
+        for name, value in cgroup_files(self.limits).items():
+            if name == 'memory.swap.max' and not os.path.exists(self._file(name)):
+                continue   # no swap accounting on this kernel
+            self._write(name, value)
+        self.check_limits()
+
+    def check_limits(self):
+        """Read the limit files back; raises RuntimeError on any difference"""
+        problems = []
+        effective = parse_cpu_list(self._read('cpuset.cpus.effective'))
+        if effective != sorted(self.limits.cpus):
+            problems.append(f"cpuset.cpus.effective is {format_cpu_list(effective)}, "
+                            f"expected {format_cpu_list(self.limits.cpus)}")
+        expected = cgroup_files(self.limits)
+        if self._read('cpu.max') != expected['cpu.max']:
+            problems.append(f"cpu.max is {self._read('cpu.max')!r}, expected {expected['cpu.max']!r}")
+        # The kernel rounds memory.max down to whole pages
+        memory = self._read('memory.max')
+        if memory == 'max' or not 0 <= self.limits.memory - int(memory) < os.sysconf('SC_PAGE_SIZE'):
+            problems.append(f"memory.max is {memory}, expected {self.limits.memory}")
+        if self.limits.io:
+            lines = {line.split()[0]: line for line in self._read('io.max').splitlines()}
+            line = lines.get(self.limits.io_device, '')
+            for key, value in self.limits.io.items():
+                if f'{key}={value}' not in line.split():
+                    problems.append(f"io.max has no {key}={value} for {self.limits.io_device}: {line!r}")
+        if problems:
+            raise RuntimeError(f"limits of {self.path} did not take effect: " + '; '.join(problems))
+
+    def join(self):
+        """Move the calling process into the slice (used as preexec_fn)"""
+        with open(self._file('cgroup.procs'), 'w') as f:
+            f.write('0')
+
+    def popen(self, command, **kwargs):
+        env = dict(kwargs.pop('env', None) or os.environ, **{ENV_VAR: self.path})
+        return subprocess.Popen(command, preexec_fn=self.join, env=env, **kwargs)
+
+    def run(self, command, **kwargs):
+        """Run command inside the slice; returns its exit status"""
+        process = self.popen(command, **kwargs)
+        try:
+            return process.wait()
+        except BaseException:
+            process.kill()
+            process.wait()
+            raise
+
+    def stats(self):
+        """Counters of the slice: cpu.stat, memory.events, memory.peak and io.stat totals"""
+        stats = {'cpu': read_keyed(self._file('cpu.stat')),
+                 'memory_events': read_keyed(self._file('memory.events'))}
+        if os.path.exists(self._file('memory.peak')):
+            stats['memory_peak'] = int(self._read('memory.peak'))
+        if os.path.exists(self._file('io.stat')):
+            stats['io'] = read_io_stat(self._file('io.stat'))
+        return stats
+
+    def verify_cpu(self, seconds=VERIFY_SECONDS):
+        """Keep one more busy process than CPUs running in the slice and check the throttling counters
+
+        The bandwidth limit is in force when cpu.stat counts enforcement
+        periods and the CPU time used stays within the quota. When the
+        quota is below the cpuset, periods must also be throttled.
+        Returns a dict of what was measured and a list of problems.
+        """
+        before = read_keyed(self._file('cpu.stat'))
+        spin = f'import time\nend = time.monotonic() + {seconds}\nwhile time.monotonic() < end: pass'
+        start = time.monotonic()
+        burners = [self.popen([sys.executable, '-c', spin]) for _ in range(len(self.limits.cpus) + 1)]
+        for burner in burners:
+            burner.wait()
+        elapsed = time.monotonic() - start
+        after = read_keyed(self._file('cpu.stat'))
+        delta = {k: after[k] - before.get(k, 0) for k in after}
+
+        allowed = min(self.limits.quota, len(self.limits.cpus))
+        result = {
+            'used_cpus': delta['usage_usec'] / (elapsed * 1e6), 'allowed_cpus': allowed,
+            'nr_periods': delta.get('nr_periods', 0), 'nr_throttled': delta.get('nr_throttled', 0),
+            'throttled_usec': delta.get('throttled_usec', 0), 'problems': [],
+        }
+        if result['nr_periods'] == 0:
+            result['problems'].append("cpu.stat counted no bandwidth periods: cpu.max is not enforced")
+        # Start-up of the burners and the period boundaries allow a little over the quota
+        if result['used_cpus'] > allowed * 1.1:
+            result['problems'].append(f"used {result['used_cpus']:.2f} CPUs with {allowed:g} allowed")
+        if self.limits.quota < len(self.limits.cpus) and result['nr_throttled'] == 0:
+            result['problems'].append("no period was throttled although the quota is below the cpuset")
+        return result
+
+    def procs(self, path=None):
+        return [int(pid) for pid in self._read('cgroup.procs', path).split()]
+
+    def destroy(self, remove_parent=True):
+        """Kill whatever still runs in the slice and remove it (and the parent once empty)"""
+        if os.path.exists(self.path):
+            if os.path.exists(self._file('cgroup.kill')):
+                self._write('cgroup.kill', '1')
+            else:
+                for pid in self.procs():
+                    try:
+                        os.kill(pid, signal.SIGKILL)
+                    except ProcessLookupError:
+                        pass
+            deadline = time.monotonic() + TEARDOWN_TIMEOUT
+            while self.procs() and time.monotonic() < deadline:
+                time.sleep(0.05)
+            os.rmdir(self.path)
+        if remove_parent and os.path.exists(self.parent):
+            try:
+                os.rmdir(self.parent)
+            except OSError:
+                pass   # another environment is still in use
+
+    def __enter__(self):
+        try:
+            self.create()
+        except BaseException:
+            self.destroy()
+            raise
+        return self
+
+    def __exit__(self, *exc):
+        self.destroy()
+        return False
+
+
+def available_cpus(root=CGROUP_ROOT):
+    """CPUs the slices can use: the root's effective cpuset, or every online CPU"""
+    path = os.path.join(root, 'cpuset.cpus.effective')
+    if os.path.exists(path):
+        with open(path) as f:
+            return parse_cpu_list(f.read())
+    return sorted(os.sched_getaffinity(0))
+
+
+def environment_name(config_path):
+    """'vm' for vm_config.conf"""
+    return os.path.basename(config_path).split('.')[0].replace('_config', '')
+
+
+def environment(config_path, name=None, root=CGROUP_ROOT, io_path='.'):
+    limits = limits_from_config(parse_config(config_path), available_cpus(root), io_path)
+    return CgroupEnvironment(name or environment_name(config_path), limits, root)
+
+
+def format_verify(result):
+    return (f"CPU check: {result['used_cpus']:.2f} of {result['allowed_cpus']:g} CPUs used, "
+            f"{result['nr_throttled']} of {result['nr_periods']} periods throttled "
+            f"({result['throttled_usec'] / 1000:.0f} ms)")
+
+
+def counter_delta(before, after):
+    """after - before for every counter, recursing into nested dicts; peaks are kept as they are"""
+    return {k: counter_delta(before.get(k, {}), v) if isinstance(v, dict)
+            else v if k == 'memory_peak' else v - before.get(k, 0)
+            for k, v in after.items()}
+
+
+def cmd_plan(args, env):
+    print(f"{env.path}:")
+    for name, value in cgroup_files(env.limits).items():
+        print(f"  {name:<16} {value}")
+
+
+def cmd_verify(args, env):
+    with env:
+        result = env.verify_cpu(args.seconds)
+    print(format_verify(result))
+    for problem in result['problems']:
+        print(f"  {problem}")
+    return 1 if result['problems'] else 0
+
+
+def cmd_run(args, env):
+    if not args.command:
+        sys.exit("no command given; usage: cgroup_env.py run CONFIG -- COMMAND ...")
+    # Let a SIGTERM from the caller tear the slice down like Ctrl-C does
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(128 + signal.SIGTERM))
+    with env:
+        print(f"Running in {env.path} (cpus {format_cpu_list(env.limits.cpus)}, "
+              f"{env.limits.quota:g} CPUs of bandwidth, {env.limits.memory >> 20} MB)")
+        if args.verify:
+            result = env.verify_cpu(args.seconds)
+            print(format_verify(result))
+            if result['problems']:
+                sys.exit("limits not in force: " + '; '.join(result['problems']))
+        before = env.stats()
+        status = env.run(args.command)
+        stats = counter_delta(before, env.stats())
+    print(f"CPU {stats['cpu']['usage_usec'] / 1e6:.1f} s, throttled {stats['cpu'].get('nr_throttled', 0)} "
+          f"of {stats['cpu'].get('nr_periods', 0)} periods; memory.max hit "
+          f"{stats['memory_events'].get('max', 0)} times, {stats['memory_events'].get('oom_kill', 0)} OOM kills")
+    if args.stats:
+        with open(args.stats, 'w') as f:
+            json.dump({'environment': env.name, 'limits': cgroup_files(env.limits), 'exit_status': status,
+                       **stats}, f, indent=1)
+    return status
+
+
+def cmd_cleanup(args, env):
+    parent = os.path.join(args.root, PARENT_NAME)
+    if not os.path.isdir(parent):
+        return
+    for name in os.listdir(parent):
+        if os.path.isdir(os.path.join(parent, name)):
+            CgroupEnvironment(name, None, args.root).destroy(remove_parent=False)
+            print(f"Removed {os.path.join(parent, name)}")
+    os.rmdir(parent)
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        description="Run benchmarks under the CPU, memory and I/O limits of a simulated environment "
+                    "using cgroup v2")
+    commands = parser.add_subparsers(dest='command_name', required=True)
+    for name, help in [('plan', "print the cgroup files that would be written"),
+                       ('verify', "create the slice, check the CPU limit under load and remove it"),
+                       ('run', "run a command inside the slice, then remove it")]:
+        p = commands.add_parser(name, help=help)
+        p.add_argument('config', help="environment config, e.g. simulated_vm/etc/vm_config.conf")
+        p.add_argument('--name', default=None, help="slice name (default: from the config file name)")
+        p.add_argument('--io-path', default='.', help="path whose disk gets the io.max limits (default: .)")
+        p.add_argument('--seconds', type=float, default=VERIFY_SECONDS,
+                       help="length of the CPU check (default: %(default)s)")
+    run = commands.choices['run']
+    run.add_argument('--verify', action='store_true', help="check the CPU limit before running the command")
+    run.add_argument('--stats', default=None, help="write the slice's counters for the run to this JSON file")
+    run.add_argument('command', nargs=argparse.REMAINDER, help="-- command and arguments")
+    commands.add_parser('cleanup', help="remove slices left behind by killed runs")
+    parser.add_argument('--root', default=CGROUP_ROOT, help="cgroup v2 mount point (default: %(default)s)")
+    args = parser.parse_args(argv)
+    if getattr(args, 'command', None) and args.command[0] == '--':
+        args.command = args.command[1:]
+    return args
+
+
+def main():
+    args = parse_args(sys.argv[1:])
+    handler = {'plan': cmd_plan, 'verify': cmd_verify, 'run': cmd_run, 'cleanup': cmd_cleanup}[args.command_name]
+    env = None
+    if args.command_name != 'cleanup':
+        try:
+            env = environment(args.config, args.name, args.root, args.io_path)
+        except KeyError as e:
+            sys.exit(f"{args.config}: no {e.args[0]} entry")
+        except ValueError as e:
+            sys.exit(f"{args.config}: {e}")
+    try:
+        sys.exit(handler(args, env))
+    except RuntimeError as e:
+        sys.exit(str(e))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import math
+import os
+import runpy
+import sys
+
+# Only light modules are imported here. pandas, NumPy, matplotlib and plotly are
+# imported inside the subcommands that use them, so `cloudperf parse --json`
+# starts in tens of milliseconds instead of paying for all of them.
+
+ANALYSIS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# The IOZone report header, also written by fake_iozone.py
+IOZONE_MARKERS = ('Iozone: Performance Test of File I/O', 'Excel output is below')
+
+# Scripts behind `cloudperf plot`, run as if started from the shell
+PLOT_SCRIPTS = {
+    'tools': 'create_visualizations.py',
+    'iozone': 'create_3d_iozone_plotly.py',
+    'iozone-simple': 'create_3d_iozone_simplified.py',
+    'roofline': 'roofline.py',
+    'latency': 'latency_hist.py',
+}
+
+
+def sniff_kind(path):
+    """'iozone', a tool_parsers name (sysbench, stress-ng, iperf) or 'hpcc'
+
+    HPCC is the fallback: its summary block is at the end of the file and
+    plain stdout captures have no header to recognise.
+    """
+    from tool_parsers import SNIFF_BYTES, sniff
+
+    with open(path, 'r', errors='replace') as f:
+        head = f.read(SNIFF_BYTES)
+    if any(marker in head for marker in IOZONE_MARKERS):
+        return 'iozone'
+    return sniff(head) or 'hpcc'
+
+
+def iozone_metrics(path):
+    """Peak and mean throughput of every test of an IOZone report"""
+    import numpy as np
+    from iozone_parser import parse_iozone_report
+
+    surfaces, units = parse_iozone_report(path)
+    metrics = {}
+    for test, surface in surfaces.items():
+        measured = surface.values[~np.isnan(surface.values)]
+        if len(measured):
+            metrics[f'{test}_peak'] = float(measured.max())
+            metrics[f'{test}_mean'] = float(measured.mean())
+    return metrics, units
+
+
+def parse_one(path):
+    """{'tool', 'platform', 'metrics', 'units'} for one result file of any kind"""
+    from tool_parsers import infer_platform, parse_file
+
+    kind = sniff_kind(path)
+    units = {}
+    if kind == 'iozone':
+        metrics, unit = iozone_metrics(path)
+        units = {metric: unit for metric in metrics}
+    elif kind == 'hpcc':
+        from analyze_hpcc import parse_hpcc_results
+        metrics = parse_hpcc_results(path)
+        if not metrics:
+            kind = None
+    else:
+        _, records = parse_file(path)
+        metrics = {f'{r.test}_{r.metric}': r.value for r in records}
+        units = {f'{r.test}_{r.metric}': r.unit for r in records}
+    return {'tool': kind, 'platform': infer_platform(path), 'metrics': metrics, 'units': units}
+
+
+def json_safe(value):
+    """NaN and infinity as null, which JSON has no literal for, and NumPy scalars as Python ones"""
+    if getattr(value, 'ndim', None) == 0:
+        value = value.item()
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    if isinstance(value, dict):
+        return {k: json_safe(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [json_safe(v) for v in value]
+    return value
+
+
+def cmd_parse(args):
+    from tool_parsers import expand_paths
+
+    parsed = {path: parse_one(path) for path in expand_paths(args.files)}
+    if args.json:
+        json.dump(json_safe(parsed), sys.stdout, indent=1 if args.pretty else None)
+        print()
+        return
+    for path, result in parsed.items():
+        if result['tool'] is None:
+            print(f"{path}: not recognised", file=sys.stderr)
+            continue
+        for metric, value in result['metrics'].items():
+            unit = result['units'].get(metric, '')
+            print(f"{os.path.basename(path)}\t{result['tool']}\t{metric}\t{value:g} {unit}".rstrip())
+
+
+def load_platforms(args):
+    """{platform: results} from one file per platform or, with --bulk, many runs"""
+    if args.bulk:
+        from analyze_hpcc import load_bulk
+        return load_bulk(args.inputs, args.workers)[1]
+    platforms = [p for p in args.platforms.split(',') if p]
+    if len(args.inputs) != len(platforms) or len(set(platforms)) < 2:
+        sys.exit(f"expected one result file per platform ({', '.join(platforms)}), at least two platforms")
+    from analyze_hpcc import parse_hpcc_results
+    return {p: parse_hpcc_results(path) for p, path in zip(platforms, args.inputs)}
+
+
+def format_comparison(comparison):
+    """Fixed-width table of the comparison, without pandas"""
+    from html_report import STAT_COLUMNS
+
+    platforms = [c for c in next(iter(comparison.values()), {}) if c not in STAT_COLUMNS]
+    diff = 'Margin (%)' if 'Best' in next(iter(comparison.values()), {}) else 'Difference (%)'
+    lines = [f"{'Metric':<20} " + ' '.join(f"{p:>12}" for p in platforms) +
+             (f" {'Best':>12}" if diff == 'Margin (%)' else '') + f" {diff[:-4]:>11}"]
+    for metric, row in comparison.items():
+        line = f"{metric:<20} " + ' '.join(f"{row[p]:>12.4g}" for p in platforms)
+        if diff == 'Margin (%)':
+            line += f" {row['Best']:>12}"
+        line += f" {row[diff]:>+10.1f}%"
+        if 'CI Low (%)' in row:
+            line += (f"  CI [{row['CI Low (%)']:+.1f}, {row['CI High (%)']:+.1f}]  p={row['p-value']:.3g}"
+                     f"  runs {row['Runs']}{'  *' if row['Significant'] else ''}")
+        lines.append(line)
+    return '\n'.join(lines)
+
+
+def format_pairwise(rows):
+    """Fixed-width table of analyze_hpcc.pairwise_rows"""
+    lines = [f"{'Metric':<20} {'Baseline':>12} {'Platform':>12} {'Ratio':>8} {'Difference':>11} {'CI':>18} {'p':>8}"]
+    for metric, baseline, platform, ratio, diff, low, high, p, significant in rows:
+        lines.append(f"{metric:<20} {baseline:>12} {platform:>12} {ratio:>8.3f} {diff:>+10.1f}% "
+                     f"{f'[{low:+.1f}, {high:+.1f}]':>18} {p:>8.3g}{'  *' if significant else ''}")
+    return '\n'.join(lines)
+
+
+def cmd_compare(args):
+    from analyze_hpcc import PAIRWISE_COLUMNS, compare_platforms, pairwise_rows
+
+    comparison, matrix = compare_platforms(load_platforms(args), seed=0)
+    if args.pairwise:
+        if matrix is None:
+            sys.exit("--pairwise needs three or more platforms; with two, the comparison is the pair")
+        rows = pairwise_rows(matrix)
+        if args.json:
+            json.dump(json_safe([dict(zip(PAIRWISE_COLUMNS, r)) for r in rows]), sys.stdout,
+                      indent=1 if args.pretty else None)
+            print()
+        else:
+            print(format_pairwise(rows))
+    elif args.json:
+        json.dump(json_safe(comparison), sys.stdout, indent=1 if args.pretty else None)
+        print()
+    else:
+        print(format_comparison(comparison))
+
+
+def run_script(name, argv):
+    """Run one of the analysis scripts in this process, with argv as its arguments"""
+    path = os.path.join(ANALYSIS_DIR, name)
+    saved = sys.argv
+    sys.argv = [path] + argv
+    try:
+        runpy.run_path(path, run_name='__main__')
+    finally:
+        sys.argv = saved
+
+
+def cmd_plot(args):
+    if args.kind == 'hpcc':
+        from analyze_hpcc import compare_platforms, create_comparison_chart, create_heatmap_chart
+        comparison, matrix = compare_platforms(load_platforms(args), seed=0)
+        create_comparison_chart(comparison, args.output)
+        print(f"Chart saved to {args.output}")
+        if args.heatmap:
+            if matrix is None:
+                sys.exit("--heatmap needs three or more platforms")
+            create_heatmap_chart(matrix, args.heatmap)
+            print(f"Heatmap saved to {args.heatmap}")
+    else:
+        run_script(PLOT_SCRIPTS[args.kind], args.inputs)
+
+
+def cmd_report(args):
+    from analyze_hpcc import main as analyze_main
+    analyze_main(args.args)
+
+
+def add_platform_arguments(parser):
+    parser.add_argument('inputs', nargs='+',
+                        help="one HPCC result file per platform, or directories/globs with --bulk")
+    parser.add_argument('--platforms', default='VM,Container',
+                        help="comma separated platform of each result file (default: %(default)s)")
+    parser.add_argument('--bulk', action='store_true', help="compare many runs per platform (needs pandas)")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes for --bulk")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='cloudperf', description="Parse, compare and plot benchmark results")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    parse = commands.add_parser('parse', help="extract the numbers from result files of any tool")
+    parse.add_argument('files', nargs='+', help="result files or directories of *.txt files")
+    parse.add_argument('--json', action='store_true', help="print {file: {tool, platform, metrics, units}} as JSON")
+    parse.add_argument('--pretty', action='store_true', help="indent the JSON")
+    parse.set_defaults(func=cmd_parse)
+
+    compare = commands.add_parser('compare', help="compare the HPCC results of two or more platforms")
+    add_platform_arguments(compare)
+    compare.add_argument('--pairwise', action='store_true',
+                         help="every pair of platforms instead of the per-metric summary (three or more platforms)")
+    compare.add_argument('--json', action='store_true', help="print the comparison as JSON")
+    compare.add_argument('--pretty', action='store_true', help="indent the JSON")
+    compare.set_defaults(func=cmd_compare)
+
+    plot = commands.add_parser('plot', help="draw the comparison chart or run a visualization script")
+    plot_kinds = plot.add_subparsers(dest='kind', required=True)
+    hpcc = plot_kinds.add_parser('hpcc', help="HPCC comparison bar chart")
+    add_platform_arguments(hpcc)
+    hpcc.add_argument('-o', '--output', default='hpcc_comparison.png', help="chart file (default: %(default)s)")
+    hpcc.add_argument('--heatmap', default=None, help="also draw the percent-of-best heatmap to this file")
+    for kind, script in PLOT_SCRIPTS.items():
+        p = plot_kinds.add_parser(kind, help=f"run {script}")
+        p.add_argument('inputs', nargs=argparse.REMAINDER, help=f"arguments for {script}")
+    plot.set_defaults(func=cmd_plot)
+
+    report = commands.add_parser('report', help="full analysis: store, regressions, CSV, chart and HTML report")
+    report.add_argument('args', nargs=argparse.REMAINDER, help="arguments for analyze_hpcc.py")
+    report.set_defaults(func=cmd_report)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(sys.argv[1:] if argv is None else argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+import math
+import warnings
+
+import numpy as np
+
+# Default number of bootstrap resamples and confidence level
+N_RESAMPLES = 10000
+CONFIDENCE = 0.95
+ALPHA = 0.05
+
+_erfc = np.frompyfunc(math.erfc, 1, 1)
+
+
+def pad_samples(samples):
+    """Stack ragged per-metric sample lists into a NaN-padded (metrics, n) array"""
+    width = max((len(s) for s in samples), default=0)
+    padded = np.full((len(samples), max(width, 1)), np.nan)
+    for i, s in enumerate(samples):
+        padded[i, :len(s)] = s
+    return padded
+
+
+def _row_means(samples):
+    """Mean of the non-NaN values of each row, NaN for empty rows"""
+    counts = np.count_nonzero(~np.isnan(samples), axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.nansum(samples, axis=1) / np.where(counts, counts, np.nan)
+
+
+def _bootstrap_means(samples, n_resamples, rng):
+    """Bootstrap the mean of every row of a NaN-padded array
+
+    Returns a (metrics, n_resamples) array. Rows with the same number of
+    samples share one (n_resamples, n) matrix of multinomial resample
+    weights, so each group reduces to a single matrix product. Every row is
+    still resampled with replacement from its own values only.
+    """
+    counts = np.count_nonzero(~np.isnan(samples), axis=1)
+    # Move the valid values of each row to the front
+    order = np.argsort(np.isnan(samples), axis=1, kind='stable')
+    packed = np.take_along_axis(samples, order, axis=1)
+
+    means = np.full((len(samples), n_resamples), np.nan)
+    for k in np.unique(counts):
+        if k == 0:
+            continue
+        rows = np.flatnonzero(counts == k)
+        weights = rng.multinomial(k, np.full(k, 1.0 / k), size=n_resamples)
+        means[rows] = packed[rows, :k] @ weights.T / k
+    return means
+
+
+def bootstrap_diff_ci(baseline, other, n_resamples=N_RESAMPLES, confidence=CONFIDENCE, seed=None):
+    """Percentile bootstrap CI of the percent difference of means, per metric
+
+    baseline and other are NaN-padded (metrics, n) arrays. Returns
+    (difference, ci_low, ci_high) arrays in percent of the baseline mean.
+    """
+    rng = np.random.default_rng(seed)
+    base_means = _bootstrap_means(baseline, n_resamples, rng)
+    other_means = _bootstrap_means(other, n_resamples, rng)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        diffs = (other_means - base_means) / base_means * 100
+        base = _row_means(baseline)
+        point = (_row_means(other) - base) / base * 100
+    tail = (1 - confidence) / 2 * 100
+    low, high = np.percentile(diffs, [tail, 100 - tail], axis=1)
+    return point, low, high
+
+
+def mann_whitney(a, b):
+    """Two-sided Mann-Whitney U test for every row of two NaN-padded arrays
+
+    Uses the normal approximation with tie and continuity corrections.
+    Returns (u_statistic, p_value) arrays; p is NaN where a row has no data.
+    """
+    pooled = np.concatenate([a, b], axis=1)
+    valid = ~np.isnan(pooled)
+    n1 = np.count_nonzero(~np.isnan(a), axis=1)
+    n2 = np.count_nonzero(~np.isnan(b), axis=1)
+    n = n1 + n2
+
+    # Midranks from pairwise comparisons: O(metrics * n^2) but fully batched
+    x = pooled[:, :, None]
+    y = pooled[:, None, :]
+    less = np.sum((y < x) & valid[:, None, :], axis=2)
+    equal = np.sum((y == x) & valid[:, None, :], axis=2)
+    ranks = less + (equal + 1) / 2.0
+
+    r1 = np.sum(np.where(valid[:, :a.shape[1]], ranks[:, :a.shape[1]], 0), axis=1)
+    u1 = r1 - n1 * (n1 + 1) / 2.0
+    mu = n1 * n2 / 2.0
+
+    # Each member of a tie group of size t contributes t^2 - 1, summing to t^3 - t
+    ties = np.sum(np.where(valid, equal.astype(float) ** 2 - 1, 0), axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sigma = np.sqrt(n1 * n2 / 12.0 * ((n + 1) - ties / (n * (n - 1))))
+        z = (np.abs(u1 - mu) - 0.5) / sigma
+    z = np.where(sigma > 0, np.maximum(z, 0), 0.0)
+    p = _erfc(z / math.sqrt(2)).astype(float)
+    p[(n1 == 0) | (n2 == 0)] = np.nan
+    return u1, p
+
+
+def compare_samples(baseline, other, n_resamples=N_RESAMPLES, confidence=CONFIDENCE,
+                    alpha=ALPHA, seed=None):
+    """Compare two {metric: [samples]} dicts across all shared metrics at once
+
+    Returns {metric: stats} with the means, percent difference, bootstrap CI,
+    Mann-Whitney p-value and whether the difference is significant, i.e.
+    p < alpha and the CI excludes zero.
+    """
+    metrics = [m for m in baseline if m in other]
+    if not metrics:
+        return {}
+    a = pad_samples([baseline[m] for m in metrics])
+    b = pad_samples([other[m] for m in metrics])
+
+    diff, low, high = bootstrap_diff_ci(a, b, n_resamples, confidence, seed)
+    _, p = mann_whitney(a, b)
+    significant = (p < alpha) & ((low > 0) | (high < 0))
+
+    a_means, b_means = _row_means(a), _row_means(b)
+    stats = {}
+    for i, metric in enumerate(metrics):
+        stats[metric] = {
+            'baseline_mean': float(a_means[i]),
+            'other_mean': float(b_means[i]),
+            'baseline_n': int(np.count_nonzero(~np.isnan(a[i]))),
+            'other_n': int(np.count_nonzero(~np.isnan(b[i]))),
+            'diff_pct': float(diff[i]),
+            'ci_low': float(low[i]),
+            'ci_high': float(high[i]),
+            'p_value': float(p[i]),
+            'significant': bool(significant[i]),
+        }
+    return stats
+
+
+# Resamples per platform for the N-way matrix. Each platform is resampled once,
+# independently of the others, and every pair reuses those resamples, so fewer
+# suffice than for one pair.
+MATRIX_RESAMPLES = 2000
+
+
+def _inverse_pct(diff_pct):
+    """Percent difference of a over b, given that of b over a"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return 100 / (1 + diff_pct / 100) - 100
+
+
+def compare_matrix(samples, n_resamples=MATRIX_RESAMPLES, confidence=CONFIDENCE, alpha=ALPHA, seed=None):
+    """Compare every platform with every other across all metrics at once
+
+    samples is {platform: {metric: [samples]}}; a metric a platform lacks is
+    NaN for it. The means of each platform's metrics are bootstrapped in one
+    batch, with resample weights drawn independently of every other
+    platform's as in compare_samples, and each pair of platforms reuses them. Returns a
+    dict with the platform and metric names and numpy arrays: means and
+    counts indexed [platform, metric], and ratio, diff_pct, ci_low, ci_high,
+    p_value and significant indexed [baseline, platform, metric], i.e. the
+    second platform relative to the first.
+    """
+    platforms = list(samples)
+    metrics = list(dict.fromkeys(m for p in platforms for m in samples[p]))
+    n_platforms, n_metrics = len(platforms), len(metrics)
+    rows = pad_samples([samples[p].get(m, ()) for p in platforms for m in metrics])
+    counts = np.count_nonzero(~np.isnan(rows), axis=1).reshape(n_platforms, n_metrics)
+    means = _row_means(rows).reshape(n_platforms, n_metrics)
+    packed = rows.reshape(n_platforms, n_metrics, -1)
+    # Shared weights across platforms would pair independent runs and cancel their noise
+    rng = np.random.default_rng(seed)
+    boot = np.stack([_bootstrap_means(packed[i], n_resamples, rng) for i in range(n_platforms)])
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = means[None, :, :] / means[:, None, :]
+    shape = (n_platforms, n_platforms, n_metrics)
+    low, high, p = np.full(shape, np.nan), np.full(shape, np.nan), np.full(shape, np.nan)
+    tail = (1 - confidence) / 2 * 100
+    # One baseline at a time keeps the resampled differences to (platforms, metrics, resamples)
+    for i in range(n_platforms - 1):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            diffs = (boot[i + 1:] - boot[i]) / boot[i] * 100
+        if n_resamples:
+            # Missing metrics give all-NaN rows; nanpercentile is far slower, so only use it then
+            percentile = np.nanpercentile if np.isnan(diffs).any() else np.percentile
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', RuntimeWarning)
+                lo, hi = percentile(diffs, [tail, 100 - tail], axis=2)
+            low[i, i + 1:], high[i, i + 1:] = lo, hi
+            # The difference of i over j falls as that of j over i rises, so the bounds swap
+            low[i + 1:, i], high[i + 1:, i] = _inverse_pct(hi), _inverse_pct(lo)
+        others = packed[i + 1:].reshape(-1, packed.shape[2])
+        _, pair_p = mann_whitney(np.tile(packed[i], (n_platforms - i - 1, 1)), others)
+        p[i, i + 1:] = p[i + 1:, i] = pair_p.reshape(n_platforms - i - 1, n_metrics)
+
+    significant = (p < alpha) & ((low > 0) | (high < 0))
+    return {
+        'platforms': platforms,
+        'metrics': metrics,
+        'means': means,
+        'counts': counts,
+        'ratio': ratio,
+        'diff_pct': (ratio - 1) * 100,
+        'ci_low': low,
+        'ci_high': high,
+        'p_value': p,
+        'significant': significant,
+    }
+
+
+def rank_platforms(means, lower_is_better):
+    """Platform indices of every metric from best to worst, missing values last
+
+    means is a (platforms, metrics) array and lower_is_better a boolean per
+    metric. Returns a (metrics, platforms) array.
+    """
+    score = np.where(np.asarray(lower_is_better)[None, :], means, -means)
+    return np.argsort(np.where(np.isnan(score), np.inf, score), axis=0, kind='stable').T
@@ -1,40 +1,50 @@
+import sys
+
 import plotly.graph_objects as go
-import pandas as pd
 import numpy as np
 
-# Create sample data for IOZone visualization
-# In a real scenario, we would parse the actual IOZone results
-file_sizes = [64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384]
-record_sizes = [4, 8, 16, 32, 64, 128, 256, 512, 1024]
-
-# Create a meshgrid for the 3D surface
-X, Y = np.meshgrid(record_sizes, file_sizes)
-
-# Create data that resembles IOZone results (would be replaced with actual parsed data)
-# This creates a pattern similar to the reference image
-np.random.seed(42)  # For reproducibility
-Z = np.zeros((len(file_sizes), len(record_sizes)))
-
-# Create a pattern that resembles the IOZone performance pattern in the reference image
-for i in range(len(file_sizes)):
-    for j in range(len(record_sizes)):
-        # Base performance that decreases with file size and increases with record size
-        base = 300000 - (i * 20000) + (j * 15000)
-        # Add some randomness
-        variation = np.random.randint(-50000, 50000)
-        # Add some peaks and valleys to mimic the reference image
-        if (i % 3 == 0 and j % 2 == 0) or (i % 2 == 0 and j % 3 == 0):
-            peak = 100000
-        else:
-            peak = 0
-        
-        Z[i, j] = max(50000, min(300000, base + variation + peak))
+from iozone_parser import parse_iozone_report
+from iozone_lod import lod_post_script, lod_surface, lod_trace
+from iozone_boundaries import boundary_lines, find_boundaries
+
+# Parse the real `iozone -a -R -O` reports written by run_iozone_tests.sh
+vm_report = sys.argv[1] if len(sys.argv) > 1 else '/shared/results/vm_iozone_results.txt'
+container_report = sys.argv[2] if len(sys.argv) > 2 else '/shared/results/container_iozone_results.txt'
+test = sys.argv[3] if len(sys.argv) > 3 else 'Writer'
+
+vm_surfaces, units = parse_iozone_report(vm_report)
+container_surfaces, container_units = parse_iozone_report(container_report)
+
+surface = vm_surfaces[test]
+file_sizes = surface.file_sizes
+record_sizes = surface.record_sizes
+Z = surface.values
+
+container_surface = container_surfaces[test]
+
+# Where throughput falls off the CPU cache and page cache cliffs on each platform
+vm_boundaries = find_boundaries(vm_surfaces, [test])
+container_boundaries = find_boundaries(container_surfaces, [test])
+
+
+def add_boundaries(fig, surface, boundaries):
+    """Trace each cliff across the surface along the last file size before it"""
+    for label, x, y, z in boundary_lines(surface, boundaries):
+        fig.add_trace(go.Scatter3d(x=x, y=y, z=z, mode='lines', name=label,
+                                   line={"color": "black", "width": 8}))
+    fig.update_layout(showlegend=bool(boundaries), legend={"x": 0, "y": 1})
+
+# Shared z range and contour spacing so both plots are directly comparable
+z_max = float(np.nanmax([np.nanmax(Z), np.nanmax(container_surface.values)]))
+contour_size = z_max / 12
+
+# Large sweeps open on a decimated mesh and load full-resolution tiles on zoom
+vm_lod = lod_surface(surface)
+container_lod = lod_surface(container_surface)
 
 # Create the 3D surface plot
 fig = go.Figure(data=[go.Surface(
-    z=Z,
-    x=record_sizes,
-    y=file_sizes,
+    **lod_trace(vm_lod, z_max),
     colorscale=[
         [0.0, 'rgb(51, 0, 102)'],     # Dark purple
         [0.1, 'rgb(102, 0, 153)'],    # Purple
@@ -50,17 +60,17 @@ fig = go.Figure(data=[go.Surface(
     ],
     opacity=0.9,
     contours = {
-        "z": {"show": True, "start": 50000, "end": 300000, "size": 25000, "color":"black", "width": 2}
+        "z": {"show": True, "start": 0, "end": z_max, "size": contour_size, "color":"black", "width": 2}
     }
 )])
 
 # Update the layout to match the reference image style
 fig.update_layout(
-    title='IOZone Write Performance',
+    title=f'IOZone {test} Performance (VM)',
     scene = {
         "xaxis": {"title": "Rec size (KB)", "type": "log", "dtick": 1},
         "yaxis": {"title": "File size (KB)", "type": "log", "dtick": 1},
-        "zaxis": {"title": "KB/sec", "range": [0, 350000]},
+        "zaxis": {"title": units, "range": [0, z_max * 1.05]},
         "aspectratio": {"x": 1, "y": 1, "z": 0.7},
         "camera": {"eye": {"x": -1.5, "y": -1.5, "z": 1}}
     },
@@ -90,23 +100,24 @@ fig.update_layout(
     }
 )
 
+add_boundaries(fig, surface, vm_boundaries)
+
 # Save the figure as HTML (interactive)
-fig.write_html('/home/ubuntu/cloud_performance_test/visualizations/iozone_3d_write_perf_interactive.html')
+fig.write_html('/home/ubuntu/cloud_performance_test/visualizations/iozone_3d_write_perf_interactive.html',
+               post_script=lod_post_script(vm_lod))
 
-# Save as image
+# Save as image, at full resolution
+fig.data[0].update(x=record_sizes, y=file_sizes, z=Z)
 fig.write_image('/home/ubuntu/cloud_performance_test/visualizations/iozone_3d_write_perf.png', scale=2)
 
 print("3D IOZone visualization created successfully!")
 
-# Create a similar visualization for container performance
-# Adjust the data to show slightly better performance for containers
-Z_container = Z * 1.1  # 10% better performance
+# Create the same visualization for container performance
+Z_container = container_surface.values
 
 # Create the container 3D surface plot
 fig_container = go.Figure(data=[go.Surface(
-    z=Z_container,
-    x=record_sizes,
-    y=file_sizes,
+    **lod_trace(container_lod, z_max),
     colorscale=[
         [0.0, 'rgb(51, 0, 102)'],     # Dark purple
         [0.1, 'rgb(102, 0, 153)'],    # Purple
@@ -122,17 +133,17 @@ fig_container = go.Figure(data=[go.Surface(
     ],
     opacity=0.9,
     contours = {
-        "z": {"show": True, "start": 50000, "end": 330000, "size": 25000, "color":"black", "width": 2}
+        "z": {"show": True, "start": 0, "end": z_max, "size": contour_size, "color":"black", "width": 2}
     }
 )])
 
 # Update the layout to match the reference image style
 fig_container.update_layout(
-    title='IOZone Write Performance (Container)',
+    title=f'IOZone {test} Performance (Container)',
     scene = {
         "xaxis": {"title": "Rec size (KB)", "type": "log", "dtick": 1},
         "yaxis": {"title": "File size (KB)", "type": "log", "dtick": 1},
-        "zaxis": {"title": "KB/sec", "range": [0, 350000]},
+        "zaxis": {"title": container_units, "range": [0, z_max * 1.05]},
         "aspectratio": {"x": 1, "y": 1, "z": 0.7},
         "camera": {"eye": {"x": -1.5, "y": -1.5, "z": 1}}
     },
@@ -162,10 +173,14 @@ fig_container.update_layout(
     }
 )
 
+add_boundaries(fig_container, container_surface, container_boundaries)
+
 # Save the container figure as HTML (interactive)
-fig_container.write_html('/home/ubuntu/cloud_performance_test/visualizations/iozone_3d_container_write_perf_interactive.html')
+fig_container.write_html('/home/ubuntu/cloud_performance_test/visualizations/iozone_3d_container_write_perf_interactive.html',
+                         post_script=lod_post_script(container_lod))
 
-# Save as image
+# Save as image, at full resolution
+fig_container.data[0].update(x=container_surface.record_sizes, y=container_surface.file_sizes, z=Z_container)
 fig_container.write_image('/home/ubuntu/cloud_performance_test/visualizations/iozone_3d_container_write_perf.png', scale=2)
 
 print("Container 3D IOZone visualization created successfully!")
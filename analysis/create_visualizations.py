@@ -1,130 +1,100 @@
-import matplotlib.pyplot as plt
-import numpy as np
-import pandas as pd
 import os
+import sys
 
-# Create directories for visualizations
-os.makedirs('/home/ubuntu/cloud_performance_test/visualizations', exist_ok=True)
+from iozone_parser import parse_iozone_report, align_surfaces
+from latency_hist import format_comparison, load_histograms, percentile_chart_job
+from render import figure_job, render_all
+from tool_parsers import load_results, platform_pair
 
-# Comparison of sysbench memory performance
-vm_memory = 4440.04  # MiB/sec from VM results
-container_memory = 4500.59  # MiB/sec from container results
+# Directory holding the raw result files
+results_dir = sys.argv[1] if len(sys.argv) > 1 else '/shared/results'
 
-# Create memory performance comparison
-labels = ['VM', 'Container']
-memory_values = [vm_memory, container_memory]
+# Create directories for visualizations
+output_dir = '/home/ubuntu/cloud_performance_test/visualizations'
+os.makedirs(output_dir, exist_ok=True)
 
-plt.figure(figsize=(10, 6))
-bars = plt.bar(labels, memory_values, color=['blue', 'orange'])
-plt.title('Memory Performance Comparison (Higher is Better)', fontsize=15)
-plt.ylabel('Memory Throughput (MiB/sec)', fontsize=12)
-plt.grid(axis='y', linestyle='--', alpha=0.7)
+jobs = []
 
-# Add value labels on top of bars
-for bar in bars:
-    height = bar.get_height()
-    plt.text(bar.get_x() + bar.get_width()/2., height + 20,
-             f'{height:.2f}', ha='center', fontsize=10)
+# sysbench, stress-ng and iperf results, recognised by content in the results directory
+tool_results = load_results(results_dir)
 
-plt.savefig('/home/ubuntu/cloud_performance_test/visualizations/memory_comparison.png', dpi=300, bbox_inches='tight')
-plt.close()
+# Comparison of sysbench memory performance
+memory = platform_pair(tool_results, 'sysbench_memory_throughput')  # MiB/sec
+
+# Create memory performance comparison
+if memory:
+    jobs.append(figure_job('bar', os.path.join(output_dir, 'memory_comparison.png'),
+                           {'labels': ['VM', 'Container'], 'values': memory},
+                           {'colors': ['blue', 'orange'], 'label_offset': 20, 'value_format': '{:.2f}',
+                            'title': 'Memory Performance Comparison (Higher is Better)',
+                            'ylabel': 'Memory Throughput (MiB/sec)'}))
+else:
+    print("No sysbench memory results for both platforms, skipping memory comparison")
 
 # Network performance comparison
-vm_network = 940  # Mbits/sec from VM results
-container_network = 980  # Mbits/sec from container results
-vm_jitter = 0.089  # ms from VM results
-container_jitter = 0.052  # ms from container results
+network = platform_pair(tool_results, 'iperf_tcp_bandwidth', 'iperf_udp_bandwidth')  # Mbits/sec
+jitter = platform_pair(tool_results, 'iperf_udp_jitter')  # ms, UDP runs only
 
 # Create network bandwidth comparison
-labels = ['VM', 'Container']
-network_values = [vm_network, container_network]
-
-plt.figure(figsize=(10, 6))
-bars = plt.bar(labels, network_values, color=['blue', 'orange'])
-plt.title('Network Bandwidth Comparison (Higher is Better)', fontsize=15)
-plt.ylabel('Bandwidth (Mbits/sec)', fontsize=12)
-plt.grid(axis='y', linestyle='--', alpha=0.7)
-
-# Add value labels on top of bars
-for bar in bars:
-    height = bar.get_height()
-    plt.text(bar.get_x() + bar.get_width()/2., height + 5,
-             f'{height:.0f}', ha='center', fontsize=10)
-
-plt.savefig('/home/ubuntu/cloud_performance_test/visualizations/network_bandwidth_comparison.png', dpi=300, bbox_inches='tight')
-plt.close()
+if network:
+    jobs.append(figure_job('bar', os.path.join(output_dir, 'network_bandwidth_comparison.png'),
+                           {'labels': ['VM', 'Container'], 'values': network},
+                           {'colors': ['blue', 'orange'], 'label_offset': 5, 'value_format': '{:.0f}',
+                            'title': 'Network Bandwidth Comparison (Higher is Better)',
+                            'ylabel': 'Bandwidth (Mbits/sec)'}))
+else:
+    print("No iperf results for both platforms, skipping bandwidth comparison")
 
 # Create network jitter comparison
-labels = ['VM', 'Container']
-jitter_values = [vm_jitter, container_jitter]
-
-plt.figure(figsize=(10, 6))
-bars = plt.bar(labels, jitter_values, color=['blue', 'orange'])
-plt.title('Network Jitter Comparison (Lower is Better)', fontsize=15)
-plt.ylabel('Jitter (ms)', fontsize=12)
-plt.grid(axis='y', linestyle='--', alpha=0.7)
-
-# Add value labels on top of bars
-for bar in bars:
-    height = bar.get_height()
-    plt.text(bar.get_x() + bar.get_width()/2., height + 0.005,
-             f'{height:.3f}', ha='center', fontsize=10)
-
-plt.savefig('/home/ubuntu/cloud_performance_test/visualizations/network_jitter_comparison.png', dpi=300, bbox_inches='tight')
-plt.close()
+if jitter:
+    jobs.append(figure_job('bar', os.path.join(output_dir, 'network_jitter_comparison.png'),
+                           {'labels': ['VM', 'Container'], 'values': jitter},
+                           {'colors': ['blue', 'orange'], 'label_offset': 0.005, 'value_format': '{:.3f}',
+                            'title': 'Network Jitter Comparison (Lower is Better)',
+                            'ylabel': 'Jitter (ms)'}))
+else:
+    print("No iperf UDP results for both platforms, skipping jitter comparison")
+
+# Latency percentiles (p50/p99/p99.9) from sysbench --histogram, iperf intervals and iozone -Q
+latency = load_histograms([results_dir])
+if {'VM', 'Container'} <= set(latency):
+    latency = {p: latency[p] for p in ('VM', 'Container')}
+    print(format_comparison(latency))
+    jobs.append(percentile_chart_job(latency, os.path.join(output_dir, 'latency_percentiles.png')))
+else:
+    print("No latency histograms for both platforms, skipping latency percentiles")
 
 # IOZone visualization (3D plot similar to the example image)
-# Create sample data for IOZone visualization
-# In a real scenario, we would parse the actual IOZone results
-file_sizes = [64, 128, 256, 512, 1024, 2048, 4096, 8192]
-record_sizes = [4, 8, 16, 32, 64, 128, 256, 512, 1024]
-
-# Create random data for demonstration (would be replaced with actual parsed data)
-np.random.seed(42)  # For reproducibility
-vm_write_perf = np.random.randint(50000, 300000, size=(len(file_sizes), len(record_sizes)))
-container_write_perf = vm_write_perf * np.random.uniform(0.9, 1.2, size=vm_write_perf.shape)
-
-# Create 3D visualization for VM IOZone write performance
-fig = plt.figure(figsize=(12, 8))
-ax = fig.add_subplot(111, projection='3d')
-
-x, y = np.meshgrid(np.arange(len(record_sizes)), np.arange(len(file_sizes)))
-surf = ax.plot_surface(x, y, vm_write_perf, cmap='viridis')
-
-ax.set_xlabel('Record Size (KB)')
-ax.set_ylabel('File Size (KB)')
-ax.set_zlabel('Write Performance (KB/sec)')
-ax.set_title('VM IOZone Write Performance')
-
-# Set custom x and y ticks
-ax.set_xticks(np.arange(len(record_sizes)))
-ax.set_yticks(np.arange(len(file_sizes)))
-ax.set_xticklabels(record_sizes)
-ax.set_yticklabels(file_sizes)
-
-fig.colorbar(surf, shrink=0.5, aspect=5)
-plt.savefig('/home/ubuntu/cloud_performance_test/visualizations/vm_iozone_write_perf.png', dpi=300, bbox_inches='tight')
-plt.close()
-
-# Create 3D visualization for Container IOZone write performance
-fig = plt.figure(figsize=(12, 8))
-ax = fig.add_subplot(111, projection='3d')
-
-surf = ax.plot_surface(x, y, container_write_perf, cmap='plasma')
-
-ax.set_xlabel('Record Size (KB)')
-ax.set_ylabel('File Size (KB)')
-ax.set_zlabel('Write Performance (KB/sec)')
-ax.set_title('Container IOZone Write Performance')
-
-# Set custom x and y ticks
-ax.set_xticks(np.arange(len(record_sizes)))
-ax.set_yticks(np.arange(len(file_sizes)))
-ax.set_xticklabels(record_sizes)
-ax.set_yticklabels(file_sizes)
-
-fig.colorbar(surf, shrink=0.5, aspect=5)
-plt.savefig('/home/ubuntu/cloud_performance_test/visualizations/container_iozone_write_perf.png', dpi=300, bbox_inches='tight')
-plt.close()
-
-print("Visualizations created successfully in /home/ubuntu/cloud_performance_test/visualizations/")
+# Parse the real `iozone -a -R -O` reports written by run_performance_tests.sh
+vm_iozone = os.path.join(results_dir, 'vm_iozone_results.txt')
+container_iozone = os.path.join(results_dir, 'container_iozone_results.txt')
+vm_surfaces, container_surfaces = {}, {}
+if os.path.exists(vm_iozone) and os.path.exists(container_iozone):
+    vm_surfaces, iozone_units = parse_iozone_report(vm_iozone)
+    container_surfaces, _ = parse_iozone_report(container_iozone)
+
+if 'Writer' in vm_surfaces and 'Writer' in container_surfaces:
+    # Compare the Writer surfaces on the file and record sizes both runs measured
+    file_sizes, record_sizes, vm_write_perf, container_write_perf = align_surfaces(
+        vm_surfaces['Writer'], container_surfaces['Writer'])
+
+    iozone_data = {'x_labels': record_sizes.tolist(), 'y_labels': file_sizes.tolist()}
+    iozone_style = {'figsize': (12, 8), 'xlabel': 'Record Size (KB)', 'ylabel': 'File Size (KB)',
+                    'zlabel': f'Write Performance ({iozone_units})'}
+
+    # Create 3D visualization for VM IOZone write performance
+    jobs.append(figure_job('surface3d', os.path.join(output_dir, 'vm_iozone_write_perf.png'),
+                           dict(iozone_data, z=vm_write_perf),
+                           dict(iozone_style, cmap='viridis', title='VM IOZone Write Performance')))
+
+    # Create 3D visualization for Container IOZone write performance
+    jobs.append(figure_job('surface3d', os.path.join(output_dir, 'container_iozone_write_perf.png'),
+                           dict(iozone_data, z=container_write_perf),
+                           dict(iozone_style, cmap='plasma', title='Container IOZone Write Performance')))
+else:
+    print("No IOZone Writer results for both platforms, skipping IOZone figures")
+
+# Render in parallel, skipping figures whose data and style are unchanged
+render_all(jobs)
+
+print(f"Visualizations created successfully in {output_dir}/")
@@ -0,0 +1,586 @@
+#!/usr/bin/env python3
+
+import argparse
+import http.client
+import json
+import math
+import os
+import queue
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+from live_metrics import RingBuffer
+from results_store import ResultsStore
+
+# Seconds between checks of the store's manifest for new segments
+POLL_INTERVAL = 1.0
+
+# Most recent (timestamp, value) points kept per aggregate for charts
+SERIES_CAPACITY = 1024
+
+# Seconds between SSE comments that keep idle streams open through proxies
+HEARTBEAT_SECONDS = 15.0
+
+# Updates queued for a browser before it is considered gone and dropped
+SUBSCRIBER_BACKLOG = 64
+
+# Recent request latencies kept for /api/stats
+LATENCY_SAMPLES = 8192
+
+# Encoded /api/aggregates responses kept for the current version, one per distinct query
+RESPONSE_CACHE_SIZE = 256
+
+AGGREGATE_COLUMNS = ['platform', 'benchmark', 'metric', 'count', 'mean', 'std', 'min', 'max', 'last',
+                     'last_time', 'version']
+
+
+class Aggregate:
+    """Running statistics and recent series of one (platform, benchmark, metric)"""
+
+    __slots__ = ('count', 'mean', 'm2', 'min', 'max', 'last', 'last_time', 'version', 'series')
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.last = math.nan
+        self.last_time = -math.inf
+        self.version = 0
+        self.series = RingBuffer(SERIES_CAPACITY, 2)
+
+    def merge(self, count, mean, m2, low, high, last, last_time, points, version):
+        """Fold in the statistics of a batch (Chan et al.'s pairwise variance update)"""
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.m2 += m2 + delta * delta * self.count * count / total
+        self.count = total
+        self.min = min(self.min, low)
+        self.max = max(self.max, high)
+        if last_time >= self.last_time:
+            self.last, self.last_time = last, last_time
+        self.series.extend(points)
+        self.version = version
+
+    def row(self, key):
+        std = math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else 0.0
+        return list(key) + [self.count, self.mean, std, self.min, self.max, self.last, self.last_time,
+                            self.version]
+
+
+class ResultsIndex:
+    """Aggregates of a results store kept in memory and updated as segments land
+
+    Only segments added since the last refresh are read, and each batch is
+    reduced per key with NumPy before it touches the aggregates. Every
+    refresh that changes anything bumps the version, and each aggregate
+    remembers the version it last changed in, so clients can ask for what
+    changed since the version they have.
+    """
+
+    def __init__(self, store, hosts=('',)):
+        self.store = store
+        self.hosts = set(hosts)
+        self.lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.aggregates = {}
+        self.segments = set()
+        self.rows = 0
+        self.version = getattr(self, 'version', 0)
+        self._manifest_mtime = None
+
+    def refresh(self):
+        """Read the segments that appeared since the last call; returns the changed keys"""
+        try:
+            mtime = os.stat(os.path.join(self.store.root, 'manifest.json')).st_mtime_ns
+        except FileNotFoundError:
+            return []
+        if mtime == self._manifest_mtime:
+            return []
+
+        segments = self.store.segments()
+        names = {s['name'] for s in segments}
+        try:
+            with self.lock:
+                if self.segments - names:
+                    # compact() merged segments that were already counted; start over
+                    self._reset()
+                new = [s for s in segments if s['name'] not in self.segments]
+                changed = self._ingest(new) if new else []
+                self.segments |= {s['name'] for s in new}
+        except FileNotFoundError:
+            # A compaction removed a segment between reading the manifest and its columns
+            with self.lock:
+                self._reset()
+            return []
+        self._manifest_mtime = mtime
+        return changed
+
+    def _ingest(self, segments):
+        dictionary = self.store.dictionary()
+        parts = [self.store.read_segment(s) for s in segments]
+        data = {c: np.concatenate([p[c] for p in parts]) for c in parts[0]}
+        hosts = [code for code, host in enumerate(dictionary['host']) if host in self.hosts]
+        keep = np.isin(data['host'], hosts) & np.isfinite(data['value'])
+        keys = np.column_stack([data['platform'], data['benchmark'], data['metric']])[keep]
+        times, values = data['timestamp'][keep], data['value'][keep]
+        if not len(values):
+            return []
+
+        # Rows grouped by key and in time order within each group
+        order = np.lexsort((times, keys[:, 2], keys[:, 1], keys[:, 0]))
+        keys, times, values = keys[order], times[order], values[order]
+        unique, starts, counts = np.unique(keys, axis=0, return_index=True, return_counts=True)
+        means = np.add.reduceat(values, starts) / counts
+        m2 = np.add.reduceat((values - np.repeat(means, counts)) ** 2, starts)
+        lows = np.minimum.reduceat(values, starts)
+        highs = np.maximum.reduceat(values, starts)
+        ends = starts + counts
+
+        self.version += 1
+        self.rows += len(values)
+        changed = []
+        for g, (platform, benchmark, metric) in enumerate(unique):
+            key = (dictionary['platform'][platform], dictionary['benchmark'][benchmark],
+                   dictionary['metric'][metric])
+            aggregate = self.aggregates.get(key)
+            if aggregate is None:
+                aggregate = self.aggregates[key] = Aggregate()
+            start, end = starts[g], ends[g]
+            aggregate.merge(int(counts[g]), float(means[g]), float(m2[g]), float(lows[g]), float(highs[g]),
+                            float(values[end - 1]), float(times[end - 1]),
+                            np.column_stack([times[start:end], values[start:end]]), self.version)
+            changed.append(key)
+        return changed
+
+    def rows_for(self, keys=None, platform=None, benchmark=None, metric=None, since=0):
+        """Aggregate rows, optionally only some keys, matching names, or changed after version since"""
+        with self.lock:
+            items = self.aggregates.items() if keys is None else ((k, self.aggregates[k]) for k in keys)
+            return [a.row(k) for k, a in items
+                    if a.version > since
+                    and (platform is None or k[0] == platform)
+                    and (benchmark is None or k[1] == benchmark)
+                    and (metric is None or k[2] == metric)]
+
+    def series(self, key, last=None):
+        """(timestamps, values) of an aggregate's recent points, or None for an unknown key"""
+        with self.lock:
+            aggregate = self.aggregates.get(key)
+            if aggregate is None:
+                return None
+            points = aggregate.series.view(last)
+        return points[:, 0], points[:, 1]
+
+
+class Broadcaster:
+    """Fan messages out to the open Server-Sent Events streams"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscribers = []
+
+    def subscribe(self):
+        q = queue.Queue(SUBSCRIBER_BACKLOG)
+        with self.lock:
+            self.subscribers.append(q)
+        return q
+
+    def unsubscribe(self, q):
+        with self.lock:
+            if q in self.subscribers:
+                self.subscribers.remove(q)
+
+    def publish(self, message):
+        with self.lock:
+            subscribers = list(self.subscribers)
+        for q in subscribers:
+            try:
+                q.put_nowait(message)
+            except queue.Full:
+                # The browser stopped reading; it refetches everything when it reconnects
+                self.unsubscribe(q)
+
+
+def encode_json(data):
+    return json.dumps(data, separators=(',', ':'), allow_nan=False).encode()
+
+
+def finite(row):
+    """A row with NaN and infinity as None, which JSON has no literal for"""
+    return [None if isinstance(v, float) and not math.isfinite(v) else v for v in row]
+
+
+def aggregates_payload(index, rows):
+    return {'version': index.version, 'columns': AGGREGATE_COLUMNS, 'rows': [finite(r) for r in rows]}
+
+
+def watch(index, broadcaster, interval=POLL_INTERVAL, stop=None):
+    """Poll the store and push changed aggregates to every open stream"""
+    stop = stop or threading.Event()
+    while not stop.wait(interval):
+        changed = index.refresh()
+        if changed:
+            payload = encode_json(aggregates_payload(index, index.rows_for(changed)))
+            broadcaster.publish(b'event: update\ndata: ' + payload + b'\n\n')
+
+
+class DashboardHandler(BaseHTTPRequestHandler):
+    """Routes of the dashboard; the server carries the index, broadcaster and caches"""
+
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out in separate writes; with Nagle's algorithm every
+    # keep-alive response would wait for the client's delayed ACK
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send(self, body, content_type, headers=()):
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Cache-Control', 'no-cache')
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _error(self, status, message):
+        body = encode_json({'error': message})
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        start = time.perf_counter()
+        url = urlsplit(self.path)
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        route = ROUTES.get(url.path)
+        if route is None:
+            self._error(404, f"no such path: {url.path}")
+            return
+        try:
+            route(self, params)
+        except ValueError as e:
+            self._error(400, str(e))
+        if url.path != '/events':
+            self.server.record_latency(time.perf_counter() - start)
+
+    def index_page(self, params):
+        self._send(DASHBOARD_PAGE.encode(), 'text/html; charset=utf-8')
+
+    def aggregates(self, params):
+        index = self.server.index
+        # Responses only change with the version, so each distinct query is encoded once per version
+        version = index.version
+        body = self.server.cached_response(self.path, version)
+        if body is None:
+            since = int(params.get('since', 0))
+            rows = index.rows_for(platform=params.get('platform'), benchmark=params.get('benchmark'),
+                                  metric=params.get('metric'), since=since)
+            body = encode_json(aggregates_payload(index, rows))
+            self.server.cache_response(self.path, version, body)
+        self._send(body, 'application/json')
+
+    def series(self, params):
+        try:
+            key = (params['platform'], params['benchmark'], params['metric'])
+        except KeyError as e:
+            raise ValueError(f"missing parameter: {e.args[0]}")
+        last = int(params['last']) if 'last' in params else None
+        points = self.server.index.series(key, last)
+        if points is None:
+            self._error(404, f"no results for {'/'.join(key)}")
+            return
+        times, values = points
+        if params.get('format', 'bin') == 'json':
+            self._send(encode_json({'t': times.tolist(), 'v': finite(values.tolist())}), 'application/json')
+        else:
+            # float64 timestamps then float32 values, little-endian: 12 bytes per point
+            body = times.astype('<f8').tobytes() + values.astype('<f4').tobytes()
+            self._send(body, 'application/octet-stream', [('X-Count', str(len(times)))])
+
+    def stats(self, params):
+        server = self.server
+        with server.latency_lock:
+            latencies = server.latencies.view()[:, 0] * 1000
+        p50, p99 = np.percentile(latencies, [50, 99]) if len(latencies) else (0.0, 0.0)
+        index = server.index
+        self._send(encode_json({
+            'version': index.version, 'rows': index.rows, 'aggregates': len(index.aggregates),
+            'segments': len(index.segments), 'streams': len(server.broadcaster.subscribers),
+            'requests': server.latencies.count, 'p50_ms': float(p50), 'p99_ms': float(p99),
+        }), 'application/json')
+
+    def events(self, params):
+        q = self.server.broadcaster.subscribe()
+        try:
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Cache-Control', 'no-cache')
+            self.send_header('Connection', 'close')
+            self.end_headers()
+            self.close_connection = True
+            self.wfile.write(f'event: hello\ndata: {self.server.index.version}\n\n'.encode())
+            self.wfile.flush()
+            while not self.server.stopping.is_set():
+                try:
+                    message = q.get(timeout=HEARTBEAT_SECONDS)
+                except queue.Empty:
+                    message = b': keep-alive\n\n'
+                self.wfile.write(message)
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            self.server.broadcaster.unsubscribe(q)
+
+
+ROUTES = {
+    '/': DashboardHandler.index_page,
+    '/api/aggregates': DashboardHandler.aggregates,
+    '/api/series': DashboardHandler.series,
+    '/api/stats': DashboardHandler.stats,
+    '/events': DashboardHandler.events,
+}
+
+
+class DashboardServer(ThreadingHTTPServer):
+    """HTTP server over a ResultsIndex, refreshed by a background watcher"""
+
+    daemon_threads = True
+
+    def __init__(self, address, index, interval=POLL_INTERVAL, verbose=False):
+        super().__init__(address, DashboardHandler)
+        self.index = index
+        self.verbose = verbose
+        self.broadcaster = Broadcaster()
+        self.responses = {}
+        self.responses_version = None
+        self.responses_lock = threading.Lock()
+        self.latencies = RingBuffer(LATENCY_SAMPLES, 1)
+        self.latency_lock = threading.Lock()
+        self.stopping = threading.Event()
+        index.refresh()
+        self.watcher = threading.Thread(target=watch, args=(index, self.broadcaster, interval, self.stopping),
+                                        daemon=True)
+        self.watcher.start()
+
+    def cached_response(self, path, version):
+        """Encoded response of a path at this index version, or None"""
+        with self.responses_lock:
+            return self.responses.get(path) if version == self.responses_version else None
+
+    def cache_response(self, path, version, body):
+        """Remember a response; a newer version drops every older one, and the oldest go past the cap"""
+        with self.responses_lock:
+            if version != self.responses_version:
+                if self.responses_version is not None and version < self.responses_version:
+                    return
+                self.responses = {}
+                self.responses_version = version
+            self.responses[path] = body
+            while len(self.responses) > RESPONSE_CACHE_SIZE:
+                del self.responses[next(iter(self.responses))]
+
+    def record_latency(self, seconds):
+        with self.latency_lock:
+            self.latencies.append([seconds])
+
+    def server_close(self):
+        self.stopping.set()
+        super().server_close()
+
+
+# Single-page view: the aggregates table, updated from the event stream, and a
+# chart of the selected row's recent points read from the binary series endpoint
+DASHBOARD_PAGE = """<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="utf-8">
+    <title>Benchmark Results</title>
+    <style>
+        body { font-family: Arial, sans-serif; margin: 20px; }
+        table { border-collapse: collapse; width: 100%; }
+        th, td { border: 1px solid #ddd; padding: 4px 8px; text-align: right; }
+        th { background-color: #f2f2f2; }
+        td:nth-child(-n+3) { text-align: left; }
+        tr.changed { background-color: #fff6c8; }
+        tr:hover { cursor: pointer; background-color: #eef; }
+        #status { color: #777; }
+    </style>
+</head>
+<body>
+    <h1>Benchmark Results</h1>
+    <p>Benchmark <select id="benchmark"><option value="">all</option></select>
+       <span id="status">connecting</span></p>
+    <canvas id="chart" width="900" height="200"></canvas>
+    <table id="aggregates"></table>
+    <script>
+        var columns = [], rows = {}, version = 0, selected = null;
+        var shown = ['platform', 'benchmark', 'metric', 'count', 'mean', 'std', 'min', 'max', 'last'];
+        function key(r) { return r[0] + '\\u0000' + r[1] + '\\u0000' + r[2]; }
+        function apply(data, highlight) {
+            columns = data.columns;
+            version = Math.max(version, data.version);
+            data.rows.forEach(function (r) { rows[key(r)] = {row: r, changed: highlight}; });
+            draw();
+        }
+        function draw() {
+            var filter = document.getElementById('benchmark').value;
+            var table = document.getElementById('aggregates');
+            var select = document.getElementById('benchmark');
+            var benchmarks = {};
+            table.innerHTML = '<tr>' + shown.map(function (c) { return '<th>' + c + '</th>'; }).join('') + '</tr>';
+            Object.keys(rows).sort().forEach(function (k) {
+                var r = rows[k].row;
+                benchmarks[r[1]] = true;
+                if (filter && r[1] !== filter) return;
+                var tr = table.insertRow();
+                if (rows[k].changed) tr.className = 'changed';
+                shown.forEach(function (c) {
+                    var v = r[columns.indexOf(c)];
+                    tr.insertCell().textContent = typeof v === 'number' && c !== 'count' ? v.toPrecision(4) : v;
+                });
+                tr.onclick = function () { selected = r; chart(); };
+            });
+            Object.keys(benchmarks).sort().forEach(function (b) {
+                if (![].some.call(select.options, function (o) { return o.value === b; })) select.add(new Option(b, b));
+            });
+        }
+        function chart() {
+            if (!selected) return;
+            var q = 'platform=' + encodeURIComponent(selected[0]) + '&benchmark=' + encodeURIComponent(selected[1]) +
+                    '&metric=' + encodeURIComponent(selected[2]) + '&last=500';
+            fetch('/api/series?' + q).then(function (r) { return r.arrayBuffer(); }).then(function (buf) {
+                var n = buf.byteLength / 12, t = new Float64Array(buf, 0, n), v = new Float32Array(buf, n * 8, n);
+                var canvas = document.getElementById('chart'), ctx = canvas.getContext('2d');
+                ctx.clearRect(0, 0, canvas.width, canvas.height);
+                if (!n) return;
+                var lo = Math.min.apply(null, v), hi = Math.max.apply(null, v), span = (hi - lo) || 1;
+                ctx.beginPath();
+                for (var i = 0; i < n; i++) {
+                    var x = n > 1 ? i / (n - 1) * (canvas.width - 20) + 10 : canvas.width / 2;
+                    var y = canvas.height - 10 - (v[i] - lo) / span * (canvas.height - 20);
+                    i ? ctx.lineTo(x, y) : ctx.moveTo(x, y);
+                }
+                ctx.stroke();
+                ctx.fillText(selected.slice(0, 3).join(' / ') + '  ' + lo.toPrecision(4) + ' .. ' + hi.toPrecision(4), 10, 12);
+            });
+        }
+        function connect() {
+            var source = new EventSource('/events');
+            source.addEventListener('hello', function () {
+                // Catch up on anything missed while disconnected
+                fetch('/api/aggregates?since=' + version).then(function (r) { return r.json(); }).then(function (d) { apply(d, false); });
+                document.getElementById('status').textContent = 'live';
+            });
+            source.addEventListener('update', function (e) {
+                apply(JSON.parse(e.data), true);
+                if (selected) chart();
+            });
+            source.onerror = function () { document.getElementById('status').textContent = 'reconnecting'; };
+        }
+        document.getElementById('benchmark').onchange = draw;
+        connect();
+    </script>
+</body>
+</html>
+"""
+
+
+def probe(url, requests):
+    """Client-side latencies (ms) of typical queries against a running dashboard
+
+    Cycles through the full aggregates, one benchmark's aggregates, an
+    incremental query and a binary series over one keep-alive connection.
+    Returns {query kind: array of milliseconds}.
+    """
+    parts = urlsplit(url)
+    conn = http.client.HTTPConnection(parts.hostname, parts.port)
+
+    def get(path):
+        conn.request('GET', path)
+        response = conn.getresponse()
+        return response.read()
+
+    first = json.loads(get('/api/aggregates'))
+    if not first['rows']:
+        raise ValueError("the store has no results to query")
+    platform, benchmark, metric = first['rows'][0][:3]
+    queries = {
+        'all': '/api/aggregates',
+        'benchmark': f'/api/aggregates?benchmark={benchmark}',
+        'since': f"/api/aggregates?since={first['version']}",
+        'series': f'/api/series?platform={platform}&benchmark={benchmark}&metric={metric}&last=500',
+    }
+    timings = {name: [] for name in queries}
+    for i in range(requests):
+        name = list(queries)[i % len(queries)]
+        start = time.perf_counter()
+        get(queries[name])
+        timings[name].append((time.perf_counter() - start) * 1000)
+    conn.close()
+    return {name: np.array(t) for name, t in timings.items()}
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        description="Serve live aggregates of a results store, with updates pushed to open browsers")
+    parser.add_argument('store', help="Results store directory (see results_store.py)")
+    parser.add_argument('--host', default='127.0.0.1', help="Address to listen on (default: %(default)s)")
+    parser.add_argument('--port', type=int, default=8050, help="Port (default: %(default)s)")
+    parser.add_argument('--interval', type=float, default=POLL_INTERVAL,
+                        help="Seconds between checks for new results (default: %(default)s)")
+    parser.add_argument('--result-host', action='append', default=None,
+                        help="Only results of this host; live samples carry their step's target "
+                             "while final results have none (default: '')")
+    parser.add_argument('--probe', type=int, default=None, metavar='N',
+                        help="Serve on a free port, time N typical queries, print p50/p99 and exit")
+    parser.add_argument('--verbose', action='store_true', help="Log every request")
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_args(sys.argv[1:])
+    start = time.perf_counter()
+    index = ResultsIndex(ResultsStore(args.store), args.result_host or [''])
+    server = DashboardServer((args.host, 0 if args.probe else args.port), index, args.interval, args.verbose)
+    print(f"{index.rows} results in {len(index.aggregates)} aggregates loaded in "
+          f"{time.perf_counter() - start:.2f}s")
+
+    if args.probe:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        host, port = server.server_address[:2]
+        timings = probe(f'http://{host}:{port}', args.probe)
+        for name, ms in timings.items():
+            print(f"{name:<10} {len(ms):>6} requests  p50 {np.percentile(ms, 50):7.3f} ms  "
+                  f"p99 {np.percentile(ms, 99):7.3f} ms")
+        server.shutdown()
+        server.server_close()
+        return
+
+    print(f"Serving {args.store} on http://{args.host}:{args.port}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+
+import hashlib
+import os
+import random
+import sys
+import time
+
+# Stand-in for iozone in throughput mode (-t): runs nothing, and prints iozone's
+# throughput report with rates from a simple model of a shared filesystem.
+# Children on the same client (a -+m line's host) share that client's link, and
+# every child shares the server, which loses efficiency as concurrent streams
+# make its disk seek between files. Tuning the model:
+#   FAKE_IOZONE_CHILD_MBPS    fastest single stream in MB/s (default 300)
+#   FAKE_IOZONE_CLIENT_MBPS   link per -+m client in MB/s (default 115, gigabit NFS)
+#   FAKE_IOZONE_SERVER_MBPS   server write rate in MB/s; reads get 1.5x (default 250)
+#   FAKE_IOZONE_CONTENTION    server efficiency lost per extra stream (default 0.03)
+#   FAKE_IOZONE_NOISE         relative run-to-run noise (default 0.02)
+#   FAKE_IOZONE_SLEEP         fraction of the modelled run time to actually sleep (default 0)
+
+# Tests each -i number runs, and whether they read
+TESTS = {
+    0: [('initial writers', False), ('rewriters', False)],
+    1: [('readers', True), ('re-readers', True)],
+    2: [('random readers', True), ('random writers', False)],
+}
+
+SIZE_UNITS = {'k': 1, 'm': 1024, 'g': 1024 ** 2}
+
+
+def env_float(name, default):
+    return float(os.environ.get(name, default))
+
+
+def size_kb(text):
+    """iozone size argument in KB, e.g. 1g, 512m or a bare 4096"""
+    text = text.lower()
+    if text[-1] in SIZE_UNITS:
+        return int(float(text[:-1]) * SIZE_UNITS[text[-1]])
+    # Like iozone, a number without a unit is already in KB
+    return int(text)
+
+
+def parse_args(argv):
+    options = {'children': 1, 'size': 512, 'record': 4, 'tests': [], 'machines': None, 'per_child': False}
+    i = 0
+    while i < len(argv):
+        arg = argv[i]
+        if arg == '-t':
+            options['children'] = int(argv[i + 1])
+        elif arg == '-s':
+            options['size'] = size_kb(argv[i + 1])
+        elif arg == '-r':
+            options['record'] = size_kb(argv[i + 1])
+        elif arg == '-i':
+            options['tests'].append(int(argv[i + 1]))
+        elif arg == '-+m':
+            options['machines'] = argv[i + 1]
+        elif arg == '-C':
+            options['per_child'] = True
+            i -= 1
+        elif arg == '-F':
+            # File names up to the next option
+            while i + 1 < len(argv) and not argv[i + 1].startswith('-'):
+                i += 1
+            i -= 1
+        else:
+            i -= 1
+        i += 2
+    return options
+
+
+def child_hosts(options):
+    """Client each child runs on; forked local children all share this machine"""
+    if not options['machines']:
+        return ['localhost'] * options['children']
+    with open(options['machines']) as f:
+        hosts = [line.split()[0] for line in f if line.strip()]
+    if len(hosts) < options['children']:
+        print(f"Error: {options['children']} children need {options['children']} lines in {options['machines']}")
+        sys.exit(1)
+    return hosts[:options['children']]
+
+
+def model_rates(hosts, reads, distributed):
+    """Modelled kB/sec of every child running concurrently"""
+    stream = env_float('FAKE_IOZONE_CHILD_MBPS', 300)
+    link = env_float('FAKE_IOZONE_CLIENT_MBPS', 115)
+    server = env_float('FAKE_IOZONE_SERVER_MBPS', 250) * (1.5 if reads else 1.0)
+    contention = env_float('FAKE_IOZONE_CONTENTION', 0.03) * (0.5 if reads else 1.0)
+
+    # Each child gets its client's fair share of the link, capped by a single stream
+    per_host = {h: hosts.count(h) for h in hosts}
+    rates = [min(stream, link / per_host[h]) if distributed else stream for h in hosts]
+    # The server then scales everyone down when it is the bottleneck
+    capacity = server * max(0.2, 1 - contention * (len(hosts) - 1))
+    if sum(rates) > capacity:
+        rates = [r * capacity / sum(rates) for r in rates]
+    return [r * 1024 for r in rates]
+
+
+def main():
+    options = parse_args(sys.argv[1:])
+    hosts = child_hosts(options)
+    noise = env_float('FAKE_IOZONE_NOISE', 0.02)
+    sleep = env_float('FAKE_IOZONE_SLEEP', 0)
+    children = options['children']
+
+    print("\tIozone: Performance Test of File I/O")
+    print("\t        Version $Revision: 3.489 $ (modelled by fake_iozone.py)")
+    print()
+    print(f"\tCommand line used: iozone {' '.join(sys.argv[1:])}")
+    print("\tOutput is in kBytes/sec")
+    print(f"\tThroughput test with {children} processes")
+    print(f"\tEach process writes a {options['size']} kByte file in {options['record']} kByte records")
+    print()
+
+    for number in sorted(set(options['tests'] or [0])):
+        for label, reads in TESTS.get(number, []):
+            # Noise is reproducible per configuration and seed
+            key = f"{os.environ.get('FAKE_IOZONE_SEED', '0')}:{label}:{','.join(hosts)}"
+            rng = random.Random(hashlib.sha256(key.encode()).digest())
+            rates = [r * (1 + rng.gauss(0, noise)) for r in model_rates(hosts, reads, bool(options['machines']))]
+            # Children start a little apart, so the parent's view is a bit slower
+            parent = sum(rates) * (1 - 0.01 * children)
+            seconds = options['size'] / min(rates)
+            if sleep:
+                time.sleep(seconds * sleep)
+
+            print(f"\tChildren see throughput for {children:>2} {label:<16}\t= {sum(rates):>11.2f} kB/sec")
+            print(f"\tParent sees throughput for {children:>2} {label:<16}\t= {parent:>11.2f} kB/sec")
+            print(f"\tMin throughput per process \t\t\t= {min(rates):>11.2f} kB/sec ")
+            print(f"\tMax throughput per process \t\t\t= {max(rates):>11.2f} kB/sec")
+            print(f"\tAvg throughput per process \t\t\t= {sum(rates) / children:>11.2f} kB/sec")
+            print(f"\tMin xfer \t\t\t\t\t= {options['size']:>11.2f} kB")
+            if options['per_child']:
+                for i, rate in enumerate(rates):
+                    print(f"\tChild[{i}] xfer count = {options['size']:>11.2f} kB, Throughput = {rate:>11.2f} kB/sec, "
+                          f"wall={options['size'] / rate:>7.3f}, cpu={options['size'] / rate * 0.1:>6.3f}, %=10.00")
+            print()
+    print()
+    print("iozone test complete.")
+
+
+if __name__ == "__main__":
+    main()
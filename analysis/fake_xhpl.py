@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+
+import hashlib
+import itertools
+import math
+import os
+import random
+import sys
+import time
+
+# Stand-in for HPL's xhpl: reads HPL.dat, runs nothing, and prints HPL-style
+# result lines with GFLOPS from a simple performance model. Tuning the model:
+#   FAKE_XHPL_PEAK    peak GFLOPS per rank (default 20)
+#   FAKE_XHPL_NB      block size the modelled cache likes best (default 224)
+#   FAKE_XHPL_MEMORY  MB available per rank (default 1024)
+#   FAKE_XHPL_NOISE   relative run-to-run noise (default 0.01)
+#   FAKE_XHPL_SLEEP   fraction of the modelled run time to actually sleep (default 0)
+
+PFACT_EFFICIENCY = {0: 0.97, 1: 0.985, 2: 1.0}
+BCAST_EFFICIENCY = {0: 0.98, 1: 1.0, 2: 0.985, 3: 0.99, 4: 0.97, 5: 0.975}
+FACT_LETTERS = 'LCR'
+
+
+def env_float(name, default):
+    return float(os.environ.get(name, default))
+
+
+def read_hpl_dat(path):
+    """The value lists of an HPL.dat (or hpccinf.txt) input file"""
+    with open(path) as f:
+        lines = f.read().splitlines()
+
+    def values(count_line, value_line=None):
+        # A count line is followed by its values, except Qs which share the grid count
+        count = int(lines[count_line].split()[0])
+        return [int(v) for v in lines[value_line or count_line + 1].split()[:count]]
+
+    return {
+        'ns': values(4),
+        'nbs': values(6),
+        'pmap': int(lines[8].split()[0]),
+        'ps': values(9),
+        'qs': values(9, 11),
+        'pfacts': values(13),
+        'nbmins': values(15),
+        'ndivs': values(17),
+        'rfacts': values(19),
+        'bcasts': values(21),
+        'depths': values(23),
+    }
+
+
+def model_gflops(n, nb, p, q, pfact, bcast, depth):
+    """Modelled HPL rate: peak scaled by blocking, size, grid shape and algorithm choices"""
+    ranks = p * q
+    best_nb = env_float('FAKE_XHPL_NB', 224)
+    e_nb = 0.55 + 0.45 * math.exp(-math.log2(nb / best_nb) ** 2 / 0.5)
+    # Small problems spend proportionally more time in panel factorization
+    e_n = n / (n + 8 * nb * math.sqrt(ranks))
+    e_grid = 1.0
+    if ranks > 1:
+        e_grid = 1 - 0.04 * abs(math.log2(q / p)) - (0.03 if p > q else 0)
+    e_depth = 0.95 if depth == 0 else 1.0
+    return (env_float('FAKE_XHPL_PEAK', 20) * ranks * e_nb * e_n * e_grid
+            * PFACT_EFFICIENCY.get(pfact, 0.96) * BCAST_EFFICIENCY.get(bcast, 0.97) * e_depth)
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else 'HPL.dat'
+    if not os.path.exists(path):
+        print(f"HPL ERROR: cannot open file {path}")
+        sys.exit(1)
+    dat = read_hpl_dat(path)
+    memory = env_float('FAKE_XHPL_MEMORY', 1024) * 1024 * 1024
+    noise = env_float('FAKE_XHPL_NOISE', 0.01)
+    sleep = env_float('FAKE_XHPL_SLEEP', 0)
+
+    print("=" * 80)
+    print("HPLinpack 2.3  --  High-Performance Linpack benchmark (modelled by fake_xhpl.py)")
+    print("=" * 80)
+    print(f"{'T/V':<10}{'N':>10}{'NB':>6}{'P':>6}{'Q':>6}{'Time':>19}{'Gflops':>23}")
+    print("-" * 80)
+
+    status = 0
+    grids = list(zip(dat['ps'], dat['qs']))
+    for n, nb, (p, q), pfact, nbmin, ndiv, rfact, bcast, depth in itertools.product(
+            dat['ns'], dat['nbs'], grids, dat['pfacts'], dat['nbmins'], dat['ndivs'],
+            dat['rfacts'], dat['bcasts'], dat['depths']):
+        if 8.0 * n * n / (p * q) > memory:
+            print(f"HPL ERROR: Memory allocation failed for A, x and b (N={n}, P={p}, Q={q})")
+            status = 1
+            continue
+
+        # Noise is reproducible per configuration and seed
+        key = f"{os.environ.get('FAKE_XHPL_SEED', '0')}:{n}:{nb}:{p}:{q}:{pfact}:{bcast}:{depth}"
+        rng = random.Random(hashlib.sha256(key.encode()).digest())
+        gflops = model_gflops(n, nb, p, q, pfact, bcast, depth) * (1 + rng.gauss(0, noise))
+        seconds = (2.0 / 3.0 * n ** 3 + 2.0 * n ** 2) / (gflops * 1e9)
+        if sleep:
+            time.sleep(seconds * sleep)
+
+        variant = (f"W{'R' if dat['pmap'] == 0 else 'C'}{depth}{bcast}{FACT_LETTERS[rfact]}{ndiv}"
+                   f"{FACT_LETTERS[pfact]}{nbmin}")
+        print(f"{variant:<10}{n:>10}{nb:>6}{p:>6}{q:>6}{seconds:>19.2f}{gflops:>23.4e}")
+        print("-" * 80)
+        print("||Ax-b||_oo/(eps*(||A||_oo*||x||_oo+||b||_oo)*N)=   3.12345678e-03 ...... PASSED")
+        print("=" * 80)
+    sys.exit(status)
+
+
+if __name__ == "__main__":
+    main()
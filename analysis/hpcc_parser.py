@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+
+import mmap
+import os
+import sys
+from collections import namedtuple
+
+# Markers that delimit the key=value block at the end of hpccoutf.txt
+SUMMARY_BEGIN = b'Begin of Summary section.'
+SUMMARY_END = b'End of Summary section.'
+
+# One key=value pair from a summary section. `section` is the 0-based index
+# of the summary block within the file (a log can hold several runs).
+SummaryRecord = namedtuple('SummaryRecord', ['section', 'key', 'value'])
+
+# Summary keys mapped onto the metric names used by the rest of the analysis,
+# with the factor that converts them to the legacy units (GFLOPS, MB/s)
+LEGACY_METRICS = {
+    'HPL_Tflops': ('HPL_GFLOPS', 1000.0),
+    'StarSTREAM_Copy': ('STREAM_Copy', 1000.0),
+    'StarSTREAM_Scale': ('STREAM_Scale', 1000.0),
+    'StarSTREAM_Add': ('STREAM_Add', 1000.0),
+    'StarSTREAM_Triad': ('STREAM_Triad', 1000.0),
+    'MPIRandomAccess_GUPs': ('RandomAccess_GUPS', 1.0),
+    'PTRANS_GBs': ('PTRANS_GBs', 1.0),
+    'MPIFFT_Gflops': ('FFT_GFLOPS', 1.0),
+}
+
+
+def convert_value(raw):
+    """Convert a summary value to int, float or str"""
+    try:
+        return int(raw)
+    except ValueError:
+        pass
+    try:
+        return float(raw)
+    except ValueError:
+        return raw
+
+
+def _parse_block(block, section):
+    """Yield records for the key=value lines of one summary block"""
+    for line in block.splitlines():
+        key, sep, raw = line.partition(b'=')
+        if not sep:
+            continue
+        key = key.strip().decode('ascii', 'replace')
+        raw = raw.strip().decode('ascii', 'replace')
+        if key:
+            yield SummaryRecord(section, key, convert_value(raw))
+
+
+def iter_summary_records(file_path):
+    """Yield every key=value pair from the summary sections of an HPCC log
+
+    The file is memory-mapped and scanned once: the kernel pages the log in
+    and out as needed, so resident memory stays bounded regardless of size.
+    """
+    with open(file_path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            section = 0
+            pos = mm.find(SUMMARY_BEGIN)
+            while pos != -1:
+                start = pos + len(SUMMARY_BEGIN)
+                end = mm.find(SUMMARY_END, start)
+                if end == -1:
+                    # Truncated log: take whatever was written
+                    end = len(mm)
+                yield from _parse_block(mm[start:end], section)
+                section += 1
+                pos = mm.find(SUMMARY_BEGIN, end)
+
+
+def parse_hpcc_summary(file_path):
+    """Parse all summary sections of an HPCC log into a list of dicts
+
+    An empty section before a filled one is kept as {} so indexes match the
+    log; empty sections at the end are left out.
+    """
+    sections = []
+    for record in iter_summary_records(file_path):
+        while len(sections) <= record.section:
+            sections.append({})
+        sections[record.section][record.key] = record.value
+    return sections
+
+
+def legacy_metrics(summary):
+    """Map one summary dict onto the metric names used by analyze_hpcc"""
+    results = {}
+    for key, (name, factor) in LEGACY_METRICS.items():
+        value = summary.get(key)
+        if isinstance(value, (int, float)):
+            results[name] = value * factor
+    return results
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: python hpcc_parser.py <hpccoutf.txt> [...]")
+        sys.exit(1)
+
+    for file_path in sys.argv[1:]:
+        for record in iter_summary_records(file_path):
+            print(f"{file_path}\t{record.section}\t{record.key}\t{record.value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+
+import argparse
+import csv
+import math
+import os
+import random
+import re
+import subprocess
+import sys
+import time
+from collections import namedtuple
+
+# One HPL configuration; n is filled in per rung of the search
+HPLConfig = namedtuple('HPLConfig', ['n', 'nb', 'p', 'q', 'pfact', 'bcast', 'depth'])
+
+# Search space
+NB_CHOICES = [64, 96, 128, 160, 192, 224, 256, 320, 384]
+PFACT_CHOICES = [0, 1, 2]
+BCAST_CHOICES = [0, 1, 2, 3, 4, 5]
+DEPTH_CHOICES = [0, 1]
+
+# Share of the memory per rank given to the N x N matrix; the rest is left to the OS and MPI
+MEMORY_FRACTION = 0.8
+
+# Successive halving: keep 1/ETA of the configurations per rung and double N
+ETA = 3
+DEFAULT_BUDGET = 60
+
+# Smallest problem used for a short run; below this timings are mostly noise
+MIN_SHORT_N = 2000
+
+# The values run_hpc_tests.sh used to hardcode, kept as the baseline to beat
+BASELINE = HPLConfig(20352, 192, 1, 2, 2, 1, 1)
+
+HPL_DAT = """HPLinpack benchmark input file
+Innovative Computing Laboratory, University of Tennessee
+HPL.out      output file name (if any)
+6            device out (6=stdout,7=stderr,file)
+1            # of problems sizes (N)
+{n:<12} Ns
+1            # of NBs
+{nb:<12} NBs
+0            PMAP process mapping (0=Row-,1=Column-major)
+1            # of process grids (P x Q)
+{p:<12} Ps
+{q:<12} Qs
+16.0         threshold
+1            # of panel fact
+{pfact:<12} PFACTs (0=left, 1=Crout, 2=Right)
+1            # of recursive stopping criterion
+4            NBMINs (>= 1)
+1            # of panels in recursion
+2            NDIVs
+1            # of recursive panel fact.
+1            RFACTs (0=left, 1=Crout, 2=Right)
+1            # of broadcast
+{bcast:<12} BCASTs (0=1rg,1=1rM,2=2rg,3=2rM,4=Lng,5=LnM)
+1            # of lookahead depth
+{depth:<12} DEPTHs (>=0)
+2            SWAP (0=bin-exch,1=long,2=mix)
+64           swapping threshold
+0            L1 in (0=transposed,1=no-transposed) form
+0            U  in (0=transposed,1=no-transposed) form
+1            Equilibration (0=no,1=yes)
+8            memory alignment in double (> 0)
+"""
+
+# hpcc reads the same file as hpccinf.txt with the PTRANS sizes appended
+HPCC_PTRANS = """##### This line (no. 32) is ignored (it serves as a separator). ######
+0            Number of additional problem sizes for PTRANS
+1200 10000 30000        values of N
+0            number of additional blocking sizes for PTRANS
+40 9 8 13 13 20 16 32 64       values of NB
+"""
+
+# "WR11C2R4   20352   192   1   2   123.45   4.5678e+01"
+HPL_RESULT = re.compile(r'^W[RC]\S*\s+(\d+)\s+(\d+)\s+(\d+)\s+(\d+)\s+([\d.]+)\s+([\d.eE+-]+)\s*$', re.M)
+
+LOG_COLUMNS = ['rung', 'n', 'nb', 'p', 'q', 'pfact', 'bcast', 'depth', 'seconds', 'gflops', 'status']
+
+
+def available_memory():
+    """MemAvailable from /proc/meminfo in bytes"""
+    with open('/proc/meminfo') as f:
+        for line in f:
+            if line.startswith('MemAvailable:'):
+                return int(line.split()[1]) * 1024
+    raise RuntimeError("MemAvailable not found in /proc/meminfo")
+
+
+def problem_size(mem_per_rank, ranks, nb=1, fraction=MEMORY_FRACTION):
+    """Largest N whose 8*N^2 byte matrix fits the given share of memory, as a multiple of nb"""
+    n = int(math.sqrt(fraction * mem_per_rank * ranks / 8))
+    return n // nb * nb
+
+
+def process_grids(ranks):
+    """P x Q factorizations of the rank count with P <= Q, as HPL prefers"""
+    return [(p, ranks // p) for p in range(1, math.isqrt(ranks) + 1) if ranks % p == 0]
+
+
+def search_space(ranks, nbs=NB_CHOICES, pfacts=PFACT_CHOICES, bcasts=BCAST_CHOICES, depths=DEPTH_CHOICES):
+    """Every configuration to consider, with n left at 0"""
+    return [HPLConfig(0, nb, p, q, pfact, bcast, depth)
+            for nb in nbs for p, q in process_grids(ranks)
+            for pfact in pfacts for bcast in bcasts for depth in depths]
+
+
+def format_input(config, hpcc=False):
+    """HPL.dat text for one configuration, or hpccinf.txt text with hpcc=True"""
+    text = HPL_DAT.format(**config._asdict())
+    return text + HPCC_PTRANS if hpcc else text
+
+
+def run_hpl(config, command, workdir='.', input_name='HPL.dat', hpcc=False, timeout=None, result_file=None):
+    """Run one configuration; returns (gflops, seconds, status)
+
+    The result is read from stdout, or from result_file (e.g. hpcc's
+    hpccoutf.txt) in workdir when given.
+    """
+    with open(os.path.join(workdir, input_name), 'w') as f:
+        f.write(format_input(config, hpcc))
+    if result_file and os.path.exists(os.path.join(workdir, result_file)):
+        os.remove(os.path.join(workdir, result_file))
+    try:
+        proc = subprocess.run(command, shell=True, cwd=workdir, stdout=subprocess.PIPE,
+                              stderr=subprocess.STDOUT, text=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return None, None, 'timeout'
+    output = proc.stdout
+    if result_file and os.path.exists(os.path.join(workdir, result_file)):
+        with open(os.path.join(workdir, result_file), errors='replace') as f:
+            output = f.read()
+    match = HPL_RESULT.search(output)
+    if proc.returncode != 0 or not match:
+        return None, None, f'exit {proc.returncode}'
+    if 'FAILED' in output:
+        return None, None, 'residual check failed'
+    return float(match.group(6)), float(match.group(5)), 'ok'
+
+
+def rung_sizes(full_n, rungs, min_n=MIN_SHORT_N):
+    """Problem size per rung, halving N (an eighth of the work) per rung below the full size"""
+    return [max(min(min_n, full_n), int(full_n / 2 ** (rungs - 1 - r))) for r in range(rungs)]
+
+
+def successive_halving(space, full_n, evaluate, budget=DEFAULT_BUDGET, eta=ETA, seed=0, log=print):
+    """Budgeted successive halving over short HPL runs
+
+    Samples as many configurations as the budget (a number of runs) allows,
+    runs them all on a small N, keeps the best 1/eta and repeats with twice
+    the N until one configuration remains, which is run at full_n.
+    evaluate(config, rung) returns GFLOPS or None for a failed run. When
+    every run of a later rung fails (e.g. full_n does not fit after all),
+    the best configuration of the rung before is kept, at that rung's N.
+    Returns (best config, best GFLOPS, runs used).
+    """
+    rng = random.Random(seed)
+    # n0 + n0/eta + n0/eta^2 + ... ~= n0 * eta / (eta - 1) runs in total
+    n0 = max(1, min(len(space), budget * (eta - 1) // eta))
+    candidates = rng.sample(space, n0)
+    counts = [n0]
+    while counts[-1] > 1:
+        counts.append(max(1, counts[-1] // eta))
+    sizes = rung_sizes(full_n, len(counts))
+
+    runs = 0
+    best = None
+    for rung, n in enumerate(sizes):
+        scored = []
+        for config in candidates:
+            config = config._replace(n=max(n // config.nb * config.nb, config.nb))
+            gflops = evaluate(config, rung)
+            runs += 1
+            if gflops is not None:
+                scored.append((gflops, config))
+        if not scored:
+            if best is None:
+                raise RuntimeError(f"Every run of rung {rung} (N={n}) failed")
+            log(f"Warning: every run of rung {rung} (N={n}) failed; keeping the best configuration "
+                f"of rung {rung - 1} (N={best[1].n})")
+            break
+        scored.sort(key=lambda s: s[0], reverse=True)
+        best = scored[0]
+        log(f"Rung {rung}: N={n}, {len(candidates)} configurations, best {scored[0][0]:.2f} GFLOPS")
+        if rung + 1 < len(counts):
+            candidates = [config for _, config in scored[:counts[rung + 1]]]
+    best_gflops, best = best
+    return best, best_gflops, runs
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Search HPL's N, NB, P x Q, PFACT, BCAST and DEPTH")
+    parser.add_argument('--ranks', type=int, default=2, help="MPI ranks (default: 2)")
+    parser.add_argument('--mem-per-rank', type=float, default=None,
+                        help="MB of memory per rank (default: MemAvailable / ranks)")
+    parser.add_argument('--xhpl', default='mpirun -np {ranks} ./xhpl',
+                        help="Command that runs HPL in the work directory (default: %(default)s)")
+    parser.add_argument('--workdir', default='.', help="Directory the input file is written to and HPL runs in")
+    parser.add_argument('--input-name', default='HPL.dat', help="Input file name HPL reads (default: HPL.dat)")
+    parser.add_argument('--hpcc', action='store_true', help="Write hpccinf.txt format (adds the PTRANS lines)")
+    parser.add_argument('--result-file', default=None,
+                        help="Read results from this file in the work directory instead of stdout (hpcc: hpccoutf.txt)")
+    parser.add_argument('--budget', type=int, default=DEFAULT_BUDGET, help="Maximum number of HPL runs")
+    parser.add_argument('--eta', type=int, default=ETA, help="Keep 1/eta of the configurations per rung")
+    parser.add_argument('--seed', type=int, default=0, help="Seed for sampling configurations")
+    parser.add_argument('--timeout', type=float, default=None, help="Seconds before a run is abandoned")
+    parser.add_argument('--output', default='HPL.dat.tuned', help="Where to write the best input file")
+    parser.add_argument('--log', default='hpl_tuning_log.csv', help="CSV log of every run")
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_args(sys.argv[1:])
+    mem_per_rank = args.mem_per_rank * 1024 * 1024 if args.mem_per_rank else available_memory() / args.ranks
+    full_n = problem_size(mem_per_rank, args.ranks)
+    command = args.xhpl.format(ranks=args.ranks)
+    print(f"{args.ranks} ranks, {mem_per_rank / 2 ** 20:.0f} MB per rank: N up to {full_n}")
+
+    start = time.perf_counter()
+    with open(args.log, 'w', newline='') as log_file:
+        log = csv.writer(log_file)
+        log.writerow(LOG_COLUMNS)
+
+        def evaluate(config, rung):
+            gflops, seconds, status = run_hpl(config, command, args.workdir, args.input_name,
+                                              args.hpcc, args.timeout, args.result_file)
+            log.writerow([rung] + list(config) + [seconds, gflops, status])
+            log_file.flush()
+            return gflops
+
+        best, best_gflops, runs = successive_halving(
+            search_space(args.ranks), full_n, evaluate, args.budget, args.eta, args.seed)
+
+        # The old hardcoded settings at the same N, for comparison
+        baseline = BASELINE._replace(n=best.n // BASELINE.nb * BASELINE.nb, p=1, q=args.ranks)
+        baseline_gflops = evaluate(baseline, 'baseline')
+
+    with open(args.output, 'w') as f:
+        f.write(format_input(best, args.hpcc))
+
+    print(f"Best after {runs} runs in {time.perf_counter() - start:.1f}s: N={best.n} NB={best.nb} "
+          f"P x Q={best.p} x {best.q} PFACT={best.pfact} BCAST={best.bcast} DEPTH={best.depth}: "
+          f"{best_gflops:.2f} GFLOPS")
+    if baseline_gflops:
+        print(f"Baseline NB={baseline.nb} P x Q={baseline.p} x {baseline.q}: {baseline_gflops:.2f} GFLOPS "
+              f"({(best_gflops / baseline_gflops - 1) * 100:+.1f}%)")
+    print(f"Input file written to {args.output}, tuning log to {args.log}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,472 @@
+import html
+import json
+import math
+import os
+import time
+from functools import lru_cache
+
+# Bump when the pages change so cached reports are rewritten
+REPORT_VERSION = 1
+
+# Run rows per page before a benchmark's table continues on the next page
+ROWS_PER_PAGE = 5000
+
+# Columns of a comparison entry that are statistics rather than platform values
+STAT_COLUMNS = ['Best', 'Margin (%)', 'Difference (%)', 'CI Low (%)', 'CI High (%)', 'p-value', 'Runs',
+                'Significant']
+
+REGRESSION_COLUMNS = ['Severity', 'Platform', 'Benchmark', 'Metric', 'Baseline', 'Current', 'Change (%)',
+                      'Since', 'Detected']
+
+PAGE_STYLE = """
+        body {
+            font-family: Arial, sans-serif;
+            margin: 20px;
+            line-height: 1.6;
+        }
+        h1 {
+            color: #333;
+            text-align: center;
+        }
+        h2 {
+            color: #444;
+            margin-top: 30px;
+        }
+        table {
+            width: 100%;
+            border-collapse: collapse;
+            margin: 20px 0;
+        }
+        th, td {
+            border: 1px solid #ddd;
+            padding: 8px;
+            text-align: right;
+        }
+        th {
+            background-color: #f2f2f2;
+            text-align: center;
+        }
+        tr:nth-child(even) {
+            background-color: #f9f9f9;
+        }
+        .chart-container {
+            max-width: 800px;
+            margin: 30px auto;
+            box-shadow: 0 4px 8px rgba(0,0,0,0.1);
+            border-radius: 5px;
+            padding: 10px;
+            background: white;
+        }
+        .chart-container img {
+            width: 100%;
+            height: auto;
+        }
+        .positive {
+            color: green;
+        }
+        .negative {
+            color: red;
+        }
+        .neutral {
+            color: #777;
+        }
+        .nav {
+            text-align: center;
+        }
+"""
+
+# Renders the summary table from the embedded JSON instead of repeating markup
+SUMMARY_SCRIPT = """
+    <script>
+        (function () {
+            var data = JSON.parse(document.getElementById('summary-data').textContent);
+            var table = document.getElementById('summary-table');
+            var head = table.insertRow();
+            data.columns.forEach(function (c) {
+                var th = document.createElement('th');
+                th.textContent = c;
+                head.appendChild(th);
+            });
+            data.rows.forEach(function (r) {
+                var tr = table.insertRow();
+                r.forEach(function (v, i) {
+                    var td = tr.insertCell();
+                    var col = data.columns[i];
+                    if (typeof v === 'number') {
+                        td.textContent = col === 'p-value' ? v.toPrecision(3) : v.toFixed(2) + (col.indexOf('(%)') >= 0 ? '%' : '');
+                    } else {
+                        td.textContent = v === null ? '' : v;
+                    }
+                    if (col === 'Difference (%)' || col === 'Margin (%)') {
+                        td.className = r[data.columns.indexOf('Significant')] === false ? 'neutral' : (v > 0 ? 'positive' : 'negative');
+                    }
+                });
+            });
+        })();
+    </script>
+"""
+
+
+def split_metric(metric):
+    """Split HPL_GFLOPS into ('HPL', 'GFLOPS')"""
+    benchmark, _, name = metric.partition('_')
+    return benchmark, name
+
+
+@lru_cache(maxsize=65536)
+def _escaped(text):
+    """html.escape for the file, platform and metric names that repeat on every row"""
+    return html.escape(text)
+
+
+@lru_cache(maxsize=4096)
+def _run_keys(metric):
+    """(benchmark, escaped metric name) for a run row"""
+    benchmark, name = split_metric(metric)
+    return benchmark, html.escape(name)
+
+
+@lru_cache(maxsize=65536)
+def _file_cell(file_name):
+    """Escaped base name of a run file"""
+    return html.escape(os.path.basename(str(file_name)))
+
+
+def _json_value(value):
+    """Make a value safe for compact JSON (NaN is not valid JSON)"""
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    if hasattr(value, 'item'):
+        return _json_value(value.item())
+    return value
+
+
+def _write_head(f, title):
+    f.write(f"""<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="utf-8">
+    <title>{html.escape(title)}</title>
+    <style>{PAGE_STYLE}    </style>
+</head>
+<body>
+    <h1>{html.escape(title)}</h1>
+""")
+
+
+def _write_nav(f, index, prev_page=None, next_page=None):
+    links = [f'<a href="{html.escape(index)}">Index</a>']
+    if prev_page:
+        links.append(f'<a href="{html.escape(prev_page)}">&larr; Previous</a>')
+    if next_page:
+        links.append(f'<a href="{html.escape(next_page)}">Next &rarr;</a>')
+    f.write('    <p class="nav">' + ' | '.join(links) + '</p>\n')
+
+
+def _format_cell(column, value):
+    if isinstance(value, bool) or value is None:
+        return '' if value is None else ('yes' if value else 'no')
+    if isinstance(value, (int, float)):
+        if column == 'p-value':
+            return f'{value:.4f}'
+        return f'{value:.2f}%' if '(%)' in column else f'{value:.2f}'
+    return html.escape(str(value))
+
+
+class BenchmarkPages:
+    """Stream one benchmark's comparison and run rows into numbered pages"""
+
+    def __init__(self, directory, stem, benchmark, index, title, rows_per_page):
+        self.directory = directory
+        self.stem = stem
+        self.benchmark = benchmark
+        self.index = index
+        self.title = title
+        self.rows_per_page = rows_per_page
+        self.pages = []
+        self.rows = 0
+        self._f = None
+        self._page_rows = 0
+
+    def _page_name(self, number):
+        suffix = '' if number == 1 else f'_{number}'
+        return f'{self.stem}_{self.benchmark}{suffix}.html'
+
+    def _open_page(self):
+        name = self._page_name(len(self.pages) + 1)
+        if self._f is not None:
+            self._close_page(next_page=name)
+        self.pages.append(os.path.join(self.directory, name))
+        self._f = open(self.pages[-1], 'w')
+        self._page_rows = 0
+        _write_head(self._f, f'{self.title}: {self.benchmark} (page {len(self.pages)})')
+        prev_page = self._page_name(len(self.pages) - 1) if len(self.pages) > 1 else None
+        _write_nav(self._f, self.index, prev_page)
+
+    def _close_page(self, next_page=None):
+        self._f.write('    </table>\n')
+        prev_page = self._page_name(len(self.pages) - 1) if len(self.pages) > 1 else None
+        _write_nav(self._f, self.index, prev_page, next_page)
+        self._f.write('</body>\n</html>\n')
+        self._f.close()
+        self._f = None
+
+    def write_comparison(self, columns, rows, matrix=None):
+        """Write the comparison table at the top of the first page
+
+        With an N-way matrix each metric's pairwise table follows it.
+        """
+        self._open_page()
+        f = self._f
+        f.write('    <h2>Comparison</h2>\n    <table>\n        <tr>')
+        f.write(''.join(f'<th>{html.escape(c)}</th>' for c in ['Metric'] + columns))
+        f.write('</tr>\n')
+        for metric, values in rows:
+            f.write(f'        <tr><td>{html.escape(split_metric(metric)[1])}</td>')
+            f.write(''.join(f'<td>{_format_cell(c, values.get(c))}</td>' for c in columns))
+            f.write('</tr>\n')
+        f.write('    </table>\n')
+        if matrix is not None:
+            self.write_pairwise(matrix, [metric for metric, _ in rows])
+        self._start_runs()
+
+    def write_pairwise(self, matrix, metrics):
+        """One platform-by-platform table per metric of an N-way matrix"""
+        f = self._f
+        platforms = matrix['platforms']
+        f.write('    <h2>Pairwise Differences</h2>\n'
+                '    <p>Each cell is the column platform relative to the row platform, with its 95% CI.</p>\n')
+        for metric in metrics:
+            k = matrix['metrics'].index(metric)
+            f.write(f'    <h3>{html.escape(split_metric(metric)[1])}</h3>\n    <table>\n        <tr><th></th>')
+            f.write(''.join(f'<th>{_escaped(p)}</th>' for p in platforms) + '</tr>\n')
+            for i, baseline in enumerate(platforms):
+                f.write(f'        <tr><th>{_escaped(baseline)}</th>')
+                f.write(''.join(_pairwise_cell(matrix, i, j, k) for j in range(len(platforms))))
+                f.write('</tr>\n')
+            f.write('    </table>\n')
+
+    def _start_runs(self):
+        self._f.write('    <h2>Runs</h2>\n    <table>\n'
+                      '        <tr><th>File</th><th>Platform</th><th>Metric</th><th>Value</th></tr>\n')
+
+    def write_run(self, file_cell, platform_cell, metric_cell, value):
+        """Append one pre-escaped run row, starting a new page when the current one is full"""
+        if self._f is None or self._page_rows >= self.rows_per_page:
+            self._open_page()
+            self._start_runs()
+        self._f.write(f'        <tr><td>{file_cell}</td><td>{platform_cell}</td>'
+                      f'<td>{metric_cell}</td><td>{value:.4g}</td></tr>\n')
+        self._page_rows += 1
+        self.rows += 1
+
+    def close(self):
+        if self._f is None:
+            self._open_page()
+        self._close_page()
+
+
+def _pairwise_cell(matrix, i, j, k):
+    """Difference of platform j over baseline i for metric k, coloured when significant"""
+    diff = matrix['diff_pct'][i, j, k]
+    if i == j or not math.isfinite(diff):
+        return '<td></td>'
+    low, high = matrix['ci_low'][i, j, k], matrix['ci_high'][i, j, k]
+    ci = f' [{low:+.1f}, {high:+.1f}]' if math.isfinite(low) and low != high else ''
+    css = ('positive' if diff > 0 else 'negative') if matrix['significant'][i, j, k] else 'neutral'
+    return f'<td class="{css}">{diff:+.1f}%{ci}</td>'
+
+
+def _format_time(timestamp):
+    return time.strftime('%Y-%m-%d %H:%M', time.localtime(timestamp))
+
+
+def _write_regressions(f, regressions):
+    """Table of the open regressions against the historical baselines (see regression.py)"""
+    f.write('    <h2>Regressions Against Historical Baselines</h2>\n')
+    if not regressions:
+        f.write('    <p>No metric has regressed from its baseline.</p>\n')
+        return
+    f.write('    <table>\n        <tr>' + ''.join(f'<th>{c}</th>' for c in REGRESSION_COLUMNS) + '</tr>\n')
+    for r in regressions:
+        cells = [r['severity'], r['platform'], r['benchmark'], r['metric'],
+                 f"{r['baseline_mean']:.4g}", f"{r['current_mean']:.4g}"]
+        f.write('        <tr>' + ''.join(f'<td>{html.escape(str(c))}</td>' for c in cells)
+                + f'<td class="negative">{r["change_pct"]:+.2f}%</td>'
+                f'<td>{_format_time(r["since"])}</td><td>{_format_time(r["detected_at"])}</td></tr>\n')
+    f.write('    </table>\n')
+
+
+def ranked_observations(comparison):
+    """Key observations and the conclusion of an N-way comparison, from each metric's best platform"""
+    tested = bool(comparison) and all('Significant' in v for v in comparison.values())
+    wins = {}
+    for metric, values in comparison.items():
+        margin = values['Margin (%)']
+        if tested and values['Significant']:
+            wins.setdefault(values['Best'], []).append(f"{metric} ({margin:.2f}% ahead, p={values['p-value']:.3g})")
+        elif not tested and margin > 5:
+            wins.setdefault(values['Best'], []).append(f"{metric} ({margin:.2f}% ahead)")
+
+    items = [f"{platform} performed best in: " + ", ".join(metrics)
+             for platform, metrics in sorted(wins.items(), key=lambda w: -len(w[1]))]
+    if not tested:
+        items.append("Single runs per platform: differences are not tested for significance.")
+    if wins:
+        leader, metrics = max(wins.items(), key=lambda w: len(w[1]))
+        items.append(f"Overall, {leader} is clearly ahead in {len(metrics)} of {len(comparison)} metrics.")
+    else:
+        items.append("Overall, no platform is clearly ahead of the others for HPC workloads.")
+    return items
+
+
+def observations(comparison, platforms=('VM', 'Container')):
+    """Key observations and the overall conclusion of a two-platform comparison
+
+    Difference (%) is platforms[1] relative to platforms[0], as in
+    analyze_hpcc.compare_results.
+    """
+    if any('Best' in v for v in comparison.values()):
+        return ranked_observations(comparison)
+    base, other = platforms
+    tested = bool(comparison) and all('Significant' in v for v in comparison.values())
+    better_in_other = []
+    better_in_base = []
+
+    for metric, values in comparison.items():
+        diff_pct = values['Difference (%)']
+        if tested:
+            # Only differences that survive the significance test count
+            if not values['Significant']:
+                continue
+            if diff_pct > 0:
+                better_in_other.append(f"{metric} ({diff_pct:.2f}% better, p={values['p-value']:.3g})")
+            else:
+                better_in_base.append(f"{metric} ({-diff_pct:.2f}% better, p={values['p-value']:.3g})")
+        elif diff_pct > 5:  # The second platform is significantly better
+            better_in_other.append(f"{metric} ({diff_pct:.2f}% better)")
+        elif diff_pct < -5:  # The first platform is significantly better
+            better_in_base.append(f"{metric} ({-diff_pct:.2f}% better)")
+
+    items = []
+    if better_in_other:
+        items.append(f"{other} performed better in: " + ", ".join(better_in_other))
+    if better_in_base:
+        items.append(f"{base} performed better in: " + ", ".join(better_in_base))
+    if tested and not better_in_other and not better_in_base:
+        items.append(f"No metric differs significantly between {base} and {other}.")
+    elif not tested:
+        items.append("Single runs per platform: differences are not tested for significance.")
+
+    # Add overall conclusion
+    avg_diff = sum(values['Difference (%)'] for values in comparison.values()) / max(len(comparison), 1)
+    if tested and not better_in_other and not better_in_base:
+        conclusion = f"Overall, the performance difference between {other} and {base} is within run-to-run noise for HPC workloads."
+    elif avg_diff > 5:
+        conclusion = f"Overall, {other} shows better performance for HPC workloads."
+    elif avg_diff < -5:
+        conclusion = f"Overall, {base} shows better performance for HPC workloads."
+    else:
+        conclusion = f"Overall, the performance difference between {other} and {base} is minimal for HPC workloads."
+    items.append(conclusion)
+    return items
+
+
+def write_report(comparison, output_file, runs=(), charts=('hpcc_comparison.png',),
+                 platforms=('VM', 'Container'), title='HPC Performance Comparison: VMs vs Containers',
+                 rows_per_page=ROWS_PER_PAGE, regressions=None, matrix=None):
+    """Write an index page plus paginated per-benchmark pages
+
+    runs is an iterable of (file, platform, metric, value) tuples; it is
+    consumed once and streamed straight to the pages, so memory does not
+    grow with the number of runs. regressions, when given, is the list of
+    open regressions from regression.py, shown on the index page. matrix,
+    when given, is an N-way comparison_stats.compare_matrix whose pairwise
+    tables go on the benchmark pages. Returns the paths of all written files.
+    """
+    directory = os.path.dirname(os.path.abspath(output_file))
+    stem = os.path.splitext(os.path.basename(output_file))[0]
+    index = os.path.basename(output_file)
+
+    present = set().union(*(v.keys() for v in comparison.values())) if comparison else set()
+    columns = list(platforms) + [c for c in STAT_COLUMNS if c in present]
+
+    by_benchmark = {}
+    for metric, values in comparison.items():
+        by_benchmark.setdefault(split_metric(metric)[0], []).append((metric, values))
+
+    pages = {}
+    for benchmark, rows in by_benchmark.items():
+        pages[benchmark] = BenchmarkPages(directory, stem, benchmark, index, title, rows_per_page)
+        pages[benchmark].write_comparison(columns, rows, matrix)
+
+    try:
+        for file_name, platform, metric, value in runs:
+            benchmark, metric_cell = _run_keys(metric)
+            page = pages.get(benchmark)
+            if page is None:
+                page = pages[benchmark] = BenchmarkPages(directory, stem, benchmark, index, title, rows_per_page)
+            page.write_run(_file_cell(file_name), _escaped(str(platform)), metric_cell, value)
+    finally:
+        for p in pages.values():
+            p.close()
+
+    summary = {
+        'columns': ['Benchmark', 'Metric'] + columns,
+        'rows': [list(split_metric(m)) + [_json_value(v.get(c)) for c in columns] for m, v in comparison.items()],
+    }
+
+    with open(output_file, 'w') as f:
+        _write_head(f, title)
+        f.write('    <h2>Performance Metrics Comparison</h2>\n')
+        f.write('    <script type="application/json" id="summary-data">')
+        # Escape "</" so the payload cannot close the script element
+        f.write(json.dumps(summary, separators=(',', ':')).replace('</', '<\\/'))
+        f.write('</script>\n    <table id="summary-table"></table>\n')
+        f.write(SUMMARY_SCRIPT)
+
+        if regressions is not None:
+            _write_regressions(f, regressions)
+
+        f.write('    <h2>Benchmarks</h2>\n    <table>\n'
+                '        <tr><th>Benchmark</th><th>Metrics</th><th>Runs</th><th>Pages</th></tr>\n')
+        for benchmark, p in pages.items():
+            links = ' '.join(f'<a href="{html.escape(os.path.basename(path))}">{i}</a>'
+                             for i, path in enumerate(p.pages, 1))
+            f.write(f'        <tr><td>{html.escape(benchmark)}</td><td>{len(by_benchmark.get(benchmark, []))}</td>'
+                    f'<td>{p.rows}</td><td>{links}</td></tr>\n')
+        f.write('    </table>\n')
+
+        if charts:
+            f.write('    <h2>Performance Comparison Chart</h2>\n')
+            for chart in charts:
+                f.write(f'    <div class="chart-container">\n'
+                        f'        <img src="{html.escape(chart)}" alt="HPC Performance Comparison Chart">\n'
+                        f'    </div>\n')
+
+        if tuple(platforms) == ('VM', 'Container'):
+            compared = 'Virtual Machines (VMs) and Containers'
+        else:
+            compared = ', '.join(platforms[:-1]) + ' and ' + platforms[-1]
+        f.write(f"""    <h2>Analysis</h2>
+    <p>
+        This comparison shows the performance differences between {html.escape(compared)}
+        for High-Performance Computing (HPC) workloads using the HPC Challenge benchmark suite.
+    </p>
+    <p>
+        <strong>Key observations:</strong>
+    </p>
+    <ul>
+""")
+        for item in observations(comparison, platforms):
+            f.write(f'        <li>{html.escape(item)}</li>\n')
+        f.write("""    </ul>
+    <p>
+        The results indicate that the choice of platform for HPC workloads should be based on
+        specific requirements and the particular benchmarks that are most relevant to the intended application.
+    </p>
+</body>
+</html>
+""")
+
+    return [output_file] + [path for p in pages.values() for path in p.pages]
@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+
+import argparse
+import csv
+import os
+import statistics
+import sys
+import warnings
+from collections import namedtuple
+
+import numpy as np
+
+from iozone_parser import parse_iozone_report
+
+# One throughput cliff along the file size axis of a test's surface. The cliff
+# lies between last_fast and first_slow (KB); file_size is their geometric mean.
+# drop_pct compares the plateaus on either side and steepness is the median
+# log2 change per file size doubling across the cliff.
+CacheBoundary = namedtuple('CacheBoundary', ['test', 'level', 'file_size', 'last_fast', 'first_slow',
+                                             'drop_pct', 'steepness'])
+
+# A plateau must be at least this much slower than the one before it to count as a cliff
+MIN_DROP = 0.25
+
+# File sizes on each plateau, so a single noisy file size is never a plateau of its own
+MIN_PLATEAU = 2
+
+# Share of a cliff's drop that must happen in its one file size step; a gradual
+# decline spread over many file sizes is not a cache boundary
+MIN_SHARPNESS = 0.5
+
+# A cliff's step must also stand this many robust standard deviations (MAD) above
+# the test's step-to-step noise
+MIN_SIGNIFICANCE = 4.0
+
+# A lone cliff at or below this file size (KB) is put down to the CPU caches, above
+# it to the page cache (or, in a container, the cgroup memory limit)
+CPU_CACHE_KB = 128 * 1024
+
+LEVELS = ('cpu_cache', 'page_cache')
+
+
+def stack_surfaces(surfaces, tests=None):
+    """All tests of a report on one grid: (tests, file_sizes, record_sizes, values[test, file, record])"""
+    tests = [t for t in (tests or surfaces) if t in surfaces]
+    file_sizes = np.unique(np.concatenate([surfaces[t].file_sizes for t in tests]))
+    record_sizes = np.unique(np.concatenate([surfaces[t].record_sizes for t in tests]))
+    values = np.full((len(tests), len(file_sizes), len(record_sizes)), np.nan)
+    for i, t in enumerate(tests):
+        s = surfaces[t]
+        rows = np.searchsorted(file_sizes, s.file_sizes)
+        cols = np.searchsorted(record_sizes, s.record_sizes)
+        values[i][np.ix_(rows, cols)] = s.values
+    return tests, file_sizes, record_sizes, values
+
+
+def file_size_slopes(values, file_sizes):
+    """Change of log2 throughput per doubling of the file size, for every test and record size
+
+    values is (tests, files, records); the result is (tests, files - 1, records),
+    NaN where either cell was not measured.
+    """
+    return np.diff(np.log2(values), axis=1) / np.diff(np.log2(file_sizes))[None, :, None]
+
+
+def throughput_profiles(values, file_sizes):
+    """Relative log2 throughput by file size for each test, 0 at the smallest file size
+
+    Built from the slopes rather than the raw values: each step is the median
+    over record sizes of the change between two file sizes within the same
+    record size. With -O the ops/sec of large records are far below those of
+    small ones, and each record size only covers part of the file sizes, so a
+    median of the raw values would step wherever a record size starts or stops.
+    """
+    slopes = file_size_slopes(values, file_sizes) * np.diff(np.log2(file_sizes))[None, :, None]
+    with warnings.catch_warnings():
+        # Steps no record size measured on both sides are expected
+        warnings.simplefilter('ignore', RuntimeWarning)
+        steps = np.nan_to_num(np.nanmedian(slopes, axis=2))
+    return np.concatenate([np.zeros((len(values), 1)), np.cumsum(steps, axis=1)], axis=1)
+
+
+def segment_profiles(profiles, min_drop=MIN_DROP, min_plateau=MIN_PLATEAU, min_sharpness=MIN_SHARPNESS,
+                     min_significance=MIN_SIGNIFICANCE):
+    """Split every profile into at most three falling plateaus at once
+
+    profiles is (tests, files) of log2 throughput. Every one- and two-cliff
+    segmentation of every test is scored together from cumulative sums; the
+    best two-cliff split wins when both of its cliffs qualify, else the best
+    one-cliff split. Returns (tests, 2) split indices (a split at i separates
+    file sizes i-1 and i), -1 where there is no cliff.
+    """
+    t, n = profiles.shape
+    splits = np.full((t, 2), -1)
+    if n < 2 * min_plateau:
+        return splits
+    y = np.nan_to_num(profiles)
+    steps = -np.diff(y, axis=1)
+    noise = 1.4826 * np.median(np.abs(steps - np.median(steps, axis=1, keepdims=True)), axis=1)
+    s1 = np.concatenate([np.zeros((t, 1)), np.cumsum(y, axis=1)], axis=1)
+    s2 = np.concatenate([np.zeros((t, 1)), np.cumsum(y * y, axis=1)], axis=1)
+    min_log_drop = -np.log2(1 - min_drop)
+
+    def mean(a, b):
+        a, b = np.broadcast_arrays(a, b)
+        return (s1[:, b] - s1[:, a]) / (b - a)
+
+    def sse(a, b):
+        a, b = np.broadcast_arrays(a, b)
+        return (s2[:, b] - s2[:, a]) - (s1[:, b] - s1[:, a]) ** 2 / (b - a)
+
+    def cliff_ok(left, right, i):
+        drop = left - right
+        step = steps[:, i - 1]
+        return ((drop >= min_log_drop) & (step >= min_sharpness * drop)
+                & (step >= min_significance * noise[:, None]))
+
+    # One cliff: every split i with min_plateau file sizes on each side
+    single = np.arange(min_plateau, n - min_plateau + 1)
+    score = sse(0, single) + sse(single, n)
+    ok = cliff_ok(mean(0, single), mean(single, n), single)
+    score = np.where(ok, score, np.inf)
+    best = np.argmin(score, axis=1)
+    found = np.isfinite(score[np.arange(t), best])
+    splits[found, 0] = single[best[found]]
+
+    # Two cliffs: every pair i < j leaving three plateaus
+    i, j = np.triu_indices(n + 1, k=min_plateau)
+    keep = (i >= min_plateau) & (n - j >= min_plateau)
+    i, j = i[keep], j[keep]
+    if len(i):
+        score = sse(0, i) + sse(i, j) + sse(j, n)
+        first, middle, last = mean(0, i), mean(i, j), mean(j, n)
+        ok = cliff_ok(first, middle, i) & cliff_ok(middle, last, j)
+        score = np.where(ok, score, np.inf)
+        best = np.argmin(score, axis=1)
+        found = np.isfinite(score[np.arange(t), best])
+        splits[found, 0] = i[best[found]]
+        splits[found, 1] = j[best[found]]
+    return splits
+
+
+def classify(file_sizes_kb, cpu_cache_kb=CPU_CACHE_KB):
+    """Level names for the cliffs of one test, smallest file size first"""
+    if len(file_sizes_kb) >= 2:
+        return list(LEVELS[:len(file_sizes_kb)])
+    return ['cpu_cache' if size <= cpu_cache_kb else 'page_cache' for size in file_sizes_kb]
+
+
+def find_boundaries(surfaces, tests=None, cpu_cache_kb=CPU_CACHE_KB, **segment_args):
+    """Cache boundaries of every test of a parsed report, as CacheBoundary records"""
+    tests, file_sizes, _, values = stack_surfaces(surfaces, tests)
+    if not tests:
+        return []
+    profiles = throughput_profiles(values, file_sizes)
+    splits = segment_profiles(profiles, **segment_args)
+    slopes = file_size_slopes(values, file_sizes)
+
+    boundaries = []
+    for k, test in enumerate(tests):
+        cuts = [int(c) for c in splits[k] if c > 0]
+        edges = [0] + cuts + [len(file_sizes)]
+        levels = classify([file_sizes[c - 1] for c in cuts], cpu_cache_kb)
+        for n, (cut, level) in enumerate(zip(cuts, levels)):
+            drop = profiles[k, edges[n]:cut].mean() - profiles[k, cut:edges[n + 2]].mean()
+            steep = slopes[k, cut - 1]
+            boundaries.append(CacheBoundary(
+                test, level, float(np.sqrt(file_sizes[cut - 1] * file_sizes[cut])),
+                int(file_sizes[cut - 1]), int(file_sizes[cut]), float((1 - 2 ** -drop) * 100),
+                float(np.nanmedian(steep)) if np.isfinite(steep).any() else float('nan')))
+    return boundaries
+
+
+def metric_name(test, level, field):
+    return f"{test.lower().replace(' ', '_').replace('-', '')}_{level}_{field}"
+
+
+def boundary_metrics(boundaries):
+    """{metric: value} for export, e.g. writer_page_cache_boundary_kb"""
+    metrics = {}
+    for b in boundaries:
+        metrics[metric_name(b.test, b.level, 'boundary_kb')] = b.file_size
+        metrics[metric_name(b.test, b.level, 'drop_pct')] = b.drop_pct
+    return metrics
+
+
+def boundary_lines(surface, boundaries):
+    """Lines across a surface at each of its test's boundaries, for annotating plots
+
+    Returns [(label, record_sizes, file_sizes, values)], the line following
+    the last file size before the cliff.
+    """
+    lines = []
+    for b in boundaries:
+        if b.test != surface.test:
+            continue
+        rows = np.flatnonzero(surface.file_sizes == b.last_fast)
+        if not len(rows):
+            continue
+        label = f"{b.level.replace('_', ' ')}: {format_size(b.last_fast)}-{format_size(b.first_slow)} (-{b.drop_pct:.0f}%)"
+        lines.append((label, surface.record_sizes, np.full(len(surface.record_sizes), b.last_fast),
+                      surface.values[rows[0]]))
+    return lines
+
+
+def format_size(kb):
+    for unit, scale in (('GB', 2 ** 20), ('MB', 2 ** 10)):
+        if kb >= scale:
+            return f'{kb / scale:g}{unit}'
+    return f'{kb:g}KB'
+
+
+def aggregate_boundaries(reports):
+    """One boundary per (test, level) across several reports of the same platform
+
+    Sizes are the median report's (median_low, so they stay measured file
+    sizes); drop and steepness are medians. A boundary only some reports
+    found is still kept.
+    """
+    found = {}
+    for boundaries in reports:
+        for b in boundaries:
+            found.setdefault((b.test, b.level), []).append(b)
+    return [CacheBoundary(test, level,
+                          *(statistics.median_low(getattr(b, f) for b in bs)
+                            for f in ('file_size', 'last_fast', 'first_slow')),
+                          statistics.median(b.drop_pct for b in bs),
+                          statistics.median(b.steepness for b in bs))
+            for (test, level), bs in found.items()]
+
+
+def compare_boundaries(by_platform):
+    """Rows (test, level, {platform: boundary}) for every boundary any platform has"""
+    keys = []
+    for boundaries in by_platform.values():
+        for b in boundaries:
+            if (b.test, b.level) not in keys:
+                keys.append((b.test, b.level))
+    tests = [k[0] for k in keys]
+    keys.sort(key=lambda k: (tests.index(k[0]), LEVELS.index(k[1])))
+    index = {p: {(b.test, b.level): b for b in bs} for p, bs in by_platform.items()}
+    return [(test, level, {p: index[p].get((test, level)) for p in by_platform}) for test, level in keys]
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        description="Find the CPU cache and page cache cliffs in IOZone surfaces and compare them")
+    parser.add_argument('reports', nargs='+', help="iozone -R reports, e.g. vm_iozone_results.txt")
+    parser.add_argument('--csv', default=None, help="Write every boundary to this CSV file")
+    parser.add_argument('--store', default=None, help="Append the boundary metrics to this results store")
+    parser.add_argument('--cpu-cache-kb', type=int, default=CPU_CACHE_KB,
+                        help="Largest file size (KB) a lone cliff is put down to the CPU caches")
+    parser.add_argument('--min-drop', type=float, default=MIN_DROP,
+                        help="Smallest relative drop between plateaus that counts as a cliff")
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_args(sys.argv[1:])
+    from tool_parsers import infer_platform
+
+    # Each report keeps its own boundaries; the table shows them per platform
+    by_report = {}
+    for path in args.reports:
+        surfaces, _ = parse_iozone_report(path)
+        by_report[path] = find_boundaries(surfaces, cpu_cache_kb=args.cpu_cache_kb, min_drop=args.min_drop)
+    platform_of = {path: infer_platform(path) or path for path in args.reports}
+    reports_of = {}
+    for path, boundaries in by_report.items():
+        reports_of.setdefault(platform_of[path], []).append(boundaries)
+    by_platform = {p: aggregate_boundaries(reports) for p, reports in reports_of.items()}
+
+    platforms = list(by_platform)
+    print(f"{'Test':<15} {'Boundary':<11}" + ''.join(f" {p:>20}" for p in platforms))
+    for test, level, row in compare_boundaries(by_platform):
+        cells = [f"{format_size(b.last_fast)}-{format_size(b.first_slow)} -{b.drop_pct:.0f}%" if b else '-'
+                 for b in row.values()]
+        print(f"{test:<15} {level:<11}" + ''.join(f" {c:>20}" for c in cells))
+
+    if args.csv:
+        with open(args.csv, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['platform', 'report'] + list(CacheBoundary._fields))
+            for path, boundaries in by_report.items():
+                for b in boundaries:
+                    writer.writerow([platform_of[path], path] + list(b))
+
+    if args.store:
+        from results_store import ResultsStore, records_from_results
+        records = []
+        for path, boundaries in by_report.items():
+            records += records_from_results(boundary_metrics(boundaries), platform_of[path], 'iozone',
+                                            timestamp=os.path.getmtime(path))
+        ResultsStore(args.store).append(records)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+
+import base64
+import html
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+from iozone_parser import TESTS, parse_iozone_report
+
+# Cells per side of the mesh drawn first; larger grids are decimated to it
+COARSE_CELLS = 16
+
+# Cells per side of a full-resolution tile; neighbouring tiles share their edge
+# row and column so they meet without gaps
+TILE_CELLS = 32
+
+# Camera distance from the scene centre below which a plot swaps its coarse mesh
+# for full-resolution tiles (the default view is about 2.3)
+ZOOM_DISTANCE = 1.6
+
+# Typed arrays need plotly.js 2.28 or later; plotly-latest on the CDN is frozen at 1.58
+PLOTLY_JS = 'https://cdn.plot.ly/plotly-2.35.2.min.js'
+
+COLORSCALE = [
+    [0.0, 'rgb(51, 0, 102)'],     # Dark purple
+    [0.1, 'rgb(102, 0, 153)'],    # Purple
+    [0.2, 'rgb(153, 0, 204)'],    # Light purple
+    [0.3, 'rgb(204, 0, 255)'],    # Pink-purple
+    [0.4, 'rgb(255, 0, 204)'],    # Pink
+    [0.5, 'rgb(255, 0, 153)'],    # Hot pink
+    [0.6, 'rgb(255, 0, 102)'],    # Dark pink
+    [0.7, 'rgb(255, 0, 51)'],     # Red-pink
+    [0.8, 'rgb(255, 51, 0)'],     # Red-orange
+    [0.9, 'rgb(255, 102, 0)'],    # Orange
+    [1.0, 'rgb(255, 153, 0)']     # Light orange
+]
+
+# Swaps between the coarse mesh (trace 0) and full-resolution tiles as the camera
+# zooms. Tiles near the camera centre are added on first use and then only shown
+# or hidden. The scene box is taken to span -0.5..0.5 per aspect ratio unit, which
+# is close enough to pick the tiles in view; a few extra tiles do no harm.
+LOD_SCRIPT = """
+function iozoneLod(div, lod) {
+    if (!lod.tiles.length) return;
+    var traces = {}, fine = false, busy = false;
+    div.on('plotly_relayout', function (update) {
+        var camera = update['scene.camera'];
+        if (!camera || busy) return;
+        var eye = camera.eye, center = camera.center || {x: 0, y: 0, z: 0};
+        var distance = Math.sqrt(Math.pow(eye.x - center.x, 2) + Math.pow(eye.y - center.y, 2) +
+                                 Math.pow(eye.z - center.z, 2));
+        if (distance >= lod.zoom) {
+            if (fine) {
+                fine = false;
+                var loaded = Object.keys(traces).map(function (i) { return traces[i]; });
+                var visible = [true].concat(loaded.map(function () { return false; }));
+                Plotly.restyle(div, {visible: visible}, [0].concat(loaded));
+            }
+            return;
+        }
+        var aspect = div.layout.scene.aspectratio || {x: 1, y: 1};
+        var cx = 0.5 + center.x / aspect.x, cy = 0.5 + center.y / aspect.y, r = distance / 2;
+        var wanted = [];
+        lod.tiles.forEach(function (tile, i) {
+            var box = tile.box;
+            if (box[1] >= cx - r && box[0] <= cx + r && box[3] >= cy - r && box[2] <= cy + r) wanted.push(i);
+        });
+        var coarse = div.data[0], missing = wanted.filter(function (i) { return !(i in traces); });
+        var added = missing.map(function (i) {
+            var tile = lod.tiles[i];
+            return {type: 'surface', x: tile.x, y: tile.y, z: tile.z, colorscale: coarse.colorscale,
+                    cmin: coarse.cmin, cmax: coarse.cmax, showscale: false, opacity: coarse.opacity,
+                    contours: coarse.contours, hoverinfo: 'x+y+z', name: 'tile ' + i};
+        });
+        busy = true;
+        Promise.resolve(added.length ? Plotly.addTraces(div, added) : null).then(function () {
+            var first = div.data.length - missing.length;
+            missing.forEach(function (i, k) { traces[i] = first + k; });
+            var show = wanted.map(function (i) { return traces[i]; });
+            var hide = [0].concat(Object.keys(traces).map(function (i) { return traces[i]; })
+                .filter(function (t) { return show.indexOf(t) < 0; }));
+            fine = true;
+            var visible = hide.map(function () { return false; }).concat(show.map(function () { return true; }));
+            return Plotly.restyle(div, {visible: visible}, hide.concat(show));
+        }).then(done, done);
+
+        function done() { busy = false; }
+    });
+}
+"""
+
+# Draws each plot when it scrolls into view and frees it again when it leaves,
+# since browsers only keep a handful of WebGL contexts alive at a time
+PAGE_SCRIPT = """
+    <script>
+        (function () {
+            var data = JSON.parse(document.getElementById('lod-plots').textContent);
+            var plots = data.plots, drawn = {};
+
+            function draw(div, plot) {
+                var tiles = JSON.parse(document.getElementById('lod-tiles-' + plot.id).textContent);
+                var z = plot.coarse;
+                Plotly.newPlot(div, [{type: 'surface', x: z.x, y: z.y, z: z.z, colorscale: data.colorscale,
+                                      cmin: 0, cmax: plot.zmax, opacity: 0.9,
+                                      contours: {z: {show: true, start: 0, end: plot.zmax,
+                                                     size: plot.zmax / 12, color: 'black', width: 2}}}],
+                               {title: plot.title, width: 560, height: 460,
+                                margin: {l: 10, r: 10, b: 10, t: 40},
+                                scene: {xaxis: {title: 'Rec size (KB)', type: 'log', dtick: 1},
+                                        yaxis: {title: 'File size (KB)', type: 'log', dtick: 1},
+                                        zaxis: {title: plot.units, range: [0, plot.zmax * 1.05]},
+                                        aspectratio: {x: 1, y: 1, z: 0.7},
+                                        camera: {eye: {x: -1.5, y: -1.5, z: 1}}}})
+                    .then(function () { iozoneLod(div, {tiles: tiles, zoom: plot.zoom}); });
+            }
+
+            var observer = new IntersectionObserver(function (entries) {
+                entries.forEach(function (entry) {
+                    var div = entry.target, plot = plots[div.dataset.plot];
+                    if (entry.isIntersecting && !drawn[plot.id]) {
+                        drawn[plot.id] = true;
+                        draw(div, plot);
+                    } else if (!entry.isIntersecting && drawn[plot.id]) {
+                        drawn[plot.id] = false;
+                        Plotly.purge(div);
+                    }
+                });
+            }, {rootMargin: '200px'});
+            document.querySelectorAll('.lod-plot').forEach(function (div) { observer.observe(div); });
+        })();
+    </script>
+"""
+
+PAGE_STYLE = """
+        body {
+            font-family: Arial, sans-serif;
+            margin: 20px;
+        }
+        h1, h2 {
+            text-align: center;
+        }
+        .row {
+            display: flex;
+            flex-wrap: wrap;
+            justify-content: center;
+        }
+        .lod-plot {
+            width: 560px;
+            height: 460px;
+            margin: 10px;
+        }
+"""
+
+
+def typed_array(values, dtype='f4'):
+    """Plotly typed array spec: little-endian binary in base64 instead of a JSON list
+
+    float32 halves the payload of float64 and still holds every IOZone figure
+    to well within a plot's resolution; unmeasured cells stay NaN.
+    """
+    values = np.ascontiguousarray(values, dtype=np.dtype(dtype).newbyteorder('<'))
+    spec = {'dtype': dtype, 'bdata': base64.b64encode(values.tobytes()).decode('ascii')}
+    if values.ndim > 1:
+        spec['shape'] = ','.join(str(n) for n in values.shape)
+    return spec
+
+
+def decimate(n, cells):
+    """Indices of at most cells + 1 evenly spread points along an axis, both ends kept"""
+    if n <= cells + 1:
+        return np.arange(n)
+    return np.unique(np.round(np.linspace(0, n - 1, cells + 1)).astype(int))
+
+
+def tile_spans(n, cells):
+    """(start, stop) index ranges covering an axis, each sharing its last point with the next"""
+    if n <= 1:
+        return [(0, n)]
+    return [(start, min(start + cells, n - 1) + 1) for start in range(0, n - 1, cells)]
+
+
+def axis_fractions(sizes):
+    """Position of each size along a log axis, 0 at the smallest and 1 at the largest"""
+    logs = np.log2(sizes.astype(float))
+    span = logs[-1] - logs[0]
+    return (logs - logs[0]) / span if span else np.zeros(len(sizes))
+
+
+def lod_surface(surface, coarse_cells=COARSE_CELLS, tile_cells=TILE_CELLS):
+    """Levels of detail of one IOZone surface as typed arrays
+
+    Returns {'coarse': {'x', 'y', 'z'}, 'tiles': [{'x', 'y', 'z', 'box'}]}
+    where x are record sizes, y file sizes and box the tile's extent as
+    [x0, x1, y0, y1] fractions of the log axes. A surface that fits the
+    coarse mesh is drawn as is and has no tiles.
+    """
+    rows = decimate(len(surface.file_sizes), coarse_cells)
+    cols = decimate(len(surface.record_sizes), coarse_cells)
+    coarse = {'x': typed_array(surface.record_sizes[cols], 'f8'),
+              'y': typed_array(surface.file_sizes[rows], 'f8'),
+              'z': typed_array(surface.values[np.ix_(rows, cols)])}
+    if len(rows) == len(surface.file_sizes) and len(cols) == len(surface.record_sizes):
+        return {'coarse': coarse, 'tiles': []}
+
+    fx = axis_fractions(surface.record_sizes)
+    fy = axis_fractions(surface.file_sizes)
+    tiles = []
+    for r0, r1 in tile_spans(len(surface.file_sizes), tile_cells):
+        for c0, c1 in tile_spans(len(surface.record_sizes), tile_cells):
+            values = surface.values[r0:r1, c0:c1]
+            if np.isnan(values).all():
+                continue
+            tiles.append({'x': typed_array(surface.record_sizes[c0:c1], 'f8'),
+                          'y': typed_array(surface.file_sizes[r0:r1], 'f8'),
+                          'z': typed_array(values),
+                          'box': [float(fx[c0]), float(fx[c1 - 1]), float(fy[r0]), float(fy[r1 - 1])]})
+    return {'coarse': coarse, 'tiles': tiles}
+
+
+def lod_trace(lod, z_max):
+    """go.Surface data arguments for a level-of-detail surface's coarse mesh
+
+    The colour range is fixed so the tiles loaded later are coloured alike.
+    """
+    coarse = lod['coarse']
+    return {'x': coarse['x'], 'y': coarse['y'], 'z': coarse['z'], 'cmin': 0, 'cmax': z_max}
+
+
+def lod_post_script(lod, zoom=ZOOM_DISTANCE):
+    """post_script for plotly's write_html that loads a surface's tiles on zoom
+
+    The surface must be the figure's first trace.
+    """
+    data = json.dumps({'tiles': lod['tiles'], 'zoom': zoom}).replace('</', '<\\/')
+    return LOD_SCRIPT + f"iozoneLod(document.getElementById('{{plot_id}}'), {data});"
+
+
+def _script_json(f, element_id, data):
+    f.write(f'    <script type="application/json" id="{element_id}">')
+    # Escape "</" so the payload cannot close the script element
+    f.write(json.dumps(data, separators=(',', ':')).replace('</', '<\\/'))
+    f.write('</script>\n')
+
+
+def write_lod_report(runs, output_file, tests=None, coarse_cells=COARSE_CELLS, tile_cells=TILE_CELLS,
+                     zoom=ZOOM_DISTANCE, plotly_js=PLOTLY_JS):
+    """One page of every test of every run, drawn from coarse meshes and refined on zoom
+
+    runs is [(label, surfaces, units)] as from parse_iozone_report. Each test
+    is a row of one plot per run on a shared z range. Coarse meshes are in
+    one JSON block read on load; each plot's tiles are in their own block,
+    only parsed when that plot is drawn. Returns the number of plots.
+    """
+    tests = [t for t in (tests or TESTS) if any(t in surfaces for _, surfaces, _ in runs)]
+    plots = []
+    with open(output_file, 'w') as f:
+        f.write('<!DOCTYPE html>\n<html>\n<head>\n    <title>IOZone Surfaces</title>\n')
+        f.write(f'    <meta charset="utf-8">\n    <script src="{html.escape(plotly_js)}"></script>\n')
+        f.write(f'    <style>{PAGE_STYLE}    </style>\n</head>\n<body>\n    <h1>IOZone Surfaces</h1>\n')
+        for test in tests:
+            present = [(label, surfaces[test], units) for label, surfaces, units in runs if test in surfaces]
+            z_max = float(max(np.nanmax(s.values) for _, s, _ in present))
+            f.write(f'    <h2>{html.escape(test)}</h2>\n    <div class="row">\n')
+            for label, surface, units in present:
+                lod = lod_surface(surface, coarse_cells, tile_cells)
+                plot_id = len(plots)
+                plots.append({'id': plot_id, 'title': f'{test} ({label})', 'units': units, 'zmax': z_max,
+                              'zoom': zoom, 'coarse': lod['coarse']})
+                f.write(f'        <div class="lod-plot" data-plot="{plot_id}"></div>\n')
+                _script_json(f, f'lod-tiles-{plot_id}', lod['tiles'])
+            f.write('    </div>\n')
+        _script_json(f, 'lod-plots', {'colorscale': COLORSCALE, 'plots': plots})
+        f.write(f'    <script>{LOD_SCRIPT}    </script>\n')
+        f.write(PAGE_SCRIPT)
+        f.write('</body>\n</html>\n')
+    return len(plots)
+
+
+def run_label(path):
+    """Platform and file name of a report, e.g. VM: vm_iozone_results.txt"""
+    from tool_parsers import infer_platform
+    platform = infer_platform(path)
+    name = os.path.basename(path)
+    return f'{platform}: {name}' if platform else name
+
+
+def main():
+    if len(sys.argv) < 3:
+        print("Usage: python iozone_lod.py <output.html> <iozone_results.txt> [...]")
+        sys.exit(1)
+
+    start = time.perf_counter()
+    runs = []
+    for path in sys.argv[2:]:
+        surfaces, units = parse_iozone_report(path)
+        runs.append((run_label(path), surfaces, units))
+    count = write_lod_report(runs, sys.argv[1])
+    print(f"{count} surfaces from {len(runs)} reports written to {sys.argv[1]} "
+          f"({os.path.getsize(sys.argv[1]) / 1024:.0f} KB) in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+
+import sys
+from collections import namedtuple
+
+import numpy as np
+
+# One "<test> report" section of `iozone -R` output. values[i, j] is the
+# throughput for file_sizes[i] and record_sizes[j]; cells IOZone did not
+# measure are NaN.
+IOZoneSurface = namedtuple('IOZoneSurface', ['test', 'file_sizes', 'record_sizes', 'values'])
+
+# Report sections in the order IOZone prints them
+TESTS = [
+    'Writer', 'Re-writer', 'Reader', 'Re-reader', 'Random read', 'Random write',
+    'Backward read', 'Record rewrite', 'Stride read', 'Fwrite', 'Re-fwrite',
+    'Fread', 'Re-fread',
+]
+
+
+def _build_surface(test, header, rows):
+    """Scatter the ragged rows of one section into a dense NaN-filled array"""
+    record_sizes = np.array(header, dtype=np.int64)
+    file_sizes = np.array([size for size, _ in rows], dtype=np.int64)
+    lengths = np.array([len(cells) for _, cells in rows], dtype=np.int64)
+    flat = np.array([cell for _, cells in rows for cell in cells], dtype=np.float64)
+
+    values = np.full((len(file_sizes), len(record_sizes)), np.nan)
+    if len(flat):
+        # Row i holds lengths[i] cells, left-aligned under the header
+        row_idx = np.repeat(np.arange(len(rows)), lengths)
+        col_idx = np.arange(len(flat)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        keep = col_idx < len(record_sizes)
+        values[row_idx[keep], col_idx[keep]] = flat[keep]
+    # IOZone writes 0 for record sizes it skipped on large files
+    values[values <= 0] = np.nan
+    return IOZoneSurface(test, file_sizes, record_sizes, values)
+
+
+def parse_iozone_report(file_path):
+    """Parse the Excel-style sections of `iozone -R` output in one pass
+
+    Returns (surfaces, units) where surfaces maps the test name (see TESTS)
+    to an IOZoneSurface and units is 'ops/sec' for `-O` runs, else 'KB/sec'.
+    """
+    surfaces = {}
+    units = 'KB/sec'
+    test, header, rows = None, None, []
+
+    with open(file_path, 'r', errors='replace') as f:
+        for line in f:
+            stripped = line.strip()
+            if not stripped:
+                continue
+            if stripped[0] != '"':
+                # -O prints "OPS Mode. Output is in operations per second."
+                if 'Output is in operations per second' in stripped or 'OPS Mode' in stripped:
+                    units = 'ops/sec'
+                continue
+
+            tokens = stripped.replace('"', ' ').split()
+            if stripped.endswith(' report"'):
+                if test is not None and header is not None:
+                    surfaces[test] = _build_surface(test, header, rows)
+                test = stripped.strip('"')[:-len(' report')].capitalize()
+                header, rows = None, []
+            elif test is None:
+                continue
+            elif header is None:
+                header = [int(t) for t in tokens]
+            else:
+                rows.append((int(tokens[0]), [float(t) for t in tokens[1:]]))
+
+    if test is not None and header is not None:
+        surfaces[test] = _build_surface(test, header, rows)
+    return surfaces, units
+
+
+def align_surfaces(a, b):
+    """Restrict two surfaces to their common file and record sizes
+
+    Returns (file_sizes, record_sizes, a_values, b_values).
+    """
+    file_sizes, a_rows, b_rows = np.intersect1d(a.file_sizes, b.file_sizes, return_indices=True)
+    record_sizes, a_cols, b_cols = np.intersect1d(a.record_sizes, b.record_sizes, return_indices=True)
+    return (file_sizes, record_sizes,
+            a.values[np.ix_(a_rows, a_cols)], b.values[np.ix_(b_rows, b_cols)])
+
+
+def load_reports(file_paths):
+    """Parse many reports: {file_path: (surfaces, units)}"""
+    return {path: parse_iozone_report(path) for path in file_paths}
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: python iozone_parser.py <iozone_results.txt> [...]")
+        sys.exit(1)
+
+    for file_path in sys.argv[1:]:
+        surfaces, units = parse_iozone_report(file_path)
+        print(f"{file_path} ({units})")
+        for test, surface in surfaces.items():
+            measured = np.count_nonzero(~np.isnan(surface.values))
+            print(f"  {test:<15} {len(surface.file_sizes):>3} file sizes x "
+                  f"{len(surface.record_sizes):>3} record sizes, {measured} cells, "
+                  f"max {np.nanmax(surface.values):.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+
+import argparse
+import csv
+import os
+import re
+import shlex
+import subprocess
+import sys
+import time
+from collections import namedtuple
+
+# One test of an iozone throughput mode (-t) run. aggregate is what iozone calls
+# "Children see throughput", parent the "Parent sees" figure that also counts
+# the time to start and stop the children; child_rates are per child (-C).
+ThroughputResult = namedtuple('ThroughputResult', ['test', 'children', 'aggregate', 'parent',
+                                                   'min', 'max', 'avg', 'unit', 'child_rates'])
+
+# One point of the sweep: clients x threads per client, and which client each child ran on
+SweepPoint = namedtuple('SweepPoint', ['clients', 'threads', 'hosts'])
+
+# "Children see throughput for  4 initial writers 	=  401234.56 kB/sec"
+AGGREGATE = re.compile(r'^\s*(Children see|Parent sees) throughput for\s+(\d+)\s+(.+?)\s*=\s*([\d.]+)\s*(\S+)/sec')
+# "Min throughput per process 			=   99000.00 kB/sec"
+PER_PROCESS = re.compile(r'^\s*(Min|Max|Avg) throughput per (?:process|thread)\s*=\s*([\d.]+)')
+# "Child[0] xfer count = 1048576.00 kB, Throughput =  100000.00 kB/sec, wall=..."
+CHILD = re.compile(r'^\s*Child\[\s*(\d+)\]\s*xfer count\s*=\s*[\d.]+\s*\S+,\s*Throughput\s*=\s*([\d.]+)')
+
+DEFAULT_THREADS = [1, 2, 4]
+
+BENCHMARK = 'iozone_throughput'
+
+CSV_COLUMNS = ['platform', 'test', 'clients', 'threads', 'children', 'aggregate', 'parent',
+               'min', 'max', 'avg', 'unit', 'scaling']
+
+
+def test_name(label):
+    """Metric name of an iozone test label, e.g. 'initial writers' -> initial_writers"""
+    return label.lower().replace(' ', '_').replace('-', '')
+
+
+def parse_throughput(text):
+    """ThroughputResult per test of an iozone -t report, in the order they ran"""
+    results = []
+    current = None
+    for line in text.splitlines():
+        match = AGGREGATE.match(line)
+        if match:
+            kind, children, label, value, unit = match.groups()
+            if kind == 'Children see':
+                current = {'test': test_name(label), 'children': int(children), 'aggregate': float(value),
+                           'parent': None, 'min': None, 'max': None, 'avg': None, 'unit': unit,
+                           'child_rates': []}
+                results.append(current)
+            elif current is not None:
+                current['parent'] = float(value)
+            continue
+        if current is None:
+            continue
+        match = PER_PROCESS.match(line)
+        if match:
+            current[match.group(1).lower()] = float(match.group(2))
+            continue
+        match = CHILD.match(line)
+        if match:
+            current['child_rates'].append((int(match.group(1)), float(match.group(2))))
+    return [ThroughputResult(**dict(r, child_rates=[rate for _, rate in sorted(r['child_rates'])]))
+            for r in results]
+
+
+def read_inventory(path):
+    """Host names of an MPI hostfile ("Node01 slots=1" per line)"""
+    hosts = []
+    with open(path) as f:
+        for line in f:
+            line = line.split('#', 1)[0].strip()
+            if line and line.split()[0] not in hosts:
+                hosts.append(line.split()[0])
+    return hosts
+
+
+def sweep(hosts, clients=None, threads=DEFAULT_THREADS):
+    """SweepPoints for every client count and threads per client
+
+    Clients are taken from the front of hosts, and each child is placed on
+    its client in turn so child i of a run with t threads runs on client i // t.
+    """
+    points = []
+    for c in clients or range(1, len(hosts) + 1):
+        if c > len(hosts):
+            raise ValueError(f"{c} clients asked for but the inventory has {len(hosts)} hosts")
+        for t in threads:
+            points.append(SweepPoint(c, t, [h for h in hosts[:c] for _ in range(t)]))
+    return points
+
+
+def client_file(point, workdir, iozone):
+    """-+m client list text: one line per child, each child on its own file in workdir"""
+    return ''.join(f"{host} {workdir} {iozone} {workdir}/iozone_throughput.{i}\n"
+                   for i, host in enumerate(point.hosts))
+
+
+def absolute_command(command):
+    """Command line with every relative path that exists here made absolute
+
+    The sweep runs `cd <workdir>` first, so e.g. "python3 analysis/fake_iozone.py"
+    would otherwise be looked up in the workdir.
+    """
+    return ' '.join(shlex.quote(os.path.abspath(word)) if not os.path.isabs(word) and os.path.exists(word)
+                    else shlex.quote(word) for word in shlex.split(command))
+
+
+def iozone_command(point, workdir, iozone, size, record, tests, local):
+    """Shell command for one sweep point, reading its -+m client list from stdin
+
+    Local workers are plain forked iozone children, each given its own file
+    with -F; distributed runs start the children on the clients with -+m.
+    """
+    children = len(point.hosts)
+    args = ['-t', str(children), '-s', size, '-r', record, '-e', '-C']
+    for test in tests:
+        args += ['-i', str(test)]
+    if local:
+        script = f"cd {shlex.quote(workdir)} && "
+        args += ['-F'] + [f'iozone_throughput.{i}' for i in range(children)]
+    else:
+        clients = f'{workdir}/iozone_clients_{point.clients}x{point.threads}.txt'
+        script = f"cat > {shlex.quote(clients)} && cd {shlex.quote(workdir)} && "
+        args += ['-+m', clients]
+    # iozone itself may be a command line, e.g. a docker exec prefix or a modelled stand-in
+    return script + ' '.join([iozone] + [shlex.quote(a) for a in args])
+
+
+def run_point(point, command, client_text, exec_prefix=None, rsh='ssh', timeout=None):
+    """Run one sweep point; returns (output, returncode)"""
+    # iozone starts remote children with $RSH (rsh by default); set through env so
+    # it also reaches iozone behind an exec prefix
+    argv = shlex.split(exec_prefix or '') + ['env', f'RSH={rsh}', 'bash', '-c', command]
+    try:
+        proc = subprocess.run(argv, input=client_text, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                              text=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return '', 'timeout'
+    return proc.stdout, proc.returncode
+
+
+def scaling(results):
+    """{(test, clients, threads): aggregate / (children x the one-child aggregate)}
+
+    1.0 is perfect scaling; the sweep point with one child of a test is the
+    reference, so a sweep without one has no scaling figures.
+    """
+    single = {test: r.aggregate for (test, c, t), r in results.items() if r.children == 1}
+    return {key: r.aggregate / (r.children * single[key[0]]) if single.get(key[0]) else None
+            for key, r in results.items()}
+
+
+def store_records(platform, point, results, timestamp):
+    """Results store rows for one sweep point
+
+    Aggregate figures have no host, like every other final result; per-child
+    rates carry the client the child ran on.
+    """
+    records = []
+    config = f'{point.clients}x{point.threads}'
+    for r in results:
+        unit = 'kbps' if r.unit.lower() == 'kb' else 'ops'
+        for field in ('aggregate', 'parent', 'min', 'max', 'avg'):
+            value = getattr(r, field)
+            if value is not None:
+                records.append({'platform': platform, 'host': '', 'benchmark': BENCHMARK,
+                                'metric': f'{r.test}_{config}_{field}_{unit}', 'value': value,
+                                'timestamp': timestamp})
+        for host, rate in zip(point.hosts, r.child_rates):
+            records.append({'platform': platform, 'host': host, 'benchmark': BENCHMARK,
+                            'metric': f'{r.test}_{config}_child_{unit}', 'value': rate,
+                            'timestamp': timestamp})
+    return records
+
+
+def format_table(results, factors):
+    """Scaling table, one row per test and sweep point"""
+    lines = [f"{'Test':<16} {'Clients':>7} {'Threads':>7} {'Aggregate':>14} {'Per child':>12} "
+             f"{'Parent':>14} {'Scaling':>8}"]
+    tests = list(dict.fromkeys(test for test, _, _ in results))
+    for test, clients, threads in sorted(results, key=lambda k: (tests.index(k[0]), k[1], k[2])):
+        r = results[(test, clients, threads)]
+        factor = factors.get((test, clients, threads))
+        parent = f'{r.parent:.0f}' if r.parent is not None else '-'
+        lines.append(f"{test:<16} {clients:>7} {threads:>7} {r.aggregate:>14.0f} "
+                     f"{r.aggregate / r.children:>12.0f} {parent:>14} "
+                     f"{f'{factor:.2f}' if factor is not None else '-':>8}")
+    return '\n'.join(lines)
+
+
+def int_list(text):
+    return [int(v) for v in text.split(',') if v]
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        description="Sweep IOZone throughput mode over concurrent clients and threads per client")
+    where = parser.add_mutually_exclusive_group()
+    where.add_argument('--hostfile', default='hosts',
+                       help="MPI hostfile the clients are taken from (default: %(default)s)")
+    where.add_argument('--local', type=int, default=None, metavar='WORKERS',
+                       help="Use this many local worker processes as the clients instead of the cluster")
+    parser.add_argument('--clients', type=int_list, default=None,
+                        help="Comma separated client counts (default: 1 up to every client)")
+    parser.add_argument('--threads', type=int_list, default=DEFAULT_THREADS,
+                        help="Comma separated threads per client (default: 1,2,4)")
+    parser.add_argument('--workdir', default='/shared', help="Directory the test files go in (default: %(default)s)")
+    parser.add_argument('--size', default='1g', help="File size per child (default: %(default)s)")
+    parser.add_argument('--record', default='1m', help="Record size (default: %(default)s)")
+    parser.add_argument('--tests', type=int_list, default=[0, 1],
+                        help="iozone -i tests, 0=write 1=read 2=random (default: 0,1)")
+    parser.add_argument('--iozone', default='iozone', help="iozone command on this machine (default: %(default)s)")
+    parser.add_argument('--remote-iozone', default='/usr/bin/iozone',
+                        help="iozone path on the clients, for the -+m list (default: %(default)s)")
+    parser.add_argument('--exec', dest='exec_prefix', default=None,
+                        help="Prefix to run iozone with, e.g. 'docker exec -i Master' for the containers")
+    parser.add_argument('--rsh', default='ssh', help="Remote shell iozone starts clients with (default: %(default)s)")
+    parser.add_argument('--timeout', type=float, default=None, help="Seconds before a sweep point is abandoned")
+    parser.add_argument('--platform', default='', help="Platform name for the results store, e.g. VM")
+    parser.add_argument('--log-dir', default=None, help="Keep each sweep point's iozone output here")
+    parser.add_argument('--csv', default=None, help="Write the scaling table to this CSV file")
+    parser.add_argument('--store', default=None, help="Append the results to this results store")
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_args(sys.argv[1:])
+    if 0 not in args.tests:
+        # Every other test reads the files the write test leaves
+        args.tests = [0] + args.tests
+    local = args.local is not None
+    if local:
+        hosts = [f'local{i}' for i in range(args.local)]
+    else:
+        if not os.path.exists(args.hostfile):
+            print(f"Error: hostfile not found: {args.hostfile}")
+            sys.exit(1)
+        hosts = read_inventory(args.hostfile)
+    try:
+        points = sweep(hosts, args.clients, args.threads)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    if args.log_dir:
+        os.makedirs(args.log_dir, exist_ok=True)
+    if not args.exec_prefix:
+        args.iozone = absolute_command(args.iozone)
+
+    results = {}
+    records = []
+    failed = 0
+    for point in points:
+        command = iozone_command(point, args.workdir, args.iozone, args.size, args.record, args.tests, local)
+        start = time.perf_counter()
+        output, status = run_point(point, command, client_file(point, args.workdir, args.remote_iozone),
+                                   args.exec_prefix, args.rsh, args.timeout)
+        if args.log_dir:
+            with open(os.path.join(args.log_dir, f'iozone_throughput_{point.clients}x{point.threads}.txt'), 'w') as f:
+                f.write(output)
+        parsed = parse_throughput(output)
+        if status != 0 or not parsed:
+            failed += 1
+            tail = output.strip().splitlines()[-1:] or ['no output']
+            print(f"{point.clients} clients x {point.threads} threads failed ({status}): {tail[0]}", file=sys.stderr)
+            continue
+        print(f"{point.clients} clients x {point.threads} threads: {len(point.hosts)} children "
+              f"in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+        for r in parsed:
+            results[(r.test, point.clients, point.threads)] = r
+        records += store_records(args.platform, point, parsed, time.time())
+
+    factors = scaling(results)
+    print(format_table(results, factors))
+
+    if args.csv:
+        with open(args.csv, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(CSV_COLUMNS)
+            for (test, clients, threads), r in results.items():
+                writer.writerow([args.platform, test, clients, threads, r.children, r.aggregate, r.parent,
+                                 r.min, r.max, r.avg, r.unit, factors.get((test, clients, threads))])
+
+    if args.store and records:
+        from results_store import ResultsStore
+        ResultsStore(args.store).append(records)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,459 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import math
+import os
+import re
+import struct
+import sys
+import time
+import zlib
+
+import numpy as np
+
+from tool_parsers import IPERF_LINE, SNIFF_BYTES, SYSBENCH_TESTS, infer_platform
+
+# Histograms here record nanoseconds; values above this (one hour) count as this
+DEFAULT_HIGHEST = 3600 * 10 ** 9
+
+# Decimal digits kept for every value: 3 gives 0.1% resolution at any magnitude
+DEFAULT_SIGNIFICANT_FIGURES = 3
+
+# The percentiles the reports compare
+PERCENTILES = (50, 99, 99.9)
+
+# Blob layout: magic, significant figures, highest, total count, min and max,
+# then zlib of the non-zero buckets as <u4 index deltas followed by <u8 counts
+BLOB_HEADER = struct.Struct('<4sB3xqqqq')
+BLOB_MAGIC = b'HDR1'
+
+BENCHMARK = 'latency'
+
+# sysbench --histogram: a header, then "  value |*****  count" rows in milliseconds
+SYSBENCH_HISTOGRAM = re.compile(r'Latency histogram \(values are in milliseconds\)\n[^\n]*\n((?:[ \t]*[\d.]+ \|\**[ \t]+\d+\n?)+)')
+SYSBENCH_BUCKET = re.compile(r'^\s*([\d.]+) \|\**\s+(\d+)\s*$', re.M)
+
+# iozone -Q writes one "offset latency size" row per operation to files such as
+# wol.dat, or Child_0_wol.dat in throughput mode
+IOZONE_LATENCY_HEADER = 'Latency in microseconds'
+IOZONE_LATENCY_FILES = {
+    'wol': 'write',
+    'rwol': 'rewrite',
+    'rol': 'read',
+    'rrol': 'reread',
+    'rand_wol': 'random_write',
+    'rand_rol': 'random_read',
+}
+
+# Percentile-distribution curves are drawn up to 1 - 10**-CURVE_NINES
+CURVE_NINES = 5
+
+CSV_COLUMNS = ['histogram', 'platform', 'count', 'p50_us', 'p99_us', 'p99.9_us', 'max_us']
+
+
+class HdrHistogram:
+    """Fixed-size, log-bucketed histogram of non-negative integers (HDR layout)
+
+    Values are grouped into buckets whose width doubles with every power of
+    two, each split into enough sub-buckets to keep `significant_figures`
+    digits. The counts live in one NumPy array sized by the range alone, so
+    memory is fixed however many values are recorded. Histograms with the
+    same precision merge by adding counts, without losing anything.
+    """
+
+    def __init__(self, highest=DEFAULT_HIGHEST, significant_figures=DEFAULT_SIGNIFICANT_FIGURES):
+        if not 1 <= significant_figures <= 5:
+            raise ValueError("significant_figures must be between 1 and 5")
+        self.significant_figures = significant_figures
+        self.sub_bucket_count = 1 << math.ceil(math.log2(2 * 10 ** significant_figures))
+        self.sub_bucket_half_count = self.sub_bucket_count // 2
+        self.sub_bucket_half_count_magnitude = self.sub_bucket_count.bit_length() - 2
+        self._resize(int(highest))
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def _resize(self, highest):
+        buckets, smallest_untrackable = 1, self.sub_bucket_count
+        while smallest_untrackable <= highest:
+            smallest_untrackable <<= 1
+            buckets += 1
+        length = (buckets + 1) * self.sub_bucket_half_count
+        counts = np.zeros(length, dtype=np.int64)
+        if hasattr(self, 'counts'):
+            counts[:len(self.counts)] = self.counts
+        self.highest = highest
+        self.counts = counts
+
+    def index_of(self, values):
+        """Bucket index of each value"""
+        values = np.asarray(values, dtype=np.int64)
+        # Bit length of value | mask, exact in float64 for values below 2**53
+        magnitude = np.frexp((values | (self.sub_bucket_count - 1)).astype(np.float64))[1]
+        bucket = magnitude - self.sub_bucket_half_count_magnitude - 1
+        sub_bucket = values >> bucket
+        return ((bucket + 1) << self.sub_bucket_half_count_magnitude) + sub_bucket - self.sub_bucket_half_count
+
+    def lowest_of(self, indexes):
+        """Smallest value of each bucket index, and the bucket widths"""
+        indexes = np.asarray(indexes, dtype=np.int64)
+        bucket = (indexes >> self.sub_bucket_half_count_magnitude) - 1
+        sub_bucket = (indexes & (self.sub_bucket_half_count - 1)) + self.sub_bucket_half_count
+        first = bucket < 0
+        sub_bucket = np.where(first, sub_bucket - self.sub_bucket_half_count, sub_bucket)
+        bucket = np.where(first, 0, bucket)
+        return sub_bucket << bucket, np.int64(1) << bucket
+
+    def record(self, values, counts=None):
+        """Record values (scalar or array), each `counts` times (default once)
+
+        Values above the histogram's range are recorded as its highest value;
+        max still holds the exact largest value.
+        """
+        values = np.atleast_1d(np.asarray(values, dtype=np.int64))
+        if not len(values):
+            return
+        if values.min() < 0:
+            raise ValueError("cannot record negative values")
+        counts = np.ones(len(values), dtype=np.int64) if counts is None \
+            else np.broadcast_to(np.asarray(counts, dtype=np.int64), values.shape)
+        recorded = counts > 0
+        if not recorded.any():
+            return
+        values, counts = values[recorded], counts[recorded]
+        indexes = self.index_of(np.minimum(values, self.highest))
+        np.add.at(self.counts, indexes, counts)
+        self.total += int(counts.sum())
+        low, high = int(values.min()), int(values.max())
+        self.min = low if self.min is None else min(self.min, low)
+        self.max = high if self.max is None else max(self.max, high)
+
+    def merge(self, other):
+        """Add other's counts to this histogram, growing its range if other's is wider"""
+        if other.significant_figures != self.significant_figures:
+            raise ValueError(f"cannot merge histograms with {other.significant_figures} and "
+                             f"{self.significant_figures} significant figures")
+        if other.highest > self.highest:
+            self._resize(other.highest)
+        self.counts[:len(other.counts)] += other.counts
+        self.total += other.total
+        if other.total:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+        return self
+
+    def values_at_percentiles(self, percentiles):
+        """Value at or below which each percentile of the recorded values falls
+
+        Like HdrHistogram, returns the highest value equivalent to the bucket
+        holding the percentile, capped at the exact maximum.
+        """
+        percentiles = np.atleast_1d(np.asarray(percentiles, dtype=np.float64))
+        if not self.total:
+            return np.full(len(percentiles), np.nan)
+        ranks = np.maximum(np.ceil(np.minimum(percentiles, 100) / 100 * self.total), 1)
+        indexes = np.searchsorted(np.cumsum(self.counts), ranks)
+        low, width = self.lowest_of(indexes)
+        return np.minimum(low + width - 1, self.max).astype(np.float64)
+
+    def value_at_percentile(self, percentile):
+        return float(self.values_at_percentiles([percentile])[0])
+
+    def mean(self):
+        nonzero = np.flatnonzero(self.counts)
+        if not len(nonzero):
+            return math.nan
+        low, width = self.lowest_of(nonzero)
+        return float(np.dot(low + width // 2, self.counts[nonzero]) / self.total)
+
+    def to_bytes(self):
+        """Compact binary form: only the non-zero buckets are kept"""
+        nonzero = np.flatnonzero(self.counts)
+        deltas = np.diff(nonzero, prepend=0).astype('<u4')
+        payload = zlib.compress(deltas.tobytes() + self.counts[nonzero].astype('<u8').tobytes())
+        return BLOB_HEADER.pack(BLOB_MAGIC, self.significant_figures, self.highest, self.total,
+                                -1 if self.min is None else self.min, -1 if self.max is None else self.max) + payload
+
+    @classmethod
+    def from_bytes(cls, blob):
+        magic, figures, highest, total, low, high = BLOB_HEADER.unpack_from(blob)
+        if magic != BLOB_MAGIC:
+            raise ValueError("not a serialized histogram")
+        histogram = cls(highest, figures)
+        payload = zlib.decompress(blob[BLOB_HEADER.size:])
+        n = len(payload) // 12
+        indexes = np.cumsum(np.frombuffer(payload, dtype='<u4', count=n).astype(np.int64))
+        histogram.counts[indexes] = np.frombuffer(payload, dtype='<u8', offset=4 * n).astype(np.int64)
+        histogram.total, histogram.min, histogram.max = total, (None if low < 0 else low), (None if high < 0 else high)
+        return histogram
+
+
+# ----- sources -----
+
+def sysbench_histograms(text):
+    """{'sysbench_<test>': histogram} of a log of sysbench --histogram runs
+
+    `mpirun -np N sysbench` concatenates N reports; their histograms are
+    merged into one.
+    """
+    test = next((name for name, pattern in SYSBENCH_TESTS if pattern.search(text)), 'unknown')
+    histogram = HdrHistogram()
+    for block in SYSBENCH_HISTOGRAM.finditer(text):
+        rows = SYSBENCH_BUCKET.findall(block.group(1))
+        values = np.array([round(float(value) * 1e6) for value, _ in rows], dtype=np.int64)
+        histogram.record(values, np.array([int(count) for _, count in rows], dtype=np.int64))
+    return {f'sysbench_{test}': histogram} if histogram.total else {}
+
+
+def iperf3_histograms(report):
+    """Per-interval TCP round-trip times and UDP jitter of an iperf3 -J report"""
+    protocol = report.get('start', {}).get('test_start', {}).get('protocol', 'TCP').lower()
+    rtt, jitter = [], []
+    for interval in report.get('intervals', []):
+        for stream in interval.get('streams', []):
+            if 'rtt' in stream:
+                rtt.append(stream['rtt'] * 1000)  # microseconds
+            if stream.get('jitter_ms') is not None:
+                jitter.append(stream['jitter_ms'] * 1e6)
+    histograms = {}
+    for name, values in ((f'iperf_{protocol}_rtt', rtt), (f'iperf_{protocol}_jitter', jitter)):
+        if values:
+            histograms[name] = HdrHistogram()
+            histograms[name].record(np.round(values).astype(np.int64))
+    return histograms
+
+
+def iperf_histograms(text):
+    """Per-interval UDP jitter of an iperf -i log; the whole-run summary line is left out"""
+    lines = [(float(m.group(1)), float(m.group(2)), float(m.group(5)))
+             for m in IPERF_LINE.finditer(text) if m.group(5) is not None]
+    spans = {end - start for start, end, _ in lines}
+    if len(spans) > 1:
+        longest = max(spans)
+        lines = [line for line in lines if line[1] - line[0] < longest]
+    if not lines:
+        return {}
+    histogram = HdrHistogram()
+    histogram.record(np.round(np.array([jitter for _, _, jitter in lines]) * 1e6).astype(np.int64))
+    return {'iperf_udp_jitter': histogram}
+
+
+def iozone_histograms(path, text):
+    """Per-operation latencies of one iozone -Q file"""
+    stem = os.path.basename(path)[:-len('.dat')] if path.endswith('.dat') else os.path.basename(path)
+    kind = next((k for k in sorted(IOZONE_LATENCY_FILES, key=len, reverse=True)
+                 if stem == k or stem.endswith('_' + k)), stem)
+    rows = re.findall(r'^\s*\d+\s+(\d+)\s+\d+\s*$', text, re.M)
+    if not rows:
+        return {}
+    histogram = HdrHistogram()
+    histogram.record(np.array(rows, dtype=np.int64) * 1000)
+    return {f"iozone_{IOZONE_LATENCY_FILES.get(kind, kind)}": histogram}
+
+
+def file_histograms(path):
+    """Latency histograms of any supported log; {} for anything else"""
+    with open(path, 'r', errors='replace') as f:
+        head = f.read(SNIFF_BYTES)
+        text = head + f.read()
+    if 'Latency histogram (values are in milliseconds)' in text:
+        return sysbench_histograms(text)
+    if IOZONE_LATENCY_HEADER in head:
+        return iozone_histograms(path, text)
+    if head.lstrip().startswith('{'):
+        try:
+            report = json.loads(text)
+        except ValueError:
+            return {}
+        return iperf3_histograms(report) if isinstance(report, dict) and 'intervals' in report else {}
+    if IPERF_LINE.search(head):
+        return iperf_histograms(text)
+    return {}
+
+
+def platform_of(path):
+    """Platform from the file name or, failing that, the nearest directory such as vm_results"""
+    path = os.path.abspath(path)
+    while path not in ('', os.sep):
+        platform = infer_platform(path)
+        if platform:
+            return platform
+        path = os.path.dirname(path)
+    return ''
+
+
+def merge_into(histograms, platform, found):
+    for name, histogram in found.items():
+        target = histograms.setdefault(platform, {})
+        if name in target:
+            target[name].merge(histogram)
+        else:
+            target[name] = histogram
+
+
+def load_histograms(paths):
+    """{platform: {name: histogram}} of every log under paths
+
+    Directories are searched recursively for .txt, .json and .dat files.
+    Histograms with the same platform and name (ranks, nodes, repeated
+    runs) are merged.
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for directory, _, names in sorted(os.walk(path)):
+                files += [os.path.join(directory, n) for n in sorted(names)
+                          if n.endswith(('.txt', '.json', '.dat'))]
+        else:
+            files.append(path)
+    histograms = {}
+    for path in files:
+        merge_into(histograms, platform_of(path), file_histograms(path))
+    return histograms
+
+
+# ----- results store -----
+
+def store_records(histograms, host='', timestamp=None):
+    """(rows, blob records) for a ResultsStore: the percentiles in microseconds and the histograms"""
+    rows, blobs = [], []
+    for platform, named in histograms.items():
+        for name, histogram in named.items():
+            key = {'platform': platform, 'host': host, 'benchmark': BENCHMARK, 'timestamp': timestamp}
+            values = dict(zip((f'p{p:g}_us'.replace('.', '_') for p in PERCENTILES),
+                              histogram.values_at_percentiles(PERCENTILES) / 1000))
+            values.update(count=histogram.total, max_us=histogram.max / 1000)
+            rows += [dict(key, metric=f'{name}_{field}', value=value) for field, value in values.items()]
+            blobs.append(dict(key, metric=name, blob=histogram.to_bytes()))
+    return rows, blobs
+
+
+def load_from_store(store, since=None, until=None, **filters):
+    """{platform: {name: histogram}} merged over every stored histogram that matches"""
+    histograms = {}
+    for entry, blob in store.query_blobs(since, until, benchmark=BENCHMARK, **filters):
+        merge_into(histograms, entry['platform'], {entry['metric']: HdrHistogram.from_bytes(blob)})
+    return histograms
+
+
+# ----- reports -----
+
+def percentile_rows(histograms):
+    """Rows for CSV_COLUMNS, latencies in microseconds"""
+    rows = []
+    names = sorted({name for named in histograms.values() for name in named})
+    for name in names:
+        for platform, named in histograms.items():
+            if name in named:
+                h = named[name]
+                rows.append([name, platform, h.total] + (h.values_at_percentiles(PERCENTILES) / 1000).tolist()
+                            + [h.max / 1000])
+    return rows
+
+
+def format_comparison(histograms):
+    """Change of every percentile on each platform against the first platform"""
+    platforms = list(histograms)
+    baseline = histograms[platforms[0]]
+    lines = []
+    for platform in platforms[1:]:
+        for name, histogram in sorted(histograms[platform].items()):
+            if name not in baseline:
+                continue
+            base = baseline[name].values_at_percentiles(PERCENTILES)
+            other = histogram.values_at_percentiles(PERCENTILES)
+            changes = ', '.join(f"p{p:g} {(o / b - 1) * 100:+.1f}%" if b else f"p{p:g} {o / 1000:.3g}us vs 0"
+                                for p, b, o in zip(PERCENTILES, base, other))
+            lines.append(f"{name}: {platform} vs {platforms[0]}: {changes}")
+    return '\n'.join(lines)
+
+
+def percentile_chart_job(histograms, output_file):
+    """Render job of the percentile distributions, one panel per histogram, one line per platform"""
+    from analyze_hpcc import PLATFORM_COLORS
+    from render import figure_job
+
+    # Evenly spaced on the 1 / (1 - q) axis, from 0 to five nines
+    percentiles = 100 - 100 / np.logspace(0, CURVE_NINES, 16 * CURVE_NINES + 1)
+    panels = []
+    for name in sorted({name for named in histograms.values() for name in named}):
+        lines = []
+        for platform, named in histograms.items():
+            if name in named and named[name].total:
+                h = named[name]
+                # Past the last sample every percentile is the maximum: stop there,
+                # or at the last compared percentile for short runs
+                shown = percentiles[percentiles <= max(100 * (1 - 1 / h.total), PERCENTILES[-1])]
+                lines.append({'label': platform, 'x': shown.tolist(),
+                              'y': (h.values_at_percentiles(shown) / 1000).tolist(),
+                              'marks': (h.values_at_percentiles(PERCENTILES) / 1000).tolist()})
+        panels.append({'title': name, 'lines': lines})
+    return figure_job('percentiles', output_file, {'panels': panels, 'percentiles': list(PERCENTILES)}, {
+        'figsize': (10, 4 * max(len(panels), 1)),
+        'colors': PLATFORM_COLORS,
+        'title': 'Latency by percentile: ' + ' vs '.join(histograms),
+        'ylabel': 'Latency (us)',
+    })
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        description="HDR latency histograms from sysbench --histogram, iperf intervals and iozone -Q, "
+                    "compared by percentile between platforms",
+        usage="python latency_hist.py vm_results container_results [--store DIR]")
+    parser.add_argument('inputs', nargs='*',
+                        help="result files or directories; the platform comes from the vm_/container_ prefix "
+                             "of the file or of a directory above it")
+    parser.add_argument('--from-store', default=None, help="read the histograms kept in this results store instead")
+    parser.add_argument('--days', type=float, default=None, help="with --from-store, only the last N days")
+    parser.add_argument('--store', default=None, help="append the percentiles and histograms to this results store")
+    parser.add_argument('--host', default='', help="host name to store the histograms under (default: none)")
+    parser.add_argument('-o', '--output', default='latency_percentiles.png', help="chart file (default: %(default)s)")
+    parser.add_argument('--csv', default='latency_percentiles.csv', help="table file (default: %(default)s)")
+    args = parser.parse_args(argv)
+    if bool(args.inputs) == bool(args.from_store):
+        parser.error("give either result files or --from-store")
+    return args
+
+
+def main(argv=None):
+    import csv
+
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    if args.from_store:
+        from results_store import ResultsStore
+        since = time.time() - args.days * 86400 if args.days is not None else None
+        histograms = load_from_store(ResultsStore(args.from_store), since)
+    else:
+        histograms = load_histograms(args.inputs)
+    if not histograms:
+        sys.exit("no latency histograms found (sysbench --histogram, iperf -i or iperf3 -J, iozone -Q)")
+
+    rows = percentile_rows(histograms)
+    print(f"{'Histogram':<24} {'Platform':<12} {'Count':>10} {'p50 us':>10} {'p99 us':>10} {'p99.9 us':>10} "
+          f"{'max us':>10}")
+    for row in rows:
+        print(f"{row[0]:<24} {row[1]:<12} {row[2]:>10} {row[3]:>10.3f} {row[4]:>10.3f} {row[5]:>10.3f} "
+              f"{row[6]:>10.3f}")
+    if len(histograms) > 1:
+        print(format_comparison(histograms))
+
+    with open(args.csv, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(CSV_COLUMNS)
+        writer.writerows(rows)
+    from render import render_all
+    render_all([percentile_chart_job(histograms, args.output)])
+    print(f"Results saved to {args.csv} and {args.output}")
+
+    if args.store:
+        from results_store import ResultsStore
+        store = ResultsStore(args.store)
+        rows, blobs = store_records(histograms, args.host)
+        store.append(rows)
+        store.append_blobs(blobs)
+
+
+if __name__ == "__main__":
+    main()
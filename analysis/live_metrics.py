@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+
+import re
+import sys
+import time
+
+import numpy as np
+
+# Samples kept per metric; older ones are overwritten
+RING_CAPACITY = 4096
+
+# Samples buffered before they are appended to the results store as one segment,
+# flushed sooner if the oldest has waited FLUSH_SECONDS
+FLUSH_ROWS = 256
+FLUSH_SECONDS = 30.0
+
+# A partial line longer than this is dropped rather than buffered forever
+MAX_LINE = 65536
+
+
+class RingBuffer:
+    """Fixed-size buffer of float rows that overwrites the oldest row when full"""
+
+    def __init__(self, capacity=RING_CAPACITY, width=2):
+        self.data = np.empty((capacity, width), dtype=np.float64)
+        self.capacity = capacity
+        self.count = 0
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def append(self, row):
+        self.data[self.count % self.capacity] = row
+        self.count += 1
+
+    def extend(self, rows):
+        """Append many rows at once; only the last capacity of them are kept"""
+        rows = np.asarray(rows, dtype=np.float64)
+        kept = rows[-self.capacity:]
+        start = self.count + len(rows) - len(kept)
+        self.data[np.arange(start, start + len(kept)) % self.capacity] = kept
+        self.count += len(rows)
+
+    def view(self, last=None):
+        """Rows oldest first, optionally only the last N"""
+        n = len(self)
+        if last is not None:
+            n = min(n, last)
+        return self.data[np.arange(self.count - n, self.count) % self.capacity]
+
+
+# ----- interval line parsers: line -> [(metric, value), ...] -----
+
+# sysbench --report-interval: "[ 2s ] thds: 2 eps: 1834.55 lat (ms,95%): 1.10"
+#                             "[ 2s ] 4512.34 MiB/sec"
+SYSBENCH_INTERVAL = re.compile(r'^\[\s*(\d+)s\s*\]\s+(.*)$')
+SYSBENCH_FIELD = re.compile(r'(eps|tps|qps|reads|writes|fsyncs): ([\d.]+)')
+SYSBENCH_LATENCY = re.compile(r'lat \(ms,(\d+)%\): ([\d.]+)')
+SYSBENCH_MIB = re.compile(r'([\d.]+) MiB/sec')
+
+# iperf -i: "[  3]  0.0- 1.0 sec   112 MBytes   940 Mbits/sec" (iperf3 adds retransmits and sender/receiver)
+IPERF_INTERVAL = re.compile(
+    r'^\[\s*\d+\]\s+([\d.]+)\s*-\s*([\d.]+)\s+sec\s+[\d.]+\s+\w?Bytes\s+([\d.]+)\s+(\w?)bits/sec(.*)$')
+IPERF_SCALE = {'': 1e-6, 'K': 1e-3, 'M': 1.0, 'G': 1e3}
+
+# stress-ng --metrics-brief: "stress-ng: info:  [1234] cpu  12345  60.00  119.90  0.02  205.75  102.95"
+STRESS_NG_METRICS = re.compile(
+    r'^stress-ng: (?:info|metrc):\s+\[\d+\]\s+([\w-]+)\s+(\d+)\s+([\d.]+)\s+([\d.]+)\s+([\d.]+)\s+([\d.]+)\s+([\d.]+)')
+
+
+def parse_sysbench_line(line):
+    match = SYSBENCH_INTERVAL.match(line)
+    if not match:
+        return []
+    body = match.group(2)
+    samples = [(f'{name}_per_sec', float(value)) for name, value in SYSBENCH_FIELD.findall(body)]
+    latency = SYSBENCH_LATENCY.search(body)
+    if latency:
+        samples.append((f'latency_p{latency.group(1)}_ms', float(latency.group(2))))
+    mib = SYSBENCH_MIB.search(body)
+    if mib:
+        samples.append(('memory_MiB_per_sec', float(mib.group(1))))
+    return samples
+
+
+class IperfLineParser:
+    """Per-interval iperf bandwidth, ignoring the whole-run summary lines"""
+
+    def __init__(self):
+        self.last_end = 0.0
+
+    def __call__(self, line):
+        match = IPERF_INTERVAL.match(line)
+        if not match:
+            return []
+        start, end = float(match.group(1)), float(match.group(2))
+        tail = match.group(5)
+        # The summary repeats the full run from 0; iperf3 also tags it sender/receiver
+        if 'sender' in tail or 'receiver' in tail or (start == 0 and self.last_end > 0):
+            return []
+        self.last_end = end
+        return [('bandwidth_Mbps', float(match.group(3)) * IPERF_SCALE[match.group(4)])]
+
+
+def parse_stress_ng_line(line):
+    match = STRESS_NG_METRICS.match(line)
+    if not match:
+        return []
+    return [(f'{match.group(1)}_bogo_ops_per_sec', float(match.group(6)))]
+
+
+# Parser factories by tool; iperf keeps state so each stream gets its own parser
+LINE_PARSERS = {
+    'sysbench': lambda: parse_sysbench_line,
+    'iperf': IperfLineParser,
+    'stress-ng': lambda: parse_stress_ng_line,
+}
+
+
+# ----- early-abort rules -----
+
+class ThresholdRule:
+    """Abort when the mean of the last `window` samples leaves [below, above]"""
+
+    def __init__(self, metric, below=None, above=None, window=3):
+        self.metric = metric
+        self.below = below
+        self.above = above
+        self.window = window
+
+    def check(self, stream):
+        recent = stream.values(self.metric, self.window)
+        if len(recent) < self.window:
+            return None
+        mean = recent.mean()
+        if self.below is not None and mean < self.below:
+            return f"{self.metric} averaged {mean:.4g} over {self.window} samples, below {self.below:.4g}"
+        if self.above is not None and mean > self.above:
+            return f"{self.metric} averaged {mean:.4g} over {self.window} samples, above {self.above:.4g}"
+        return None
+
+
+class CollapseRule:
+    """Abort when a metric's recent mean drops below a fraction of its best so far"""
+
+    def __init__(self, metric, fraction=0.2, window=3, min_samples=5):
+        self.metric = metric
+        self.fraction = fraction
+        self.window = window
+        self.min_samples = min_samples
+        self.best = 0.0
+
+    def check(self, stream):
+        recent = stream.values(self.metric, self.window)
+        if len(recent) < self.window:
+            return None
+        mean = recent.mean()
+        collapsed = stream.count(self.metric) >= self.min_samples and mean < self.fraction * self.best
+        self.best = max(self.best, mean)
+        if collapsed:
+            return (f"{self.metric} collapsed to {mean:.4g}, "
+                    f"{mean / self.best * 100:.0f}% of its best {self.best:.4g}")
+        return None
+
+
+# Rules applied when a stream is created without explicit rules
+DEFAULT_RULES = {
+    'iperf': lambda: [CollapseRule('bandwidth_Mbps', fraction=0.2)],
+}
+
+
+class LiveStream:
+    """Parse benchmark output as it arrives into timestamped samples
+
+    Samples go into one ring buffer per metric (bounded memory however long
+    the run) and, when a ResultsStore is given, are appended to it in batches
+    of flush_rows or every flush_seconds. feed() returns the reason once an
+    abort rule fires.
+    """
+
+    def __init__(self, tool, store=None, keys=None, rules=None,
+                 capacity=RING_CAPACITY, flush_rows=FLUSH_ROWS, flush_seconds=FLUSH_SECONDS,
+                 clock=time.time):
+        if tool not in LINE_PARSERS:
+            raise ValueError(f"No live parser for {tool}")
+        self.tool = tool
+        self.parse_line = LINE_PARSERS[tool]()
+        self.store = store
+        self.keys = dict(keys or {}, benchmark=tool)
+        self.rules = rules if rules is not None else DEFAULT_RULES.get(tool, list)()
+        self.capacity = capacity
+        self.flush_rows = flush_rows
+        self.flush_seconds = flush_seconds
+        self.clock = clock
+        self.rings = {}
+        self.pending = []
+        self.partial = b''
+        self.abort_reason = None
+
+    def values(self, metric, last=None):
+        """The most recent values of a metric, oldest first"""
+        ring = self.rings.get(metric)
+        if ring is None:
+            return np.empty(0)
+        return ring.view(last)[:, 1]
+
+    def count(self, metric):
+        """Number of samples of a metric seen so far, including overwritten ones"""
+        ring = self.rings.get(metric)
+        return ring.count if ring is not None else 0
+
+    def add(self, metric, value, timestamp=None):
+        timestamp = self.clock() if timestamp is None else timestamp
+        ring = self.rings.get(metric)
+        if ring is None:
+            ring = self.rings[metric] = RingBuffer(self.capacity)
+        ring.append((timestamp, value))
+        if self.store is not None:
+            self.pending.append(dict(self.keys, metric=metric, value=value, timestamp=timestamp))
+            if (len(self.pending) >= self.flush_rows
+                    or timestamp - self.pending[0]['timestamp'] >= self.flush_seconds):
+                self.flush()
+
+    def feed_line(self, line):
+        samples = self.parse_line(line)
+        if not samples:
+            return None
+        now = self.clock()
+        for metric, value in samples:
+            self.add(metric, value, now)
+        if self.abort_reason is None:
+            for rule in self.rules:
+                reason = rule.check(self)
+                if reason:
+                    self.abort_reason = reason
+                    break
+        return self.abort_reason
+
+    def feed(self, chunk):
+        """Feed raw output bytes; returns an abort reason or None"""
+        lines = (self.partial + chunk).split(b'\n')
+        self.partial = lines.pop()
+        if len(self.partial) > MAX_LINE:
+            self.partial = b''
+        for raw in lines:
+            self.feed_line(raw.decode('utf-8', 'replace').rstrip('\r'))
+        return self.abort_reason
+
+    def flush(self):
+        """Append buffered samples to the results store"""
+        if self.pending and self.store is not None:
+            self.store.append(self.pending)
+        self.pending = []
+
+    def close(self):
+        """Parse any unterminated last line and flush"""
+        if self.partial:
+            self.feed_line(self.partial.decode('utf-8', 'replace').rstrip('\r'))
+            self.partial = b''
+        self.flush()
+
+    def summary(self):
+        """{metric: (samples, mean, min, max)} over the samples still buffered"""
+        result = {}
+        for metric, ring in self.rings.items():
+            values = ring.view()[:, 1]
+            result[metric] = (ring.count, float(values.mean()), float(values.min()), float(values.max()))
+        return result
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] not in LINE_PARSERS:
+        print(f"Usage: <benchmark> | python live_metrics.py <{'|'.join(LINE_PARSERS)}> [store_dir]")
+        sys.exit(1)
+
+    store = None
+    if len(sys.argv) > 2:
+        from results_store import ResultsStore
+        store = ResultsStore(sys.argv[2])
+
+    # Pass the output through like tee while watching it
+    stream = LiveStream(sys.argv[1], store)
+    for chunk in iter(lambda: sys.stdin.buffer.read1(65536), b''):
+        sys.stdout.buffer.write(chunk)
+        sys.stdout.buffer.flush()
+        reason = stream.feed(chunk)
+        if reason:
+            print(f"Abort: {reason}", file=sys.stderr)
+            break
+    stream.close()
+    for metric, (n, mean, low, high) in stream.summary().items():
+        print(f"{metric}: {n} samples, mean {mean:.4g}, min {low:.4g}, max {high:.4g}", file=sys.stderr)
+    if stream.abort_reason:
+        sys.exit(2)
+
+
+if __name__ == "__main__":
+    main()
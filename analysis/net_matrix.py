@@ -0,0 +1,415 @@
+#!/usr/bin/env python3
+
+import argparse
+import csv
+import json
+import os
+import queue
+import shlex
+import subprocess
+import sys
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+# One cell of the matrix. size is iperf3's -l (TCP write size or UDP datagram
+# size), window its -w socket buffer; None keeps iperf3's and the kernel's default.
+Cell = namedtuple('Cell', ['protocol', 'streams', 'size', 'window'])
+
+# What one cell measured. Throughput is what the receiver got; retransmits are
+# TCP only, jitter, lost and packets UDP only. CPU is iperf3's own utilisation.
+CellResult = namedtuple('CellResult', ['cell', 'throughput_mbps', 'retransmits', 'jitter_ms', 'lost',
+                                       'packets', 'loss_pct', 'cpu_sender', 'cpu_receiver'])
+
+# Where cells run. Cells on different lanes may run at the same time: each lane
+# has its own server, client, port and, in the namespace topologies, its own
+# namespaces, link and CPUs.
+Lane = namedtuple('Lane', ['name', 'server_exec', 'client_exec', 'address', 'port'])
+
+TOPOLOGIES = ('cluster', 'host', 'bridge', 'veth')
+
+# Namespaces, bridges and veths are named from this prefix so leftovers are easy to remove
+PREFIX = 'cpnet'
+
+# Lane i's namespaces use 10.203.i.1 (server) and 10.203.i.2 (client)
+SUBNET = '10.203'
+
+BASE_PORT = 5201
+
+# Seconds a cell may take beyond its duration before it is abandoned
+CELL_GRACE = 30
+
+# Attempts to reach a server that has not started listening yet
+CONNECT_ATTEMPTS = 20
+
+BENCHMARK = 'iperf_matrix'
+
+CSV_COLUMNS = ['platform', 'topology', 'protocol', 'streams', 'size', 'window', 'throughput_mbps',
+               'retransmits', 'jitter_ms', 'lost', 'packets', 'loss_pct', 'cpu_sender', 'cpu_receiver']
+
+
+def matrix(protocols, streams, tcp_sizes, udp_sizes, windows):
+    """Every combination of the sweep's dimensions, TCP cells first"""
+    return [Cell(protocol, p, size, window)
+            for protocol in protocols
+            for size in (tcp_sizes if protocol == 'tcp' else udp_sizes)
+            for window in windows
+            for p in streams]
+
+
+def cell_label(cell):
+    """Metric prefix of a cell, e.g. tcp_P4_l128K_wdefault"""
+    return f"{cell.protocol}_P{cell.streams}_l{cell.size or 'default'}_w{cell.window or 'default'}"
+
+
+def iperf_command(cell, lane, duration, udp_bandwidth, iperf='iperf3'):
+    """argv of the client for one cell, JSON output"""
+    argv = shlex.split(lane.client_exec) + [iperf, '-c', lane.address, '-p', str(lane.port), '-J',
+                                            '-t', str(duration), '-P', str(cell.streams)]
+    if cell.protocol == 'udp':
+        argv += ['-u', '-b', udp_bandwidth]
+    if cell.size:
+        argv += ['-l', cell.size]
+    if cell.window:
+        argv += ['-w', cell.window]
+    return argv
+
+
+def server_command(lane, iperf='iperf3'):
+    """argv of a one-off server (-1 exits after one test) for a lane"""
+    # Namespace lanes bind to their own address; elsewhere the server listens on every interface
+    bind = ['-B', lane.address] if lane.address.startswith(SUBNET + '.') else []
+    return shlex.split(lane.server_exec) + [iperf, '-s', '-1', '-p', str(lane.port)] + bind
+
+
+def parse_iperf3_json(text, cell):
+    """CellResult of one iperf3 -J run; raises ValueError with iperf3's error"""
+    try:
+        report = json.loads(text)
+    except ValueError:
+        raise ValueError(text.strip().splitlines()[-1] if text.strip() else "no output")
+    if report.get('error'):
+        raise ValueError(report['error'])
+    end = report['end']
+    cpu = end.get('cpu_utilization_percent', {})
+    if cell.protocol == 'tcp':
+        received = end['sum_received']
+        return CellResult(cell, received['bits_per_second'] / 1e6, end['sum_sent'].get('retransmits'),
+                          None, None, None, None, cpu.get('host_total'), cpu.get('remote_total'))
+    # iperf3 3.10 and later split UDP into sent and received; 'sum' has the server's jitter and loss
+    summary = end['sum']
+    received = end.get('sum_received', summary)
+    return CellResult(cell, received['bits_per_second'] / 1e6, None, summary.get('jitter_ms'),
+                      summary.get('lost_packets'), summary.get('packets'), summary.get('lost_percent'),
+                      cpu.get('host_total'), cpu.get('remote_total'))
+
+
+def run_cell(cell, lane, duration, udp_bandwidth, iperf='iperf3'):
+    """Start a server on the lane, run the client against it; returns (CellResult, raw JSON)"""
+    timeout = duration + CELL_GRACE
+    server = subprocess.Popen(server_command(lane, iperf), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        for attempt in range(CONNECT_ATTEMPTS):
+            proc = subprocess.run(iperf_command(cell, lane, duration, udp_bandwidth, iperf),
+                                  stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, timeout=timeout)
+            try:
+                return parse_iperf3_json(proc.stdout, cell), proc.stdout
+            except ValueError as e:
+                # The server may not be listening yet
+                if 'connect' not in str(e) or attempt == CONNECT_ATTEMPTS - 1:
+                    raise
+                time.sleep(0.1)
+    finally:
+        try:
+            server.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            server.kill()
+            server.wait()
+
+
+# ----- topologies -----
+
+def ip(*args, check=True):
+    return subprocess.run(['ip'] + list(args), check=check, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+
+
+def lane_cpus(lanes, cpus=None):
+    """Disjoint CPU lists, one per lane, or None when the CPUs cannot be split
+
+    Lanes only run concurrently when each has at least two CPUs of its own
+    (one for the server, one for the client); otherwise they would measure
+    each other.
+    """
+    cpus = sorted(cpus or os.sched_getaffinity(0))
+    per_lane = len(cpus) // lanes
+    if per_lane < 2:
+        return None
+    return [cpus[i * per_lane:(i + 1) * per_lane] for i in range(lanes)]
+
+
+def pin(prefix, cpus):
+    return f"{prefix} taskset -c {','.join(map(str, cpus))}".strip() if cpus else prefix
+
+
+def cleanup_namespaces():
+    """Remove namespaces and bridges left by an earlier run"""
+    listing = subprocess.run(['ip', 'netns', 'list'], stdout=subprocess.PIPE, text=True).stdout
+    for line in listing.splitlines():
+        name = line.split()[0] if line.split() else ''
+        if name.startswith(PREFIX + '-'):
+            ip('netns', 'del', name, check=False)
+    links = subprocess.run(['ip', '-o', 'link', 'show', 'type', 'bridge'], stdout=subprocess.PIPE, text=True).stdout
+    for line in links.splitlines():
+        name = line.split(':')[1].strip().split('@')[0]
+        if name.startswith(PREFIX):
+            ip('link', 'del', name, check=False)
+
+
+def build_lane(topology, i):
+    """Create lane i's namespaces and links: (server namespace, client namespace)
+
+    bridge: each namespace has a veth whose host end is attached to a Linux
+    bridge, the path between two containers on Docker's default network.
+    veth: the two namespaces are joined by a single veth pair, no bridge.
+    """
+    server, client = f'{PREFIX}-s{i}', f'{PREFIX}-c{i}'
+    for ns in (server, client):
+        ip('netns', 'add', ns)
+        ip('-n', ns, 'link', 'set', 'lo', 'up')
+    if topology == 'bridge':
+        bridge = f'{PREFIX}br{i}'
+        ip('link', 'add', bridge, 'type', 'bridge')
+        ip('link', 'set', bridge, 'up')
+        for ns, end in ((server, 's'), (client, 'c')):
+            host_end = f'{PREFIX}{end}{i}'
+            ip('link', 'add', host_end, 'type', 'veth', 'peer', 'name', 'eth0', 'netns', ns)
+            ip('link', 'set', host_end, 'master', bridge, 'up')
+    else:
+        ip('link', 'add', 'eth0', 'netns', server, 'type', 'veth', 'peer', 'name', 'eth0', 'netns', client)
+    for ns, host in ((server, 1), (client, 2)):
+        ip('-n', ns, 'addr', 'add', f'{SUBNET}.{i}.{host}/24', 'dev', 'eth0')
+        ip('-n', ns, 'link', 'set', 'eth0', 'up')
+    return server, client
+
+
+@contextmanager
+def topology_lanes(topology, jobs=1, server_exec='', client_exec='', address='Master'):
+    """Lanes of a topology, torn down on exit
+
+    cluster: the server and client given as exec prefixes (ssh, docker exec);
+    one lane, since every cell shares the network between them. host: both
+    ends in this network namespace over loopback, like containers run with
+    --network host. bridge and veth: a pair of namespaces per lane (needs
+    root and iproute2). Local topologies get up to `jobs` lanes, each pinned
+    to its own CPUs, and a single unpinned lane when the CPUs cannot be split.
+    """
+    if topology == 'cluster':
+        yield [Lane('cluster', server_exec, client_exec, address, BASE_PORT)]
+        return
+
+    cpus = lane_cpus(jobs) if jobs > 1 else None
+    if cpus is None:
+        if jobs > 1:
+            print(f"Running cells one at a time: {len(os.sched_getaffinity(0))} CPUs cannot give "
+                  f"{jobs} lanes two CPUs each", file=sys.stderr)
+        jobs, cpus = 1, [None]
+    if topology == 'host':
+        yield [Lane(f'host{i}', pin('', cpus[i]), pin('', cpus[i]), '127.0.0.1', BASE_PORT + i)
+               for i in range(jobs)]
+        return
+
+    cleanup_namespaces()
+    try:
+        lanes = []
+        for i in range(jobs):
+            try:
+                server, client = build_lane(topology, i)
+            except subprocess.CalledProcessError as e:
+                raise RuntimeError(f"cannot build the {topology} topology ({' '.join(e.cmd)}): "
+                                   f"{e.stderr.decode().strip()}") from e
+            lanes.append(Lane(f'{topology}{i}', pin(f'ip netns exec {server}', cpus[i]),
+                              pin(f'ip netns exec {client}', cpus[i]), f'{SUBNET}.{i}.1', BASE_PORT))
+        yield lanes
+    finally:
+        cleanup_namespaces()
+
+
+def run_matrix(cells, lanes, duration, udp_bandwidth, iperf='iperf3', log_dir=None, progress=None):
+    """Run every cell on the first free lane; returns ({cell: CellResult}, {cell: error})"""
+    free = queue.Queue()
+    for lane in lanes:
+        free.put(lane)
+
+    def one(cell):
+        lane = free.get()
+        try:
+            start = time.perf_counter()
+            result, raw = run_cell(cell, lane, duration, udp_bandwidth, iperf)
+            if log_dir:
+                with open(os.path.join(log_dir, f'{cell_label(cell)}.json'), 'w') as f:
+                    f.write(raw)
+            if progress:
+                progress(f"{cell_label(cell)} on {lane.name}: {result.throughput_mbps:.0f} Mbits/sec "
+                         f"in {time.perf_counter() - start:.1f}s")
+            return result
+        finally:
+            free.put(lane)
+
+    results, errors = {}, {}
+    with ThreadPoolExecutor(len(lanes)) as pool:
+        futures = {cell: pool.submit(one, cell) for cell in cells}
+        for cell, future in futures.items():
+            try:
+                results[cell] = future.result()
+            except (ValueError, OSError, subprocess.SubprocessError) as e:
+                errors[cell] = str(e)
+    return results, errors
+
+
+def store_platform(platform, topology):
+    """Platform name in the results store for one topology's results
+
+    The cell metrics do not name the topology, so each local topology needs
+    its own platform: VM-bridge and VM-veth with --platform VM, or just the
+    topology name without it. Cluster results keep the given platform.
+    """
+    if not platform:
+        return topology
+    return platform if topology == 'cluster' else f'{platform}-{topology}'
+
+
+def store_records(platform, results, timestamp):
+    """Results store rows: one per measured figure of every cell"""
+    records = []
+    for cell, r in results.items():
+        for field in ('throughput_mbps', 'retransmits', 'jitter_ms', 'loss_pct', 'cpu_sender', 'cpu_receiver'):
+            value = getattr(r, field)
+            if value is not None:
+                records.append({'platform': platform, 'host': '', 'benchmark': BENCHMARK,
+                                'metric': f'{cell_label(cell)}_{field}', 'value': value, 'timestamp': timestamp})
+    return records
+
+
+def format_table(runs):
+    """One row per topology and cell; runs is [(topology, {cell: CellResult})]"""
+    lines = [f"{'Topology':<9} {'Proto':<5} {'Streams':>7} {'Size':>6} {'Window':>7} {'Mbits/sec':>10} "
+             f"{'Retr':>6} {'Jitter ms':>9} {'Loss %':>7}"]
+    dash = lambda v, fmt: format(v, fmt) if v is not None else '-'
+    for topology, results in runs:
+        for cell, r in results.items():
+            lines.append(f"{topology:<9} {cell.protocol:<5} {cell.streams:>7} {cell.size or '-':>6} "
+                         f"{cell.window or '-':>7} {r.throughput_mbps:>10.1f} {dash(r.retransmits, 'd'):>6} "
+                         f"{dash(r.jitter_ms, '.3f'):>9} {dash(r.loss_pct, '.2f'):>7}")
+    return '\n'.join(lines)
+
+
+def format_comparison(runs):
+    """Throughput of every topology relative to the first, per cell"""
+    (base, reference), others = runs[0], runs[1:]
+    lines = []
+    for topology, results in others:
+        ratios = [results[c].throughput_mbps / reference[c].throughput_mbps
+                  for c in results if c in reference and reference[c].throughput_mbps]
+        if ratios:
+            worst = min(ratios)
+            lines.append(f"{topology} vs {base}: throughput {sum(ratios) / len(ratios) * 100 - 100:+.1f}% "
+                         f"on average, {worst * 100 - 100:+.1f}% in the worst cell")
+    return '\n'.join(lines)
+
+
+def str_list(text):
+    return [v for v in text.split(',') if v]
+
+
+def int_list(text):
+    return [int(v) for v in text.split(',') if v]
+
+
+def windows_list(text):
+    return [None if v == 'default' else v for v in str_list(text)]
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        description="Sweep iperf3 over parallel streams, write and window sizes, TCP and UDP, "
+                    "on the cluster or on namespace topologies built on this machine")
+    parser.add_argument('--topology', type=str_list, default=['cluster'],
+                        help=f"Comma separated, of {', '.join(TOPOLOGIES)} (default: cluster); "
+                             "several are compared cell by cell against the first")
+    parser.add_argument('--server-exec', default='',
+                        help="cluster: prefix that runs the server, e.g. 'docker exec Master' (default: this machine)")
+    parser.add_argument('--client-exec', default='ssh Node01',
+                        help="cluster: prefix that runs the client (default: %(default)s)")
+    parser.add_argument('--server-address', default='Master', help="cluster: address the client connects to")
+    parser.add_argument('--jobs', type=int, default=1,
+                        help="Local topologies: cells run at once, each on its own lane and CPUs (default: 1)")
+    parser.add_argument('--protocols', type=str_list, default=['tcp', 'udp'], help="tcp, udp or both (default: both)")
+    parser.add_argument('--streams', type=int_list, default=[1, 2, 4, 8], help="Parallel streams (default: 1,2,4,8)")
+    parser.add_argument('--tcp-sizes', type=str_list, default=['128K'], help="TCP write sizes, -l (default: 128K)")
+    parser.add_argument('--udp-sizes', type=str_list, default=['1460'], help="UDP datagram sizes, -l (default: 1460)")
+    parser.add_argument('--windows', type=windows_list, default=[None],
+                        help="Socket buffer sizes, -w, 'default' for the kernel's (default: default)")
+    parser.add_argument('--duration', type=int, default=10, help="Seconds per cell (default: %(default)s)")
+    parser.add_argument('--udp-bandwidth', default='1G', help="UDP target rate, -b (default: %(default)s)")
+    parser.add_argument('--iperf', default='iperf3', help="iperf3 command (default: %(default)s)")
+    parser.add_argument('--platform', default=None,
+                        help="Platform name for the results store, suffixed with -<topology> for the "
+                             "local topologies (default: the topology name)")
+    parser.add_argument('--log-dir', default=None, help="Keep each cell's iperf3 JSON here")
+    parser.add_argument('--csv', default=None, help="Write every cell to this CSV file")
+    parser.add_argument('--store', default=None, help="Append the results to this results store")
+    args = parser.parse_args(argv)
+    unknown = set(args.topology) - set(TOPOLOGIES)
+    if unknown:
+        parser.error(f"unknown topology: {', '.join(sorted(unknown))}")
+    if set(args.protocols) - {'tcp', 'udp'}:
+        parser.error("protocols are tcp and udp")
+    return args
+
+
+def main():
+    args = parse_args(sys.argv[1:])
+    cells = matrix(args.protocols, args.streams, args.tcp_sizes, args.udp_sizes, args.windows)
+    runs, records, failed = [], [], 0
+    for topology in args.topology:
+        log_dir = os.path.join(args.log_dir, topology) if args.log_dir else None
+        if log_dir:
+            os.makedirs(log_dir, exist_ok=True)
+        progress = lambda line: print(f"{topology}: {line}", file=sys.stderr)
+        try:
+            with topology_lanes(topology, args.jobs, args.server_exec, args.client_exec,
+                                args.server_address) as lanes:
+                results, errors = run_matrix(cells, lanes, args.duration, args.udp_bandwidth, args.iperf,
+                                             log_dir, progress)
+        except RuntimeError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+        for cell, error in errors.items():
+            print(f"{topology}: {cell_label(cell)} failed: {error}", file=sys.stderr)
+        failed += len(errors)
+        runs.append((topology, results))
+        records += store_records(store_platform(args.platform, topology), results, time.time())
+
+    print(format_table(runs))
+    if len(runs) > 1:
+        print(format_comparison(runs))
+
+    if args.csv:
+        with open(args.csv, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(CSV_COLUMNS)
+            for topology, results in runs:
+                for cell, r in results.items():
+                    writer.writerow([args.platform or topology, topology, cell.protocol, cell.streams, cell.size,
+                                     cell.window or 'default'] + list(r[1:]))
+
+    if args.store and records:
+        from results_store import ResultsStore
+        ResultsStore(args.store).append(records)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
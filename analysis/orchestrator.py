@@ -0,0 +1,498 @@
+#!/usr/bin/env python3
+
+import argparse
+import asyncio
+import json
+import os
+import shlex
+import signal
+import sys
+import time
+from collections import namedtuple
+
+from live_metrics import LiveStream
+
+# Where run_performance_tests.sh has always written its results
+RESULTS_DIR = '/shared/results'
+ANALYSIS_DIR = '/home/ubuntu/cloud_performance_test/analysis'
+
+# Nodes taking part in each platform's MPI runs (see the `hosts` file)
+CLUSTER = ['Master', 'Node01']
+
+# Resource kinds a step can hold; two steps sharing a host:kind tag never overlap
+RESOURCES = ('cpu', 'mem', 'disk', 'net')
+
+# iperf server on Master and client on Node01, run from the host like the original script.
+# The trap stops the server however the step ends, including a live abort or Ctrl-C
+IPERF_COMMANDS = {
+    'vm': ('iperf -s >/dev/null 2>&1 & server=$!; trap \'kill $server 2>/dev/null\' EXIT INT TERM HUP; '
+           'sleep 1; ssh Node01 "iperf -c Master -t 10 -i 1"'),
+    'container': ('trap \'docker exec Master pkill iperf\' EXIT INT TERM HUP; '
+                  'docker exec -d Master iperf -s && sleep 1 && '
+                  'docker exec Node01 iperf -c Master -t 10 -i 1'),
+}
+
+# Seconds a killed step gets to run its cleanup traps before SIGKILL
+KILL_GRACE = 5
+
+# Platform names used in the results store, by step name prefix
+PLATFORMS = {'vm': 'VM', 'container': 'Container'}
+
+# How iozone_throughput.py reaches iozone: directly on the VMs, through the
+# Master container otherwise (its /shared is a docker volume)
+SHARED_IOZONE_EXEC = {'vm': '', 'container': "--exec 'docker exec -i Master' "}
+
+# One benchmark invocation. `target` picks the executor, `resources` are
+# host:kind tags held for the whole run, `after` names steps that must
+# finish first and `output` is where stdout is captured (None to discard).
+# `live` names the live_metrics parser that watches the output while it runs.
+Step = namedtuple('Step', 'name target command resources after output live')
+
+StepResult = namedtuple('StepResult', 'name status returncode start end')
+
+
+def step(name, target, command, resources=(), after=(), output=None, live=None):
+    """Build a Step, accepting any iterables for resources and after"""
+    return Step(name, target, command, frozenset(resources), tuple(after), output, live)
+
+
+def tags(hosts, *kinds):
+    """Resource tags for every kind on every host, e.g. vm-Master:cpu"""
+    for kind in kinds:
+        if kind not in RESOURCES:
+            raise ValueError(f"Unknown resource kind: {kind}")
+    return {f'{host}:{kind}' for host in hosts for kind in kinds}
+
+
+class LocalExecutor:
+    """Run a step's command with bash on this machine"""
+
+    def argv(self, command):
+        return ['bash', '-c', command]
+
+
+class SshExecutor:
+    """Run a step's command on another VM over ssh"""
+
+    def __init__(self, host):
+        self.host = host
+
+    def argv(self, command):
+        return ['ssh', self.host, command]
+
+
+class DockerExecutor:
+    """Run a step's command inside a running container"""
+
+    def __init__(self, container):
+        self.container = container
+
+    def argv(self, command):
+        return ['docker', 'exec', self.container, 'bash', '-c', command]
+
+    def cgroup(self):
+        """The container's cgroup v2 directory as seen from this machine, or None"""
+        from telemetry import container_cgroup
+        return container_cgroup(self.container)
+
+
+def default_executors(local=False):
+    """Executors for the targets used by default_suite
+
+    With local=True every target runs through bash on this machine, which
+    lets a suite be exercised without the VMs or containers.
+    """
+    if local:
+        executor = LocalExecutor()
+        return {'vm': executor, 'vm:Node01': executor,
+                'container': executor, 'container:Node01': executor, 'local': executor}
+    return {
+        'vm': LocalExecutor(),
+        'vm:Node01': SshExecutor('Node01'),
+        'container': DockerExecutor('Master'),
+        'container:Node01': DockerExecutor('Node01'),
+        'local': LocalExecutor(),
+    }
+
+
+def default_suite(results_dir=RESULTS_DIR, separate_machines=False):
+    """The steps of run_performance_tests.sh as a DAG
+
+    VMs and containers are assumed to share the same hardware, so both
+    platforms hold the same resource tags and their steps never overlap.
+    With separate_machines=True each platform gets its own tags, and a VM
+    CPU test may overlap a container disk test.
+    """
+    def out(name):
+        return os.path.join(results_dir, name)
+
+    steps = []
+    for platform in ('vm', 'container'):
+        prefix = platform if separate_machines else 'host'
+        hosts = [f'{prefix}-{h}' for h in CLUSTER]
+        master = hosts[:1]
+
+        steps += [
+            step(f'{platform}_stress_ng_cpu', platform,
+                 'mpirun -np 2 -hostfile hosts stress-ng --cpu 2 --timeout 60s --metrics-brief',
+                 tags(hosts, 'cpu'), output=out(f'{platform}_stress_ng_cpu.txt'), live='stress-ng'),
+            # CPU model, clock and SIMD flags for the theoretical peak (see roofline.py)
+            step(f'{platform}_cpuinfo', platform, 'cat /proc/cpuinfo', output=out(f'{platform}_cpuinfo.txt')),
+            # hpcc writes its summary to hpccoutf.txt; keep a copy per platform
+            step(f'{platform}_hpcc', platform,
+                 f'cd /shared && mpirun -np 2 -hostfile hosts hpcc && '
+                 f'cp /shared/hpccoutf.txt {out(f"{platform}_hpccoutf.txt")}',
+                 tags(hosts, 'cpu', 'mem', 'net'), output=out(f'{platform}_hpcc_results.txt')),
+            step(f'{platform}_sysbench_memory', platform,
+                 'mpirun -np 2 -hostfile hosts sysbench memory --report-interval=1 --histogram run',
+                 tags(hosts, 'cpu', 'mem'), output=out(f'{platform}_sysbench_memory.txt'), live='sysbench'),
+            step(f'{platform}_stress_ng_memory', platform,
+                 'mpirun -np 2 -hostfile hosts stress-ng --vm 2 --vm-bytes 1G --timeout 60s --metrics-brief',
+                 tags(hosts, 'cpu', 'mem'), output=out(f'{platform}_stress_ng_memory.txt'), live='stress-ng'),
+            step(f'{platform}_iozone', platform,
+                 'iozone -a -R -O',
+                 tags(master, 'disk'), output=out(f'{platform}_iozone_results.txt')),
+            # The shared filesystem is served over the network from Master's
+            # disk; the driver sweeps concurrent clients from the MPI hostfile
+            step(f'{platform}_iozone_shared', 'local',
+                 f'python3 {ANALYSIS_DIR}/iozone_throughput.py --hostfile hosts {SHARED_IOZONE_EXEC[platform]}'
+                 f'--platform {PLATFORMS[platform]} --log-dir {out(f"{platform}_iozone_throughput")} '
+                 f'--csv {out(f"{platform}_iozone_throughput.csv")} --store {out("store")}',
+                 tags(master, 'disk') | tags(hosts, 'net'), output=out(f'{platform}_iozone_shared_results.txt')),
+            # Server and client are one step so the server never outlives the test
+            step(f'{platform}_iperf', 'local', IPERF_COMMANDS[platform],
+                 tags(hosts, 'net'), output=out(f'{platform}_iperf_results.txt'), live='iperf'),
+        ]
+
+    benchmarks = [s.name for s in steps]
+    steps += [
+        step('visualizations', 'local',
+             f'python3 {ANALYSIS_DIR}/create_visualizations.py {results_dir}',
+             after=[s for s in benchmarks if 'iozone' in s or 'sysbench' in s or 'iperf' in s]),
+        # CPU cache and page cache cliffs of both platforms' IOZone surfaces
+        step('iozone_boundaries', 'local',
+             f'python3 {ANALYSIS_DIR}/iozone_boundaries.py {out("vm_iozone_results.txt")} '
+             f'{out("container_iozone_results.txt")} --csv {out("iozone_boundaries.csv")} --store {out("store")}',
+             after=['vm_iozone', 'container_iozone']),
+        # Every IOZone test of both platforms on one page, refined on zoom
+        step('iozone_surfaces', 'local',
+             f'python3 {ANALYSIS_DIR}/iozone_lod.py {out("iozone_surfaces.html")} '
+             f'{out("vm_iozone_results.txt")} {out("container_iozone_results.txt")}',
+             after=['vm_iozone', 'container_iozone']),
+        # Final sysbench, stress-ng and iperf totals go to the store next to the live samples
+        step('tool_results', 'local',
+             f'python3 {ANALYSIS_DIR}/tool_parsers.py {results_dir} --store {out("store")} > /dev/null',
+             after=[s for s in benchmarks if not any(k in s for k in ('iozone', 'hpcc', 'cpuinfo'))]),
+        # hpccoutf.txt carries the full summary section the rooflines need
+        step('hpcc_analysis', 'local',
+             f'cd {results_dir} && python3 {ANALYSIS_DIR}/cloudperf.py report '
+             f'{out("vm_hpccoutf.txt")} {out("container_hpccoutf.txt")} '
+             f'--store {out("store")} --cache {out(".cache")} --baselines {out("regression_baselines.json")} '
+             f'--cpuinfo {out("vm_cpuinfo.txt")},{out("container_cpuinfo.txt")}',
+             after=['vm_hpcc', 'container_hpcc', 'vm_cpuinfo', 'container_cpuinfo']),
+        # Tonight's tool results against every earlier night's
+        step('regressions', 'local',
+             f'python3 {ANALYSIS_DIR}/regression.py {out("store")} --state {out("regression_baselines.json")} '
+             f'--output {out("regressions.json")}',
+             after=['tool_results', 'hpcc_analysis', 'iozone_boundaries', 'vm_iozone_shared',
+                    'container_iozone_shared']),
+    ]
+    return steps
+
+
+def load_suite(path):
+    """Read a suite from a JSON list of steps with the Step field names"""
+    with open(path) as f:
+        entries = json.load(f)
+    return [step(e['name'], e.get('target', 'local'), e['command'], e.get('resources', ()),
+                 e.get('after', ()), e.get('output'), e.get('live')) for e in entries]
+
+
+def validate(steps):
+    """Check names are unique, dependencies exist and there are no cycles"""
+    by_name = {}
+    for s in steps:
+        if s.name in by_name:
+            raise ValueError(f"Duplicate step: {s.name}")
+        by_name[s.name] = s
+    for s in steps:
+        for dep in s.after:
+            if dep not in by_name:
+                raise ValueError(f"Step {s.name} depends on unknown step {dep}")
+
+    # Kahn's algorithm; anything left over is on a cycle
+    remaining = {s.name: len(s.after) for s in steps}
+    dependents = {s.name: [] for s in steps}
+    for s in steps:
+        for dep in s.after:
+            dependents[dep].append(s.name)
+    ready = [name for name, n in remaining.items() if n == 0]
+    while ready:
+        name = ready.pop()
+        del remaining[name]
+        for child in dependents[name]:
+            remaining[child] -= 1
+            if remaining[child] == 0:
+                ready.append(child)
+    if remaining:
+        raise ValueError(f"Dependency cycle between steps: {', '.join(sorted(remaining))}")
+    return by_name
+
+
+async def _kill(proc):
+    # Steps run in their own session so pipelines and wrappers die with them.
+    # SIGTERM first lets their traps stop servers they started elsewhere
+    try:
+        os.killpg(proc.pid, signal.SIGTERM)
+        try:
+            await asyncio.wait_for(proc.wait(), KILL_GRACE)
+        except asyncio.TimeoutError:
+            os.killpg(proc.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+
+async def run_step(s, executor, store=None):
+    """Run one step, copying its output to s.output
+
+    Returns (exit code, abort reason). When the step has a live parser its
+    samples go to the store as they arrive, and the step is killed as soon
+    as one of the parser's abort rules fires.
+    """
+    if s.output:
+        os.makedirs(os.path.dirname(os.path.abspath(s.output)), exist_ok=True)
+    stream = None
+    if s.live:
+        platform = PLATFORMS.get(s.name.split('_', 1)[0], '')
+        stream = LiveStream(s.live, store, {'platform': platform, 'host': s.target})
+    proc = await asyncio.create_subprocess_exec(
+        *executor.argv(s.command), stdin=asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT, start_new_session=True)
+    out = open(s.output, 'wb') if s.output else None
+    reason = None
+    try:
+        while True:
+            chunk = await proc.stdout.read(65536)
+            if not chunk:
+                break
+            if out:
+                out.write(chunk)
+            if stream and stream.feed(chunk):
+                reason = stream.abort_reason
+                await _kill(proc)
+                break
+        return await proc.wait(), reason
+    except asyncio.CancelledError:
+        await _kill(proc)
+        await proc.wait()
+        raise
+    finally:
+        if out:
+            out.close()
+        if stream:
+            stream.close()
+
+
+async def run_suite(steps, executors, max_parallel=None, store=None, log=print, telemetry=None):
+    """Run steps as soon as their dependencies are done and their resources are free
+
+    Steps are considered in suite order, so with every step contending for
+    the same resource this degrades to the original sequential script. A
+    failed or aborted step skips everything that depends on it. Live samples
+    are written to store when one is given. telemetry maps targets to running
+    telemetry.TelemetrySampler objects (see telemetry_samplers); each step's
+    window of its target's samples is saved next to its output. Returns a
+    dict of StepResult by step name.
+    """
+    by_name = validate(steps)
+    for s in steps:
+        if s.target not in executors:
+            raise ValueError(f"Step {s.name} has no executor for target {s.target}")
+
+    origin = time.perf_counter()
+    pending = list(steps)
+    results = {}
+    held = set()
+    running = {}
+
+    def finish(s, status, returncode, start):
+        results[s.name] = StepResult(s.name, status, returncode, start, time.perf_counter() - origin)
+
+    while pending or running:
+        for s in list(pending):
+            if max_parallel and len(running) >= max_parallel:
+                break
+            deps = [results.get(dep) for dep in s.after]
+            if any(r is None for r in deps):
+                continue
+            if any(r.status != 'ok' for r in deps):
+                pending.remove(s)
+                finish(s, 'skipped', None, time.perf_counter() - origin)
+                log(f"[{results[s.name].end:8.1f}s] skip  {s.name} (dependency failed)")
+                continue
+            if s.resources & held:
+                continue
+            pending.remove(s)
+            held |= s.resources
+            start = time.perf_counter() - origin
+            log(f"[{start:8.1f}s] start {s.name}")
+            task = asyncio.ensure_future(run_step(s, executors[s.target], store))
+            running[task] = (s, start, time.time())
+
+        if not running:
+            # Everything left waits on a skipped step; loop once more to skip it
+            if pending:
+                continue
+            break
+
+        done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            s, start, wall_start = running.pop(task)
+            held -= s.resources
+            try:
+                returncode, reason = task.result()
+            except OSError as e:
+                log(f"Error starting {s.name}: {e}")
+                returncode, reason = None, None
+            status = 'aborted' if reason else ('ok' if returncode == 0 else 'failed')
+            finish(s, status, returncode, start)
+            r = results[s.name]
+            log(f"[{r.end:8.1f}s] {status:<5} {s.name} ({r.end - r.start:.1f}s)")
+            if reason:
+                log(f"{'':12}{reason}")
+            if telemetry and s.target in telemetry and s.output:
+                save_telemetry(telemetry[s.target], s, wall_start, log)
+
+    return {s.name: results[s.name] for s in by_name.values()}
+
+
+def save_telemetry(sampler, s, wall_start, log=print):
+    """Save the samples covering a finished step next to its output"""
+    from telemetry import telemetry_path
+
+    # One sample now, and the one taken just before the step started, bracket the run
+    sampler.sample()
+    try:
+        sampler.save(telemetry_path(s.output), since=wall_start - sampler.interval, until=time.time())
+    except OSError as e:
+        log(f"{'':12}telemetry not saved: {e}")
+
+
+def telemetry_samplers(executors, interval, log=print):
+    """Running samplers by target, for the targets sampled from this machine
+
+    Local targets share one sampler of this host. Container targets share
+    the host's /proc but each gets a sampler that also reads its
+    container's cgroup, so CPU throttling and memory pressure of the
+    container itself are recorded. ssh targets are left out: their steps
+    record on the node itself (see remote_telemetry).
+    """
+    from telemetry import TelemetrySampler
+
+    samplers, by_container = {}, {}
+    host = None
+    for target, executor in executors.items():
+        if isinstance(executor, SshExecutor):
+            continue
+        if isinstance(executor, DockerExecutor):
+            if executor.container not in by_container:
+                cgroup = executor.cgroup()
+                if cgroup is None:
+                    log(f"No cgroup v2 directory for container {executor.container}; "
+                        f"its steps get host telemetry only")
+                by_container[executor.container] = cgroup and TelemetrySampler(interval, cgroup=cgroup).start()
+            if by_container[executor.container]:
+                samplers[target] = by_container[executor.container]
+                continue
+        host = host or TelemetrySampler(interval).start()
+        samplers[target] = host
+    return samplers
+
+
+def remote_telemetry(s, interval):
+    """Wrap a step so telemetry.py record samples the node it runs on
+
+    Used for ssh targets, whose steal time and faults are invisible from
+    here. The samples are written next to the step's output, which must be
+    on a filesystem the node shares (/shared/results on the cluster).
+    """
+    from telemetry import telemetry_path
+
+    command = (f'python3 {ANALYSIS_DIR}/telemetry.py record {shlex.quote(telemetry_path(s.output))} '
+               f'{interval} -- bash -c {shlex.quote(s.command)}')
+    return s._replace(command=command)
+
+
+def format_summary(results):
+    """Wall-clock time against the time the steps would take back to back"""
+    wall = max((r.end for r in results.values()), default=0.0)
+    serial = sum(r.end - r.start for r in results.values())
+    counts = {}
+    for r in results.values():
+        counts[r.status] = counts.get(r.status, 0) + 1
+    states = ', '.join(f"{n} {status}" for status, n in sorted(counts.items()))
+    return f"{len(results)} steps ({states}) in {wall:.1f}s; {serial:.1f}s if run one after another"
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        description="Run the VM and container benchmark suite, overlapping steps that do not contend")
+    parser.add_argument('suite', nargs='?',
+                        help="JSON suite file (default: the run_performance_tests.sh suite)")
+    parser.add_argument('--results', default=RESULTS_DIR,
+                        help=f"Directory for result files (default: {RESULTS_DIR})")
+    parser.add_argument('--local', action='store_true',
+                        help="Run every target through bash on this machine instead of ssh/docker")
+    parser.add_argument('--separate-machines', action='store_true',
+                        help="VMs and containers run on different hardware; let their steps overlap")
+    parser.add_argument('--jobs', type=int, default=None,
+                        help="Maximum number of steps running at once (default: unlimited)")
+    parser.add_argument('--store', default=None,
+                        help="Results store directory for live samples (see results_store.py)")
+    parser.add_argument('--telemetry', type=float, default=None, metavar='SECONDS',
+                        help="Sample /proc and cgroup counters of each step's target at this interval "
+                             "and save them next to each result")
+    parser.add_argument('--list', action='store_true',
+                        help="Print the steps with their resources and dependencies, then exit")
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_args(sys.argv[1:])
+    if args.suite:
+        steps = load_suite(args.suite)
+    else:
+        steps = default_suite(args.results, args.separate_machines)
+
+    if args.list:
+        validate(steps)
+        for s in steps:
+            after = f" after {', '.join(s.after)}" if s.after else ''
+            live = f" live:{s.live}" if s.live else ''
+            print(f"{s.name} [{s.target}] {{{', '.join(sorted(s.resources))}}}{after}{live}")
+        return
+
+    store = None
+    if args.store:
+        from results_store import ResultsStore
+        store = ResultsStore(args.store)
+
+    executors = default_executors(args.local)
+    samplers = {}
+    if args.telemetry:
+        samplers = telemetry_samplers(executors, args.telemetry)
+        steps = [remote_telemetry(s, args.telemetry)
+                 if s.output and isinstance(executors.get(s.target), SshExecutor) else s for s in steps]
+    try:
+        results = asyncio.run(run_suite(steps, executors, args.jobs, store, telemetry=samplers))
+    finally:
+        for sampler in set(samplers.values()):
+            sampler.stop()
+            print(f"Telemetry sampler overhead: {sampler.overhead() * 100:.3f}% CPU")
+    print(format_summary(results))
+    if any(r.status != 'ok' for r in results.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
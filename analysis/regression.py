@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import math
+import os
+import re
+import sys
+import uuid
+
+# Results that form a (platform, benchmark, metric) baseline before changes are looked
+# for; the baseline keeps learning from later results up to BASELINE_RESULTS
+WARMUP = 8
+BASELINE_RESULTS = 30
+
+# Two-sided CUSUM on standardized results: drift allowance and decision threshold,
+# both in baseline standard deviations. k=0.5, h=5 detects a one-sigma shift in about
+# ten results with a false alarm every few hundred
+SLACK = 0.5
+THRESHOLD = 5.0
+
+# Results needed past the start of a shift before it is reported, so a single
+# outlier never alarms however far off it is
+CONFIRM = 2
+
+# Floor on the baseline standard deviation relative to its mean, so a metric that
+# happened to repeat exactly during warmup does not alarm on rounding noise
+MIN_RELATIVE_STD = 0.01
+
+# Severity by the size of the shift, largest first
+SEVERITIES = [(15.0, 'critical'), (5.0, 'major'), (0.0, 'minor')]
+
+# Metrics where a larger value is worse (times, latencies, loss)
+LOWER_IS_BETTER = re.compile(r'latency|time|jitter|loss|lost', re.I)
+
+# Where run_performance_tests.sh keeps the baselines
+DEFAULT_STATE = 'regression_baselines.json'
+
+
+def lower_is_better(metric):
+    return bool(LOWER_IS_BETTER.search(metric))
+
+
+def severity(change_pct):
+    for limit, name in SEVERITIES:
+        if abs(change_pct) >= limit:
+            return name
+    return SEVERITIES[-1][1]
+
+
+class MetricState:
+    """Baseline and CUSUM statistics of one metric, updated in O(1) per result
+
+    The baseline is the running mean and variance (Welford) of the results
+    since the last change, learned up to BASELINE_RESULTS. From WARMUP
+    results on, each result is standardized against it and accumulated into
+    an upper and a lower CUSUM. Each side also keeps the count and sum of
+    the results since it last sat at zero, which estimate where the shift
+    started and the new level.
+    """
+
+    FIELDS = ['n', 'mean', 'm2', 'last', 'settling', 'up', 'up_n', 'up_sum', 'up_since',
+              'down', 'down_n', 'down_sum', 'down_since', 'regression']
+
+    def __init__(self, **state):
+        for name in self.FIELDS:
+            setattr(self, name, state.get(name, 0.0))
+        self.settling = state.get('settling', False)
+        self.regression = state.get('regression')
+        self.last = state.get('last')
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.FIELDS}
+
+    def std(self):
+        variance = self.m2 / (self.n - 1) if self.n > 1 else 0.0
+        return max(math.sqrt(variance), MIN_RELATIVE_STD * abs(self.mean), 1e-12)
+
+    def _learn(self, value):
+        self.n += 1
+        delta = value - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (value - self.mean)
+
+    def _reset(self):
+        # Learn a new baseline from the results after the change; the run that
+        # raised the alarm may still hold a result or two from before it
+        self.n = self.mean = self.m2 = 0.0
+        self.up = self.up_n = self.up_sum = 0.0
+        self.down = self.down_n = self.down_sum = 0.0
+        self.settling = True
+
+    def update(self, value, timestamp, warmup=WARMUP, slack=SLACK, threshold=THRESHOLD):
+        """Feed one result
+
+        Returns (direction, start, old mean, old std, new mean, n) when a shift
+        is detected, ('settled', ..., new baseline mean, n) when the baseline
+        after a shift is complete, else None.
+        """
+        if self.last is not None and timestamp <= self.last:
+            # Already seen: replaying the same results is a no-op
+            return None
+        self.last = timestamp
+        if self.n < warmup:
+            self._learn(value)
+            if self.n >= warmup and self.settling:
+                self.settling = False
+                return 'settled', None, None, None, self.mean, int(self.n)
+            return None
+
+        z = (value - self.mean) / self.std()
+        if self.n < BASELINE_RESULTS and abs(z) < threshold:
+            # A result this far off is likely the start of a shift, not noise
+            self._learn(value)
+        if self.up == 0:
+            self.up_n = self.up_sum = 0.0
+            self.up_since = timestamp
+        self.up = max(0.0, self.up + z - slack)
+        self.up_n += 1
+        self.up_sum += value
+        if self.down == 0:
+            self.down_n = self.down_sum = 0.0
+            self.down_since = timestamp
+        self.down = max(0.0, self.down - z - slack)
+        self.down_n += 1
+        self.down_sum += value
+
+        for direction, score, n, total, since in (
+                ('up', self.up, self.up_n, self.up_sum, self.up_since),
+                ('down', self.down, self.down_n, self.down_sum, self.down_since)):
+            if score > threshold and n >= CONFIRM:
+                change = direction, since, self.mean, self.std(), total / n, int(n)
+                self._reset()
+                return change
+        return None
+
+
+class RegressionDetector:
+    """Per-(platform, benchmark, metric) baselines with online changepoint detection
+
+    Results are fed one at a time in time order as they land; nothing is
+    refitted from history. A detected shift in the worse direction is a
+    regression; one in the better direction is an improvement that clears
+    any open regression of the metric. Either way the metric is re-baselined
+    at its new level. The state is a small JSON file, so each run of the
+    analysis scripts only feeds its own new results.
+    """
+
+    def __init__(self, path=None, warmup=WARMUP, slack=SLACK, threshold=THRESHOLD):
+        self.path = path
+        self.warmup = warmup
+        self.slack = slack
+        self.threshold = threshold
+        self.states = {}
+        self.history = []
+        if path and os.path.exists(path):
+            with open(path) as f:
+                data = json.load(f)
+            for entry in data['metrics']:
+                key = (entry['platform'], entry['benchmark'], entry['metric'])
+                self.states[key] = MetricState(**entry['state'])
+            self.history = data.get('history', [])
+
+    def unseen(self, rows):
+        """Records of the store rows newer than the last result seen for their own metric
+
+        Each (platform, benchmark, metric) keeps its own watermark: the
+        benchmarks land in the store at different times, so one benchmark's
+        latest result says nothing about which results of another are new.
+        """
+        lasts = {key: s.last for key, s in self.states.items() if s.last is not None}
+        return [{'platform': p, 'benchmark': b, 'metric': m, 'value': v, 'timestamp': t}
+                for p, b, m, v, t in zip(rows['platform'], rows['benchmark'], rows['metric'],
+                                         rows['value'], rows['timestamp'])
+                if t > lasts.get((p, b, m), -math.inf)]
+
+    def update(self, platform, benchmark, metric, value, timestamp):
+        """Feed one result; returns the change event, or None"""
+        key = (platform, benchmark, metric)
+        state = self.states.get(key)
+        if state is None:
+            state = self.states[key] = MetricState()
+        change = state.update(float(value), float(timestamp), self.warmup, self.slack, self.threshold)
+        if change is None:
+            return None
+
+        direction, since, old_mean, old_std, new_mean, samples = change
+        if direction == 'settled':
+            if state.regression:
+                self._settle(state.regression, new_mean, samples)
+                if state.regression['kind'] != 'regression':
+                    state.regression = None
+            return None
+
+        worse = (direction == 'up') == lower_is_better(metric)
+        change_pct = (new_mean - old_mean) / abs(old_mean) * 100 if old_mean else 0.0
+        event = {
+            'platform': platform,
+            'benchmark': benchmark,
+            'metric': metric,
+            'kind': 'regression' if worse else 'improvement',
+            'severity': severity(change_pct) if worse else None,
+            'change_pct': change_pct,
+            'baseline_mean': old_mean,
+            'baseline_std': old_std,
+            'current_mean': new_mean,
+            'since': since,
+            'detected_at': float(timestamp),
+            'samples': samples,
+        }
+        state.regression = event if worse else None
+        self.history.append(event)
+        return event
+
+    @staticmethod
+    def _settle(event, new_mean, samples):
+        # Replace the estimate made at detection with the new baseline
+        old_mean = event['baseline_mean']
+        change_pct = (new_mean - old_mean) / abs(old_mean) * 100 if old_mean else 0.0
+        worse = (change_pct > 0) == lower_is_better(event['metric'])
+        event.update(current_mean=new_mean, change_pct=change_pct, samples=samples,
+                     kind='regression' if worse else 'improvement',
+                     severity=severity(change_pct) if worse else None)
+
+    def feed(self, records):
+        """Feed result dicts (platform, benchmark, metric, value, timestamp); returns the events"""
+        events = []
+        for r in sorted(records, key=lambda r: r['timestamp']):
+            event = self.update(r['platform'], r['benchmark'], r['metric'], r['value'], r['timestamp'])
+            if event is not None:
+                events.append(event)
+        return events
+
+    def regressions(self):
+        """Open regressions, most severe first"""
+        order = {name: i for i, (_, name) in enumerate(SEVERITIES)}
+        open_events = [s.regression for s in self.states.values() if s.regression]
+        return sorted(open_events, key=lambda e: (order[e['severity']], -abs(e['change_pct'])))
+
+    def save(self, path=None):
+        path = path or self.path
+        data = {
+            'metrics': [{'platform': p, 'benchmark': b, 'metric': m, 'state': s.to_dict()}
+                        for (p, b, m), s in sorted(self.states.items())],
+            'history': self.history,
+        }
+        write_json(path, data)
+
+
+def write_json(path, data):
+    """Write JSON atomically so a reader never sees half a file"""
+    tmp = os.path.join(os.path.dirname(os.path.abspath(path)), f'.{os.path.basename(path)}.{uuid.uuid4().hex}')
+    with open(tmp, 'w') as f:
+        json.dump(data, f, indent=1)
+    os.replace(tmp, path)
+
+
+def write_regressions(path, detector):
+    """Machine-readable list of the open regressions"""
+    write_json(path, {'regressions': detector.regressions()})
+
+
+def format_event(event):
+    return (f"{event['kind']:<11} {event['severity'] or '':<8} {event['platform']} {event['benchmark']} "
+            f"{event['metric']}: {event['baseline_mean']:.4g} -> {event['current_mean']:.4g} "
+            f"({event['change_pct']:+.1f}%)")
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        description="Detect performance regressions in the results store against per-metric baselines")
+    parser.add_argument('store', help="Results store directory (see results_store.py)")
+    parser.add_argument('--state', default=DEFAULT_STATE,
+                        help="Baselines file, created on first use (default: %(default)s)")
+    parser.add_argument('--output', default='regressions.json', help="Open regressions as JSON")
+    parser.add_argument('--host', action='append', default=None,
+                        help="Only results of this host; live samples carry their step's target "
+                             "while final results have none (default: '')")
+    parser.add_argument('--warmup', type=int, default=WARMUP, help="Results forming a baseline")
+    parser.add_argument('--threshold', type=float, default=THRESHOLD,
+                        help="CUSUM decision threshold in standard deviations")
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_args(sys.argv[1:])
+    from results_store import ResultsStore
+
+    detector = RegressionDetector(args.state, args.warmup, threshold=args.threshold)
+    rows = ResultsStore(args.store).query(host=args.host or [''])
+    records = detector.unseen(rows)
+    for event in detector.feed(records):
+        print(format_event(event))
+    detector.save()
+    write_regressions(args.output, detector)
+    print(f"{len(records)} results checked, {len(detector.regressions())} open regressions "
+          f"written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
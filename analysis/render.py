@@ -0,0 +1,273 @@
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib
+matplotlib.use('Agg')
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from build_cache import update_hash
+
+# Bump when a renderer changes so cached figures are redrawn
+RENDER_VERSION = 1
+
+# Name of the file, next to the figures, that remembers what each was drawn from
+MANIFEST_NAME = '.render_manifest.json'
+
+DEFAULT_STYLE = {'figsize': (10, 6), 'dpi': 300}
+
+
+def _new_figure(style):
+    """Create a Figure attached to an Agg canvas, without touching pyplot state"""
+    fig = Figure(figsize=style.get('figsize', DEFAULT_STYLE['figsize']))
+    FigureCanvasAgg(fig)
+    return fig
+
+
+def draw_bar(fig, data, style):
+    """Simple bar chart with the value printed above each bar"""
+    ax = fig.add_subplot(111)
+    bars = ax.bar(data['labels'], data['values'], color=style.get('colors'))
+    ax.set_title(style.get('title', ''), fontsize=15)
+    ax.set_ylabel(style.get('ylabel', ''), fontsize=12)
+    ax.grid(axis='y', linestyle='--', alpha=0.7)
+
+    # Add value labels on top of bars
+    offset = style.get('label_offset', 0)
+    fmt = style.get('value_format', '{:.2f}')
+    for bar in bars:
+        height = bar.get_height()
+        ax.text(bar.get_x() + bar.get_width() / 2., height + offset,
+                fmt.format(height), ha='center', fontsize=10)
+
+
+def draw_grouped_bar(fig, data, style):
+    """One group of bars per metric, one bar per series"""
+    ax = fig.add_subplot(111)
+    metrics = data['metrics']
+    series = data['series']
+    colors = style.get('colors', {})
+    bar_width = 0.8 / max(len(series), 1)
+
+    positions = np.arange(len(metrics))
+    for i, (name, values) in enumerate(series.items()):
+        ax.bar(positions + i * bar_width, values, width=bar_width, label=name,
+               color=colors.get(name), alpha=0.7)
+
+    ax.set_xlabel(style.get('xlabel', 'Metrics'))
+    ax.set_ylabel(style.get('ylabel', 'Performance'))
+    ax.set_title(style.get('title', ''))
+    ax.set_xticks(positions + bar_width * (len(series) - 1) / 2)
+    ax.set_xticklabels(metrics, rotation=45, ha='right')
+    ax.legend()
+    ax.grid(True, linestyle='--', alpha=0.7)
+    fig.tight_layout()
+
+
+def draw_surface3d(fig, data, style):
+    """3D surface over index grids, labelled with the real sizes"""
+    ax = fig.add_subplot(111, projection='3d')
+    x_labels, y_labels = data['x_labels'], data['y_labels']
+    x, y = np.meshgrid(np.arange(len(x_labels)), np.arange(len(y_labels)))
+    surf = ax.plot_surface(x, y, np.asarray(data['z'], dtype=float), cmap=style.get('cmap', 'viridis'))
+
+    ax.set_xlabel(style.get('xlabel', ''))
+    ax.set_ylabel(style.get('ylabel', ''))
+    ax.set_zlabel(style.get('zlabel', ''))
+    ax.set_title(style.get('title', ''))
+    ax.set_xticks(np.arange(len(x_labels)))
+    ax.set_yticks(np.arange(len(y_labels)))
+    ax.set_xticklabels(x_labels)
+    ax.set_yticklabels(y_labels)
+    fig.colorbar(surf, shrink=0.5, aspect=5)
+
+
+def draw_heatmap(fig, data, style):
+    """2D heatmap with labelled rows and columns"""
+    ax = fig.add_subplot(111)
+    image = ax.imshow(np.asarray(data['z'], dtype=float), cmap=style.get('cmap', 'viridis'), aspect='auto')
+    fig.colorbar(image, ax=ax, label=style.get('colorbar_label', ''))
+    ax.set_title(style.get('title', ''))
+    ax.set_xlabel(style.get('xlabel', ''))
+    ax.set_ylabel(style.get('ylabel', ''))
+    ax.set_xticks(np.arange(len(data['x_labels'])))
+    ax.set_xticklabels(data['x_labels'], rotation=style.get('xrotation', 0))
+    ax.set_yticks(np.arange(len(data['y_labels'])))
+    ax.set_yticklabels(data['y_labels'])
+
+
+def draw_timeline(fig, data, style):
+    """Stacked line panels sharing one time axis"""
+    panels = data['panels']
+    axes = fig.subplots(max(len(panels), 1), 1, sharex=True, squeeze=False)[:, 0]
+    for ax, panel in zip(axes, panels):
+        for line in panel['lines']:
+            ax.plot(line['x'], line['y'], label=line['label'], linewidth=1)
+        ax.set_ylabel(panel['ylabel'])
+        ax.grid(True, linestyle='--', alpha=0.5)
+        ax.legend(loc='upper right', fontsize=8)
+    axes[0].set_title(style.get('title', ''))
+    axes[-1].set_xlabel(style.get('xlabel', ''))
+    fig.tight_layout()
+
+
+def draw_roofline(fig, data, style):
+    """Log-log rooflines, min(bandwidth x intensity, compute), with the kernels placed under them"""
+    ax = fig.add_subplot(111)
+    colors = style.get('colors', {})
+    rooflines = data['rooflines']
+    ridges = [r['compute'] / r['bandwidth'] for r in rooflines]
+    intensities = [p['x'] for r in rooflines for p in r['points']] + ridges
+    x = np.logspace(np.log2(min(intensities)) - 1, np.log2(max(intensities)) + 1, 256, base=2)
+    markers = 'os^vD'
+    peaks = {}
+    for i, roofline in enumerate(rooflines):
+        color = colors.get(roofline['label'], f'C{i}')
+        ax.plot(x, np.minimum(x * roofline['bandwidth'], roofline['compute']), color=color,
+                label=f"{roofline['label']} ({roofline['bandwidth']:.3g} GB/s, {roofline['compute']:.3g} GFLOPS)")
+        if roofline.get('peak'):
+            peaks.setdefault(round(roofline['peak'], 6), []).append((roofline['label'], color))
+        for j, point in enumerate(roofline['points']):
+            ax.plot(point['x'], point['y'], markers[j % len(markers)], color=color, markersize=8)
+            ax.annotate(point['label'], (point['x'], point['y']), textcoords='offset points',
+                        xytext=(6, -12 if i % 2 else 6), fontsize=8, color=color)
+    # Platforms on the same hardware share one theoretical peak line
+    for peak, owners in peaks.items():
+        color = owners[0][1] if len(owners) == 1 else 'gray'
+        ax.axhline(peak, color=color, linestyle=':', alpha=0.7)
+        ax.text(x[0], peak, f" {', '.join(label for label, _ in owners)} peak {peak:.3g}",
+                color=color, va='bottom', fontsize=8)
+    ax.set_xscale('log', base=2)
+    ax.set_yscale('log', base=2)
+    ax.set_xlabel(style.get('xlabel', 'Arithmetic intensity (FLOP/byte)'))
+    ax.set_ylabel(style.get('ylabel', 'Performance (GFLOPS)'))
+    ax.set_title(style.get('title', ''))
+    ax.legend(loc='lower right')
+    ax.grid(True, which='both', linestyle='--', alpha=0.5)
+    fig.tight_layout()
+
+
+def draw_percentiles(fig, data, style):
+    """Latency against percentile on a 1 / (1 - q) axis, one panel per histogram, compared percentiles marked"""
+    panels = data['panels']
+    colors = style.get('colors', {})
+    axes = fig.subplots(max(len(panels), 1), 1, squeeze=False)[:, 0]
+    tail = lambda p: 1 / (1 - np.asarray(p, dtype=float) / 100)
+    ticks = [50, 90, 99, 99.9, 99.99, 99.999]
+    for ax, panel in zip(axes, panels):
+        for i, line in enumerate(panel['lines']):
+            color = colors.get(line['label'], f'C{i}')
+            ax.plot(tail(line['x']), line['y'], color=color, label=line['label'], linewidth=1.5)
+            ax.plot(tail(data['percentiles']), line['marks'], 'o', color=color, markersize=5)
+        for p in data['percentiles']:
+            ax.axvline(tail(p), color='gray', linestyle=':', alpha=0.6)
+        ax.set_xscale('log')
+        ax.set_yscale(style.get('yscale', 'log'))
+        ax.set_xticks(tail(ticks))
+        ax.set_xticklabels([f'{t:g}%' for t in ticks])
+        ax.minorticks_off()
+        ax.set_title(panel['title'], fontsize=11)
+        ax.set_ylabel(style.get('ylabel', ''))
+        ax.grid(True, which='major', linestyle='--', alpha=0.5)
+        ax.legend(loc='upper left', fontsize=8)
+    axes[-1].set_xlabel(style.get('xlabel', 'Percentile'))
+    fig.suptitle(style.get('title', ''))
+    fig.tight_layout()
+
+
+RENDERERS = {
+    'bar': draw_bar,
+    'grouped_bar': draw_grouped_bar,
+    'surface3d': draw_surface3d,
+    'heatmap': draw_heatmap,
+    'timeline': draw_timeline,
+    'roofline': draw_roofline,
+    'percentiles': draw_percentiles,
+}
+
+
+def figure_job(kind, output, data, style=None):
+    """Describe one figure: renderer kind, output path, input data and style"""
+    if kind not in RENDERERS:
+        raise ValueError(f"Unknown figure kind: {kind}")
+    merged = dict(DEFAULT_STYLE)
+    merged.update(style or {})
+    return {'kind': kind, 'output': output, 'data': data, 'style': merged}
+
+
+def job_hash(job):
+    """Hash of everything that determines how a figure looks"""
+    h = hashlib.sha256()
+    update_hash(h, [RENDER_VERSION, job['kind'], job['data'], job['style']])
+    return h.hexdigest()
+
+
+def render_job(job):
+    """Draw and save one figure; returns (output, seconds)"""
+    start = time.perf_counter()
+    style = job['style']
+    fig = _new_figure(style)
+    RENDERERS[job['kind']](fig, job['data'], style)
+    fig.savefig(job['output'], dpi=style['dpi'], bbox_inches=style.get('bbox_inches', 'tight'))
+    return job['output'], time.perf_counter() - start
+
+
+def _load_manifest(directory):
+    try:
+        with open(os.path.join(directory, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def _save_manifest(directory, manifest):
+    path = os.path.join(directory, MANIFEST_NAME)
+    tmp = f'{path}.{os.getpid()}'
+    with open(tmp, 'w') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def render_all(jobs, workers=None, force=False, verbose=True):
+    """Render figures in a process pool, skipping those whose inputs are unchanged
+
+    Returns a list of (output, status, seconds) where status is 'rendered'
+    or 'unchanged'.
+    """
+    start = time.perf_counter()
+    by_dir = {}
+    pending = []
+    report = []
+    for job in jobs:
+        directory = os.path.dirname(os.path.abspath(job['output']))
+        os.makedirs(directory, exist_ok=True)
+        manifest = by_dir.setdefault(directory, _load_manifest(directory))
+        digest = job_hash(job)
+        name = os.path.basename(job['output'])
+        if not force and manifest.get(name) == digest and os.path.exists(job['output']):
+            report.append((job['output'], 'unchanged', 0.0))
+            continue
+        pending.append((job, directory, name, digest))
+
+    workers = workers or os.cpu_count() or 1
+    if len(pending) > 1 and workers > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(pending))) as executor:
+            results = list(executor.map(render_job, [p[0] for p in pending]))
+    else:
+        results = [render_job(p[0]) for p in pending]
+
+    for (job, directory, name, digest), (output, seconds) in zip(pending, results):
+        by_dir[directory][name] = digest
+        report.append((output, 'rendered', seconds))
+    for directory, manifest in by_dir.items():
+        _save_manifest(directory, manifest)
+
+    if verbose:
+        for output, status, seconds in report:
+            print(f"{status:>9} {seconds:7.2f}s  {output}")
+        print(f"{len(pending)} of {len(report)} figures rendered in {time.perf_counter() - start:.2f}s")
+    return report
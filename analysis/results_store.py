@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+import uuid
+from contextlib import contextmanager
+
+import numpy as np
+
+# String columns are dictionary-encoded into int32 codes shared by all segments
+KEY_COLUMNS = ['platform', 'host', 'benchmark', 'metric']
+COLUMNS = KEY_COLUMNS + ['timestamp', 'value']
+
+# Segments smaller than this are merged by compact()
+COMPACT_ROWS = 65536
+
+
+class ResultsStore:
+    """Append-only columnar store of benchmark results
+
+    Every append writes an immutable segment directory holding one .npy file
+    per column. manifest.json records each segment's row count, timestamp
+    range and the distinct key codes it contains, so queries skip segments
+    that cannot match and memory-map only the columns of those that can.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    # ----- metadata -----
+
+    def _path(self, *parts):
+        return os.path.join(self.root, *parts)
+
+    def _read_json(self, name, default):
+        try:
+            with open(self._path(name)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return default
+
+    def _write_json(self, name, data):
+        tmp = self._path(f'.{name}.{uuid.uuid4().hex}')
+        with open(tmp, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp, self._path(name))
+
+    @contextmanager
+    def _lock(self):
+        with open(self._path('.lock'), 'w') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def dictionary(self):
+        """Return {column: [values]} where a value's index is its code"""
+        return self._read_json('dictionary.json', {c: [] for c in KEY_COLUMNS})
+
+    def segments(self):
+        """Return the manifest entries of all live segments"""
+        return self._read_json('manifest.json', {'segments': []})['segments']
+
+    # ----- write path -----
+
+    def append(self, records):
+        """Append records (dicts with KEY_COLUMNS, value and optional timestamp)
+
+        Returns the number of rows written.
+        """
+        records = list(records)
+        if not records:
+            return 0
+        now = time.time()
+
+        with self._lock():
+            dictionary = self.dictionary()
+            lookup = {c: {v: i for i, v in enumerate(dictionary[c])} for c in KEY_COLUMNS}
+
+            columns = {}
+            for column in KEY_COLUMNS:
+                codes = np.empty(len(records), dtype=np.int32)
+                index = lookup[column]
+                for i, record in enumerate(records):
+                    key = str(record.get(column) or '')
+                    code = index.get(key)
+                    if code is None:
+                        code = index[key] = len(dictionary[column])
+                        dictionary[column].append(key)
+                    codes[i] = code
+                columns[column] = codes
+            columns['timestamp'] = np.array([r.get('timestamp') or now for r in records], dtype=np.float64)
+            columns['value'] = np.array([r['value'] for r in records], dtype=np.float64)
+
+            self._write_json('dictionary.json', dictionary)
+            entry = self._write_segment(columns)
+            manifest = {'segments': self.segments() + [entry]}
+            self._write_json('manifest.json', manifest)
+        return len(records)
+
+    def _write_segment(self, columns):
+        """Write columns to a new segment directory and return its manifest entry"""
+        name = f'seg-{time.time_ns():x}-{uuid.uuid4().hex[:8]}'
+        tmp = self._path('.' + name)
+        os.makedirs(tmp)
+        for column, data in columns.items():
+            np.save(os.path.join(tmp, column + '.npy'), data)
+        os.rename(tmp, self._path(name))
+
+        timestamps = columns['timestamp']
+        return {
+            'name': name,
+            'rows': int(len(timestamps)),
+            'ts_min': float(timestamps.min()),
+            'ts_max': float(timestamps.max()),
+            'codes': {c: np.unique(columns[c]).tolist() for c in KEY_COLUMNS},
+        }
+
+    def compact(self, min_rows=COMPACT_ROWS):
+        """Merge segments smaller than min_rows into one sorted segment
+
+        Returns the number of segments that were merged.
+        """
+        with self._lock():
+            segments = self.segments()
+            small = [s for s in segments if s['rows'] < min_rows]
+            if len(small) < 2:
+                return 0
+
+            parts = [self._load_segment(s, COLUMNS) for s in small]
+            merged = {c: np.concatenate([p[c] for p in parts]) for c in COLUMNS}
+            # Sorting by metric then time keeps range scans contiguous
+            order = np.lexsort((merged['timestamp'], merged['metric']))
+            merged = {c: merged[c][order] for c in COLUMNS}
+
+            entry = self._write_segment(merged)
+            names = {s['name'] for s in small}
+            kept = [s for s in segments if s['name'] not in names]
+            self._write_json('manifest.json', {'segments': kept + [entry]})
+
+        for name in names:
+            shutil.rmtree(self._path(name), ignore_errors=True)
+        return len(small)
+
+    # ----- blobs -----
+
+    def append_blobs(self, records):
+        """Append binary values (dicts with KEY_COLUMNS, 'blob' bytes and optional timestamp)
+
+        Values that are not one number, such as serialized latency
+        histograms, are written once under blobs/, named by their SHA-256,
+        and indexed in blobs.jsonl by the same key columns as the rows.
+        Returns the number of records written.
+        """
+        records = list(records)
+        if not records:
+            return 0
+        now = time.time()
+        os.makedirs(self._path('blobs'), exist_ok=True)
+
+        with self._lock():
+            lines = []
+            for record in records:
+                digest = hashlib.sha256(record['blob']).hexdigest()
+                path = self._path('blobs', digest)
+                if not os.path.exists(path):
+                    tmp = self._path('blobs', f'.{digest}.{uuid.uuid4().hex}')
+                    with open(tmp, 'wb') as f:
+                        f.write(record['blob'])
+                    os.replace(tmp, path)
+                entry = {c: str(record.get(c) or '') for c in KEY_COLUMNS}
+                entry.update(timestamp=record.get('timestamp') or now, digest=digest, size=len(record['blob']))
+                lines.append(json.dumps(entry) + '\n')
+            with open(self._path('blobs.jsonl'), 'a') as f:
+                f.writelines(lines)
+        return len(records)
+
+    def query_blobs(self, since=None, until=None, **filters):
+        """[(entry, bytes)] of the blobs matching the filters, in the order they were appended
+
+        Filters work as in query(); entry holds the key columns, timestamp,
+        digest and size.
+        """
+        for column in filters:
+            if column not in KEY_COLUMNS:
+                raise ValueError(f"Unknown column: {column}")
+        wanted = {c: {v} if isinstance(v, str) else set(v) for c, v in filters.items() if v is not None}
+        try:
+            with open(self._path('blobs.jsonl')) as f:
+                entries = [json.loads(line) for line in f if line.strip()]
+        except FileNotFoundError:
+            return []
+
+        matches = []
+        for entry in entries:
+            if since is not None and entry['timestamp'] < since:
+                continue
+            if until is not None and entry['timestamp'] > until:
+                continue
+            if any(entry[c] not in values for c, values in wanted.items()):
+                continue
+            with open(self._path('blobs', entry['digest']), 'rb') as f:
+                matches.append((entry, f.read()))
+        return matches
+
+    # ----- read path -----
+
+    def _load_segment(self, segment, columns):
+        return {c: np.load(self._path(segment['name'], c + '.npy'), mmap_mode='r') for c in columns}
+
+    def read_segment(self, segment):
+        """All columns of one manifest entry, key columns as dictionary codes"""
+        return {c: np.asarray(a) for c, a in self._load_segment(segment, COLUMNS).items()}
+
+    def query(self, since=None, until=None, **filters):
+        """Return matching rows as a dict of NumPy arrays
+
+        Filters are KEY_COLUMNS given as a string or a list of strings, e.g.
+        query(metric='STREAM_Triad', platform='Container', since=t).
+        """
+        # append() writes the dictionary before the manifest, so reading the manifest
+        # first guarantees every code of the segments it lists is in the dictionary
+        segments = self.segments()
+        dictionary = self.dictionary()
+        wanted = {}
+        for column, values in filters.items():
+            if column not in KEY_COLUMNS:
+                raise ValueError(f"Unknown column: {column}")
+            if values is None:
+                continue
+            if isinstance(values, str):
+                values = [values]
+            index = {v: i for i, v in enumerate(dictionary[column])}
+            wanted[column] = np.array([index[v] for v in values if v in index], dtype=np.int32)
+
+        chunks = []
+        for segment in segments:
+            # Prune on the manifest before touching any column file
+            if since is not None and segment['ts_max'] < since:
+                continue
+            if until is not None and segment['ts_min'] > until:
+                continue
+            if any(not np.isin(codes, segment['codes'][c]).any() for c, codes in wanted.items()):
+                continue
+
+            data = self._load_segment(segment, COLUMNS)
+            mask = np.ones(segment['rows'], dtype=bool)
+            for column, codes in wanted.items():
+                mask &= np.isin(data[column], codes)
+            if since is not None:
+                mask &= data['timestamp'] >= since
+            if until is not None:
+                mask &= data['timestamp'] <= until
+            if mask.any():
+                chunks.append({c: np.asarray(data[c][mask]) for c in COLUMNS})
+
+        result = {}
+        for column in COLUMNS:
+            if chunks:
+                result[column] = np.concatenate([chunk[column] for chunk in chunks])
+            else:
+                result[column] = np.empty(0, dtype=np.int32 if column in KEY_COLUMNS else np.float64)
+        for column in KEY_COLUMNS:
+            labels = np.array(dictionary[column] or [''], dtype=object)
+            result[column] = labels[result[column]]
+        return result
+
+    def query_frame(self, **kwargs):
+        """Like query() but returns a pandas DataFrame"""
+        import pandas as pd
+        frame = pd.DataFrame(self.query(**kwargs))
+        frame['timestamp'] = pd.to_datetime(frame['timestamp'], unit='s')
+        return frame
+
+
+def records_from_results(results, platform, benchmark, host='', timestamp=None):
+    """Turn a {metric: value} dict into store records"""
+    return [{'platform': platform, 'host': host, 'benchmark': benchmark,
+             'metric': metric, 'value': value, 'timestamp': timestamp}
+            for metric, value in results.items()]
+
+
+def main():
+    if len(sys.argv) < 3 or sys.argv[2] not in ('query', 'compact'):
+        print("Usage: python results_store.py <store_dir> query [column=value ...] [days=N]")
+        print("       python results_store.py <store_dir> compact")
+        sys.exit(1)
+
+    store = ResultsStore(sys.argv[1])
+    if sys.argv[2] == 'compact':
+        print(f"Merged {store.compact()} segments")
+        return
+
+    filters = dict(arg.split('=', 1) for arg in sys.argv[3:])
+    days = filters.pop('days', None)
+    if days is not None:
+        filters['since'] = time.time() - float(days) * 86400
+    print(store.query_frame(**filters).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
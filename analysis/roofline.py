@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+
+import argparse
+import re
+import sys
+from collections import namedtuple
+
+from hpcc_parser import parse_hpcc_summary
+
+# Double-precision FLOPs per cycle per core of the widest vector unit the
+# flags advertise, widest first: two FMA pipes x doubles per vector x 2.
+# AVX without FMA issues one add and one multiply per cycle instead.
+SIMD_FLOPS = [
+    (('avx512f', 'fma'), 32),
+    (('avx2', 'fma'), 16),
+    (('avx',), 8),
+    (('sse2',), 4),
+    (('asimd',), 8),   # aarch64: two 128-bit FMA pipes (Neoverse N1, Graviton2)
+]
+
+# Arithmetic intensity (FLOPs per byte of memory traffic) of STREAM Triad,
+# a[i] = b[i] + q * c[i]: two FLOPs per 24 bytes moved
+TRIAD_INTENSITY = 2 / 24
+
+# HPL spends its time in the trailing-matrix DGEMM update, whose inner dimension
+# is the block size NB: 2*NB FLOPs per 8-byte element of C read and written
+HPL_INTENSITY_PER_NB = 1 / 8
+
+# Block size assumed when the log has no summary (run_hpc_tests.sh uses 192)
+DEFAULT_NB = 192
+
+CpuInfo = namedtuple('CpuInfo', 'model sockets cores threads ghz flags')
+
+# One platform's ceilings and where HPL and Triad sit under them. Rates are for
+# the whole run (every rank), in GFLOPS and GB/s; intensities in FLOPs per byte.
+Roofline = namedtuple('Roofline', [
+    'platform', 'ranks', 'peak_gflops', 'compute_gflops', 'bandwidth_gbs', 'ridge',
+    'hpl_gflops', 'hpl_intensity', 'efficiency', 'bound',
+])
+
+ROOFLINE_COLUMNS = ['Platform', 'Ranks', 'Peak (GFLOPS)', 'DGEMM (GFLOPS)', 'Triad (GB/s)',
+                    'Ridge (FLOP/B)', 'HPL (GFLOPS)', 'HPL Efficiency (%)', 'HPL Bound']
+
+
+def parse_cpuinfo(text):
+    """CpuInfo from the text of /proc/cpuinfo
+
+    The nominal frequency comes from the model name ("@ 2.40GHz"), which is
+    what vendors quote peak against; VMs often hide it, so the highest
+    "cpu MHz" is used instead. ghz is None when neither is present (most
+    aarch64 kernels), and cores falls back to the processor count when the
+    topology fields are missing.
+    """
+    blocks = []
+    for chunk in re.split(r'\n\s*\n', text):
+        fields = {}
+        for line in chunk.splitlines():
+            key, sep, value = line.partition(':')
+            if sep:
+                fields[key.strip()] = value.strip()
+        if 'processor' in fields:
+            blocks.append(fields)
+    if not blocks:
+        raise ValueError("no processor entries in cpuinfo")
+
+    first = blocks[0]
+    model = first.get('model name') or first.get('Hardware') or first.get('CPU part', '')
+    sockets = len({b.get('physical id', '0') for b in blocks})
+    cores = len({(b['physical id'], b['core id']) for b in blocks if 'core id' in b}) or len(blocks)
+    match = re.search(r'@\s*([\d.]+)\s*GHz', model)
+    if match:
+        ghz = float(match.group(1))
+    else:
+        mhz = [float(b['cpu MHz']) for b in blocks if 'cpu MHz' in b]
+        ghz = max(mhz) / 1000 if mhz else None
+    flags = set((first.get('flags') or first.get('Features', '')).split())
+    return CpuInfo(model, sockets, cores, len(blocks), ghz, flags)
+
+
+def read_cpuinfo(path='/proc/cpuinfo'):
+    with open(path) as f:
+        return parse_cpuinfo(f.read())
+
+
+def flops_per_cycle(flags):
+    """Double-precision FLOPs per cycle per core for a set of cpuinfo flags"""
+    for required, flops in SIMD_FLOPS:
+        if all(flag in flags for flag in required):
+            return flops
+    return 2
+
+
+def peak_gflops(cpu, cores=None, ghz=None, flops=None):
+    """Theoretical double-precision peak of `cores` cores (default: all of them)"""
+    ghz = ghz or cpu.ghz
+    if ghz is None:
+        raise ValueError(f"cpuinfo has no clock frequency for {cpu.model!r}; pass --ghz")
+    return (cores or cpu.cores) * ghz * (flops or flops_per_cycle(cpu.flags))
+
+
+def hpcc_figures(path):
+    """(ranks, HPL GFLOPS, DGEMM GFLOPS per rank, Triad GB/s per rank, NB) of an HPCC log
+
+    Uses the last summary section. Plain stdout captures have no summary:
+    they are read as one rank with the legacy regexes, and HPL itself stands
+    in for the DGEMM ceiling.
+    """
+    sections = parse_hpcc_summary(path)
+    if sections:
+        s = sections[-1]
+        ranks = int(s.get('CommWorldProcs', 1))
+        hpl = s['HPL_Tflops'] * 1000
+        dgemm = s.get('StarDGEMM_Gflops', s.get('SingleDGEMM_Gflops'))
+        return ranks, hpl, dgemm if dgemm else hpl / ranks, s['StarSTREAM_Triad'], s.get('HPL_NB', DEFAULT_NB)
+
+    from analyze_hpcc import parse_hpcc_results_regex
+    results = parse_hpcc_results_regex(path)
+    return 1, results['HPL_GFLOPS'], results['HPL_GFLOPS'], results['STREAM_Triad'] / 1000, DEFAULT_NB
+
+
+def build_roofline(platform, hpcc_path, cpu, threads_per_rank=1, ghz=None, flops=None):
+    """Roofline of one platform from its HPCC log and /proc/cpuinfo
+
+    Peak counts the cores the ranks ran on (ranks x threads per rank) rather
+    than cpuinfo's core count: containers see every core of the host, and
+    the run spans several nodes. The measured ceilings are DGEMM and Triad
+    with every rank running at once, summed over the ranks.
+    """
+    ranks, hpl, dgemm, triad, nb = hpcc_figures(hpcc_path)
+    peak = peak_gflops(cpu, ranks * threads_per_rank, ghz, flops)
+    compute = max(dgemm * ranks, hpl)
+    bandwidth = triad * ranks
+    ridge = compute / bandwidth
+    intensity = nb * HPL_INTENSITY_PER_NB
+    return Roofline(platform, ranks, peak, compute, bandwidth, ridge, hpl, intensity,
+                    hpl / peak * 100, 'compute' if intensity >= ridge else 'memory')
+
+
+def roofline_rows(rooflines):
+    """Rows for ROOFLINE_COLUMNS"""
+    return [[r.platform, r.ranks, r.peak_gflops, r.compute_gflops, r.bandwidth_gbs, r.ridge,
+             r.hpl_gflops, r.efficiency, r.bound] for r in rooflines]
+
+
+def attribute_overhead(baseline, other):
+    """How other's HPL differs from baseline's, split between the two ceilings
+
+    Returns a dict of percentage changes of HPL and of each ceiling, the
+    ceiling bounding HPL on `other`, and the residual: the part of the HPL
+    change that the bounding ceiling does not explain (communication, OS
+    noise, placement).
+    """
+    change = lambda new, old: (new / old - 1) * 100
+    hpl = change(other.hpl_gflops, baseline.hpl_gflops)
+    compute = change(other.compute_gflops, baseline.compute_gflops)
+    memory = change(other.bandwidth_gbs, baseline.bandwidth_gbs)
+    bound = compute if other.bound == 'compute' else memory
+    return {
+        'baseline': baseline.platform, 'platform': other.platform, 'hpl': hpl,
+        'compute': compute, 'memory': memory, 'attributed_to': other.bound,
+        'residual': ((1 + hpl / 100) / (1 + bound / 100) - 1) * 100,
+    }
+
+
+def format_attribution(a):
+    return (f"{a['platform']} vs {a['baseline']}: HPL {a['hpl']:+.1f}%, compute ceiling {a['compute']:+.1f}%, "
+            f"memory ceiling {a['memory']:+.1f}%; HPL is {a['attributed_to']}-bound, "
+            f"{a['residual']:+.1f}% not explained by that ceiling")
+
+
+def create_roofline_chart(rooflines, output_file):
+    """Overlay the platforms' rooflines with HPL and Triad placed under them"""
+    from analyze_hpcc import PLATFORM_COLORS
+    from render import figure_job, render_all
+
+    job = figure_job('roofline', output_file, {
+        'rooflines': [{
+            'label': r.platform, 'bandwidth': r.bandwidth_gbs, 'compute': r.compute_gflops,
+            'peak': r.peak_gflops,
+            'points': [{'label': 'HPL', 'x': r.hpl_intensity, 'y': r.hpl_gflops},
+                       {'label': 'Triad', 'x': TRIAD_INTENSITY, 'y': r.bandwidth_gbs * TRIAD_INTENSITY}],
+        } for r in rooflines],
+    }, {
+        'figsize': (10, 7),
+        'colors': PLATFORM_COLORS,
+        'title': 'Roofline: ' + ' vs '.join(r.platform for r in rooflines),
+    })
+    render_all([job])
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        description="Theoretical peak, HPL efficiency and overlaid rooflines of HPCC runs",
+        usage="python roofline.py <vm_hpccoutf.txt> <container_hpccoutf.txt> "
+              "--cpuinfo vm_cpuinfo.txt,container_cpuinfo.txt [--platforms VM,Container]")
+    parser.add_argument('inputs', nargs='+', help="one HPCC result file per platform")
+    parser.add_argument('--cpuinfo', required=True,
+                        help="comma separated /proc/cpuinfo copy of each platform, or one for all")
+    parser.add_argument('--platforms', default='VM,Container',
+                        help="comma separated platform of each result file (default: %(default)s)")
+    parser.add_argument('--threads-per-rank', type=int, default=1,
+                        help="cores each MPI rank used, e.g. with a threaded BLAS (default: %(default)s)")
+    parser.add_argument('--ghz', type=float, default=None, help="clock frequency, overriding cpuinfo")
+    parser.add_argument('--flops-per-cycle', type=int, default=None,
+                        help="double-precision FLOPs per cycle per core, overriding the SIMD flags")
+    parser.add_argument('-o', '--output', default='hpcc_roofline.png', help="chart file (default: %(default)s)")
+    parser.add_argument('--csv', default='hpcc_roofline.csv', help="table file (default: %(default)s)")
+    args = parser.parse_args(argv)
+    args.platforms = [p for p in args.platforms.split(',') if p]
+    args.cpuinfo = [p for p in args.cpuinfo.split(',') if p]
+    if len(args.inputs) != len(args.platforms):
+        parser.error(f"expected one result file per platform ({', '.join(args.platforms)})")
+    if len(args.cpuinfo) not in (1, len(args.platforms)):
+        parser.error("expected one cpuinfo file, or one per platform")
+    return args
+
+
+def build_rooflines(inputs, platforms, cpuinfo, threads_per_rank=1, ghz=None, flops=None):
+    """Rooflines of every platform; cpuinfo is one path for all or one per platform"""
+    cpus = [read_cpuinfo(path) for path in cpuinfo]
+    cpus = cpus * len(platforms) if len(cpus) == 1 else cpus
+    return [build_roofline(p, path, cpu, threads_per_rank, ghz, flops)
+            for p, path, cpu in zip(platforms, inputs, cpus)]
+
+
+def main(argv=None):
+    import csv
+
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    try:
+        rooflines = build_rooflines(args.inputs, args.platforms, args.cpuinfo, args.threads_per_rank,
+                                    args.ghz, args.flops_per_cycle)
+    except (KeyError, ValueError) as e:
+        sys.exit(f"cannot build the rooflines: {e}")
+
+    rows = roofline_rows(rooflines)
+    print(f"{'Platform':<12} {'Ranks':>5} {'Peak':>9} {'DGEMM':>9} {'Triad GB/s':>10} {'Ridge':>6} "
+          f"{'HPL':>9} {'Eff %':>6}  Bound")
+    for row in rows:
+        print(f"{row[0]:<12} {row[1]:>5} {row[2]:>9.2f} {row[3]:>9.2f} {row[4]:>10.2f} {row[5]:>6.2f} "
+              f"{row[6]:>9.2f} {row[7]:>6.1f}  {row[8]}")
+    for other in rooflines[1:]:
+        print(format_attribution(attribute_overhead(rooflines[0], other)))
+
+    with open(args.csv, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(ROOFLINE_COLUMNS)
+        writer.writerows(rows)
+    create_roofline_chart(rooflines, args.output)
+    print(f"Results saved to {args.csv} and {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+
+import argparse
+import os
+import random
+import sys
+import time
+
+# Synthetic result files shaped like the real tool output, for timing the analysis
+# scripts at scales the cluster never produces. Every run writes one file per tool
+# and platform, named like the suite's files so the platform is inferred the same way.
+
+PLATFORMS = ('vm', 'container')
+
+TOOLS = ('hpcc', 'iozone', 'sysbench', 'stress_ng', 'iperf')
+
+# Mean and relative spread per platform of each HPCC summary value
+HPCC_SUMMARY = {
+    'HPL_Tflops': ((0.0102, 0.0108), 0.03),
+    'HPL_time': ((547.3, 519.1), 0.03),
+    'StarDGEMM_Gflops': ((6.91, 7.12), 0.02),
+    'SingleDGEMM_Gflops': ((7.04, 7.21), 0.02),
+    'PTRANS_GBs': ((0.512, 0.581), 0.05),
+    'MPIRandomAccess_GUPs': ((0.00153, 0.00171), 0.06),
+    'StarRandomAccess_GUPs': ((0.0201, 0.0214), 0.05),
+    'SingleRandomAccess_GUPs': ((0.0341, 0.0352), 0.05),
+    'StarSTREAM_Copy': ((5.42, 5.61), 0.02),
+    'StarSTREAM_Scale': ((5.38, 5.55), 0.02),
+    'StarSTREAM_Add': ((5.89, 6.04), 0.02),
+    'StarSTREAM_Triad': ((5.91, 6.08), 0.02),
+    'SingleSTREAM_Copy': ((8.10, 8.32), 0.02),
+    'SingleSTREAM_Triad': ((8.98, 9.20), 0.02),
+    'StarFFT_Gflops': ((1.23, 1.29), 0.04),
+    'SingleFFT_Gflops': ((1.40, 1.45), 0.04),
+    'MPIFFT_Gflops': ((0.857, 0.921), 0.05),
+    'MaxPingPongLatency_usec': ((4.12, 3.71), 0.05),
+    'AvgPingPongLatency_usec': ((4.00, 3.52), 0.05),
+    'MinPingPongBandwidth_GBytes': ((1.01, 1.13), 0.05),
+    'AvgPingPongBandwidth_GBytes': ((1.24, 1.37), 0.05),
+    'NaturallyOrderedRingLatency_usec': ((4.51, 4.02), 0.05),
+    'RandomlyOrderedRingBandwidth_GBytes': ((0.654, 0.712), 0.05),
+}
+
+# HPL progress lines that precede the summary in a real hpccoutf.txt
+HPCC_PREAMBLE_LINES = 60
+
+IOZONE_TESTS = ['Writer', 'Re-writer', 'Reader', 'Re-reader', 'Random read', 'Random write',
+                'Backward read', 'Record rewrite', 'Stride read', 'Fwrite', 'Re-fwrite', 'Fread', 'Re-fread']
+
+# iozone -a: 64 KB to 512 MB files, 4 KB to 16 MB records
+IOZONE_FILE_SIZES = [64 * 2 ** i for i in range(14)]
+IOZONE_RECORD_SIZES = [4 * 2 ** i for i in range(13)]
+
+# Throughput falls by these factors past each file size (KB), per platform:
+# CPU caches for both, plus the container's 128 MB memory limit
+IOZONE_CLIFFS = {'vm': [(8192, 0.45)], 'container': [(8192, 0.45), (131072, 0.1)]}
+
+SYSBENCH_MIB_PER_SEC = {'vm': 4400.0, 'container': 4650.0}
+STRESS_NG_BOGO_OPS = {'vm': 48712, 'container': 50233}
+IPERF_MBITS = {'vm': 903.0, 'container': 941.0}
+
+
+def spread(rng, mean, relative):
+    return mean * rng.lognormvariate(0, relative)
+
+
+def hpcc_text(rng, platform):
+    """hpccoutf.txt with HPL progress lines and one summary section"""
+    k = PLATFORMS.index(platform)
+    values = {key: spread(rng, means[k], relative) for key, (means, relative) in HPCC_SUMMARY.items()}
+    lines = ["########################################################################",
+             "This is the DARPA/DOE HPC Challenge Benchmark version 1.5.0 October 2012",
+             "########################################################################"]
+    for _ in range(HPCC_PREAMBLE_LINES // 2):
+        lines.append(f"WR11C2R4       20352   192     1     2         {values['HPL_time']:>10.2f}"
+                     f"              {values['HPL_Tflops'] * 1000:.4e}")
+        lines.append("||Ax-b||_oo/(eps*(||A||_oo*||x||_oo+||b||_oo)*N)=  0.0021 ...... PASSED")
+    lines += ["Begin of Summary section.", "VersionMajor=1", "VersionMinor=5", "LANG=C", "Success=1",
+              "CommWorldProcs=2", "HPL_N=20352", "HPL_NB=192", "HPL_nprow=1", "HPL_npcol=2"]
+    lines += [f"{key}={value:.6g}" for key, value in values.items()]
+    lines.append("End of Summary section.")
+    return '\n'.join(lines) + '\n'
+
+
+def iozone_text(rng, platform):
+    """iozone -a -R -O report with every test's Excel section"""
+    lines = ["\tIozone: Performance Test of File I/O", "\t        Version $Revision: 3.489 $", "",
+             "\tAuto Mode", "\tOPS Mode. Output is in operations per second.", "",
+             "Excel output is below:", ""]
+    for test in IOZONE_TESTS:
+        lines.append(f'"{test} report"')
+        lines.append('        ' + '  '.join(f'"{r}"' for r in IOZONE_RECORD_SIZES))
+        for size in IOZONE_FILE_SIZES:
+            level = 4e6
+            for limit, factor in IOZONE_CLIFFS[platform]:
+                if size > limit:
+                    level *= factor
+            cells = []
+            for record in IOZONE_RECORD_SIZES:
+                if record > size:
+                    break
+                # Like iozone -a, small records are skipped on large files
+                cells.append('0' if size > 32768 and record < 64 else
+                             str(int(spread(rng, level / record ** 0.7, 0.08))))
+            lines.append(f'"{size}"   ' + '  '.join(cells))
+        lines.append('')
+    return '\n'.join(lines) + '\n'
+
+
+def sysbench_text(rng, platform, ranks=2):
+    """sysbench memory report, once per MPI rank as mpirun concatenates them"""
+    reports = []
+    for _ in range(ranks):
+        rate = spread(rng, SYSBENCH_MIB_PER_SEC[platform], 0.03)
+        seconds = 10240 / rate
+        reports.append(f"""sysbench 1.0.20 (using system LuaJIT 2.1.0-beta3)
+
+Running the test with following options:
+Number of threads: 1
+Initializing random number generator from current time
+
+
+Running memory speed test with the following options:
+  block size: 1KiB
+  total size: 10240MiB
+  operation: write
+  scope: global
+
+Initializing worker threads...
+
+Threads started!
+
+Total operations: 10485760 ({10485760 / seconds:.2f} per second)
+
+10240.00 MiB transferred ({rate:.2f} MiB/sec)
+
+
+General statistics:
+    total time:                          {seconds:.4f}s
+    total number of events:              10485760
+
+Latency (ms):
+         min:                                    0.00
+         avg:                                    0.00
+         max:                                    {spread(rng, 0.05, 0.3):.2f}
+         95th percentile:                        0.00
+         sum:                                 {seconds * 450:.2f}
+
+Threads fairness:
+    events (avg/stddev):           10485760.0000/0.00
+    execution time (avg/stddev):   {seconds * 0.45:.4f}/0.00
+""")
+    return '\n'.join(reports)
+
+
+def stress_ng_text(rng, platform):
+    """stress-ng --cpu 2 --timeout 60s --metrics-brief log"""
+    ops = int(spread(rng, STRESS_NG_BOGO_OPS[platform], 0.02))
+    real, usr = spread(rng, 60.0, 0.001), spread(rng, 119.8, 0.005)
+    pid = rng.randint(1000, 60000)
+    # Runs end either side of 60s, so split the rounded total rather than subtracting a minute
+    mins, secs = divmod(round(real, 2), 60)
+    return (f"stress-ng: info:  [{pid}] setting to a 60 second run per stressor\n"
+            f"stress-ng: info:  [{pid}] dispatching hogs: 2 cpu\n"
+            f"stress-ng: info:  [{pid}] stressor       bogo ops real time  usr time  sys time   bogo ops/s     bogo ops/s\n"
+            f"stress-ng: info:  [{pid}]                           (secs)    (secs)    (secs)   (real time) (usr+sys time)\n"
+            f"stress-ng: info:  [{pid}] cpu            {ops:>9} {real:>9.2f} {usr:>9.2f} {0.05:>9.2f} "
+            f"{ops / real:>12.2f} {ops / (usr + 0.05):>14.2f}\n"
+            f"stress-ng: info:  [{pid}] successful run completed in {real:.2f}s ({mins:.0f} min, {secs:.2f} secs)\n")
+
+
+def iperf_text(rng, platform):
+    """iperf TCP client log with per-second intervals and the whole-run line"""
+    lines = ["------------------------------------------------------------",
+             "Client connecting to 192.168.56.10, TCP port 5001",
+             "TCP window size: 85.0 KByte (default)",
+             "------------------------------------------------------------",
+             "[  3] local 192.168.56.11 port 50312 connected with 192.168.56.10 port 5001",
+             "[ ID] Interval       Transfer     Bandwidth"]
+    rates = [spread(rng, IPERF_MBITS[platform], 0.02) for _ in range(10)]
+    for second, rate in enumerate(rates):
+        lines.append(f"[  3] {second:>4.1f}-{second + 1:>4.1f} sec   {rate / 8:.1f} MBytes   {rate:.0f} Mbits/sec")
+    total = sum(rates) / len(rates)
+    lines.append(f"[  3]  0.0-10.0 sec  {total * 10 / 8 / 1024:.2f} GBytes   {total:.0f} Mbits/sec")
+    return '\n'.join(lines) + '\n'
+
+
+WRITERS = {
+    'hpcc': ('hpccoutf', hpcc_text),
+    'iozone': ('iozone_results', iozone_text),
+    'sysbench': ('sysbench_memory', sysbench_text),
+    'stress_ng': ('stress_ng_cpu', stress_ng_text),
+    'iperf': ('iperf_results', iperf_text),
+}
+
+
+def tool_dir(directory, tool):
+    return os.path.join(directory, tool)
+
+
+def generate(directory, runs, seed=0, tools=TOOLS):
+    """Write runs result files per tool, split across the platforms
+
+    Each tool gets its own subdirectory, e.g. hpcc/vm_hpccoutf_000003.txt.
+    The same seed gives the same corpus. Returns {tool: [paths]}.
+    """
+    paths = {}
+    for tool in tools:
+        stem, write = WRITERS[tool]
+        os.makedirs(tool_dir(directory, tool), exist_ok=True)
+        paths[tool] = []
+        for run in range(runs):
+            platform = PLATFORMS[run % len(PLATFORMS)]
+            rng = random.Random(f'{seed}:{tool}:{run}')
+            path = os.path.join(tool_dir(directory, tool), f'{platform}_{stem}_{run:06d}.txt')
+            with open(path, 'w') as f:
+                f.write(write(rng, platform))
+            paths[tool].append(path)
+    return paths
+
+
+def corpus_paths(directory, tools=TOOLS):
+    """{tool: [paths]} of a corpus written by generate"""
+    return {tool: sorted(os.path.join(tool_dir(directory, tool), name)
+                         for name in os.listdir(tool_dir(directory, tool)))
+            for tool in tools}
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Write a synthetic corpus of benchmark result files")
+    parser.add_argument('directory', help="Where to write the corpus")
+    parser.add_argument('runs', type=int, help="Runs per tool, split across VM and container (e.g. 10, 1000, 100000)")
+    parser.add_argument('--seed', type=int, default=0, help="Seed; the same seed gives the same files")
+    parser.add_argument('--tools', default=','.join(TOOLS), help="Comma separated tools (default: %(default)s)")
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_args(sys.argv[1:])
+    tools = [t for t in args.tools.split(',') if t]
+    unknown = [t for t in tools if t not in WRITERS]
+    if unknown:
+        print(f"Unknown tools: {', '.join(unknown)} (known: {', '.join(TOOLS)})")
+        sys.exit(1)
+
+    start = time.perf_counter()
+    paths = generate(args.directory, args.runs, args.seed, tools)
+    size = sum(os.path.getsize(p) for files in paths.values() for p in files)
+    print(f"{sum(len(files) for files in paths.values())} files ({size / 1e6:.1f} MB) written to "
+          f"{args.directory} in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,435 @@
+#!/usr/bin/env python3
+
+import abc
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import numpy as np
+
+from live_metrics import RingBuffer
+
+# Default sampling period and ring size (about 4.5 hours at one sample per second)
+DEFAULT_INTERVAL = 1.0
+DEFAULT_CAPACITY = 16384
+
+CGROUP_ROOT = '/sys/fs/cgroup'
+
+# Fields that only ever grow; rates() turns them into per-second deltas
+COUNTERS = {
+    'cpu.user', 'cpu.nice', 'cpu.system', 'cpu.idle', 'cpu.iowait', 'cpu.irq', 'cpu.softirq', 'cpu.steal',
+    'stat.ctxt', 'vmstat.pgfault', 'vmstat.pgmajfault', 'vmstat.pswpin', 'vmstat.pswpout',
+    'vmstat.pgscan_kswapd', 'vmstat.pgscan_direct', 'disk.reads', 'disk.sectors_read', 'disk.writes',
+    'disk.sectors_written', 'disk.io_ms', 'net.rx_bytes', 'net.rx_packets', 'net.tx_bytes', 'net.tx_packets',
+    'cgroup.usage_usec', 'cgroup.user_usec', 'cgroup.system_usec', 'cgroup.nr_periods',
+    'cgroup.nr_throttled', 'cgroup.throttled_usec', 'cgroup.pgmajfault', 'cgroup.workingset_refault_file',
+}
+
+
+class ProcSource(abc.ABC):
+    """One /proc or cgroup file, kept open and re-read from the start each sample"""
+
+    fields = []
+
+    def __init__(self, path):
+        self.path = path
+        try:
+            self.f = open(path, 'rb', buffering=0)
+        except OSError:
+            self.f = None
+
+    @property
+    def available(self):
+        return self.f is not None
+
+    def text(self):
+        self.f.seek(0)
+        return self.f.read().decode('ascii', 'replace')
+
+    @abc.abstractmethod
+    def read(self, out):
+        """Write this source's values into out, one slot per field"""
+
+
+class KeyedSource(ProcSource):
+    """'key value' files such as /proc/meminfo, /proc/vmstat and cgroup *.stat"""
+
+    def __init__(self, path, prefix, keys, scale=1.0):
+        super().__init__(path)
+        self.fields = [f'{prefix}.{k}' for k in keys]
+        self.index = {k: i for i, k in enumerate(keys)}
+        self.scale = scale
+
+    def read(self, out):
+        out[:] = np.nan
+        for line in self.text().splitlines():
+            key, _, rest = line.partition(' ')
+            i = self.index.get(key.rstrip(':'))
+            if i is not None:
+                out[i] = float(rest.split()[0]) * self.scale
+
+
+class StatSource(ProcSource):
+    """Aggregate CPU jiffies, context switches and run queue from /proc/stat"""
+
+    CPU = ['user', 'nice', 'system', 'idle', 'iowait', 'irq', 'softirq', 'steal']
+    fields = [f'cpu.{c}' for c in CPU] + ['stat.ctxt', 'stat.procs_running', 'stat.procs_blocked']
+
+    def __init__(self, path='/proc/stat'):
+        super().__init__(path)
+
+    def read(self, out):
+        n = len(self.CPU)
+        for line in self.text().splitlines():
+            if line.startswith('cpu '):
+                out[:n] = line.split()[1:n + 1]
+            elif line.startswith('ctxt '):
+                out[n] = float(line[5:])
+            elif line.startswith('procs_running '):
+                out[n + 1] = float(line[14:])
+            elif line.startswith('procs_blocked '):
+                out[n + 2] = float(line[14:])
+
+
+class DiskSource(ProcSource):
+    """I/O of all whole disks in /proc/diskstats (partitions, loop and ram devices are skipped)"""
+
+    fields = ['disk.reads', 'disk.sectors_read', 'disk.writes', 'disk.sectors_written', 'disk.io_ms']
+
+    def __init__(self, path='/proc/diskstats'):
+        super().__init__(path)
+        self.disks = {name for name in os.listdir('/sys/block')
+                      if not name.startswith(('loop', 'ram'))} if os.path.isdir('/sys/block') else set()
+
+    def read(self, out):
+        out[:] = 0
+        for line in self.text().splitlines():
+            cols = line.split()
+            if len(cols) > 12 and cols[2] in self.disks:
+                out[0] += float(cols[3])
+                out[1] += float(cols[5])
+                out[2] += float(cols[7])
+                out[3] += float(cols[9])
+                out[4] += float(cols[12])
+
+
+class NetSource(ProcSource):
+    """Traffic of every interface but loopback in /proc/net/dev"""
+
+    fields = ['net.rx_bytes', 'net.rx_packets', 'net.tx_bytes', 'net.tx_packets']
+
+    def __init__(self, path='/proc/net/dev'):
+        super().__init__(path)
+
+    def read(self, out):
+        out[:] = 0
+        for line in self.text().splitlines()[2:]:
+            name, _, counters = line.partition(':')
+            if name.strip() == 'lo':
+                continue
+            cols = counters.split()
+            out[0] += float(cols[0])
+            out[1] += float(cols[1])
+            out[2] += float(cols[8])
+            out[3] += float(cols[9])
+
+
+class ValueSource(ProcSource):
+    """A file holding a single number, such as cgroup memory.current"""
+
+    def __init__(self, path, field):
+        super().__init__(path)
+        self.fields = [field]
+
+    def read(self, out):
+        out[0] = float(self.text().split()[0])
+
+
+def own_cgroup():
+    """cgroup v2 directory of this process, or None on a v1-only host"""
+    try:
+        with open('/proc/self/cgroup') as f:
+            for line in f:
+                if line.startswith('0::'):
+                    path = os.path.join(CGROUP_ROOT, line[3:].strip().lstrip('/'))
+                    return path if os.path.exists(os.path.join(path, 'cpu.stat')) else None
+    except OSError:
+        pass
+    return None
+
+
+def container_cgroup(container):
+    """cgroup v2 directory of a running docker container, or None if it cannot be found
+
+    Covers the systemd cgroup driver (system.slice/docker-<id>.scope) and
+    the cgroupfs one (docker/<id>).
+    """
+    try:
+        cid = subprocess.run(['docker', 'inspect', '-f', '{{.Id}}', container], capture_output=True,
+                             text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    for path in (os.path.join(CGROUP_ROOT, 'system.slice', f'docker-{cid}.scope'),
+                 os.path.join(CGROUP_ROOT, 'docker', cid)):
+        if os.path.exists(os.path.join(path, 'cpu.stat')):
+            return path
+    return None
+
+
+def default_sources(cgroup=None):
+    """/proc sources plus cgroup v2 cpu.stat and memory.stat of cgroup (default: our own)"""
+    sources = [
+        StatSource(),
+        KeyedSource('/proc/meminfo', 'meminfo',
+                    ['MemFree', 'MemAvailable', 'Cached', 'Dirty', 'Writeback'], scale=1024),
+        KeyedSource('/proc/vmstat', 'vmstat',
+                    ['pgfault', 'pgmajfault', 'pswpin', 'pswpout', 'pgscan_kswapd', 'pgscan_direct']),
+        DiskSource(),
+        NetSource(),
+    ]
+    cgroup = cgroup or own_cgroup()
+    if cgroup:
+        sources += [
+            KeyedSource(os.path.join(cgroup, 'cpu.stat'), 'cgroup',
+                        ['usage_usec', 'user_usec', 'system_usec', 'nr_periods', 'nr_throttled', 'throttled_usec']),
+            KeyedSource(os.path.join(cgroup, 'memory.stat'), 'cgroup',
+                        ['anon', 'file', 'file_dirty', 'pgmajfault', 'workingset_refault_file']),
+            ValueSource(os.path.join(cgroup, 'memory.current'), 'cgroup.memory_current'),
+        ]
+    return [s for s in sources if s.available]
+
+
+class TelemetrySampler:
+    """Background thread sampling host and cgroup counters into a ring buffer
+
+    Each sample is one preallocated row: the wall-clock time followed by
+    every source's fields. Reads reuse open file handles, so a sample costs
+    a handful of small reads and no allocations beyond the parsed text.
+    """
+
+    def __init__(self, interval=DEFAULT_INTERVAL, capacity=DEFAULT_CAPACITY, cgroup=None, sources=None):
+        self.interval = interval
+        self.sources = sources if sources is not None else default_sources(cgroup)
+        self.fields = [field for s in self.sources for field in s.fields]
+        self.ring = RingBuffer(capacity, 1 + len(self.fields))
+        self._row = np.empty(1 + len(self.fields))
+        self._slices = []
+        offset = 1
+        for s in self.sources:
+            self._slices.append((s, slice(offset, offset + len(s.fields))))
+            offset += len(s.fields)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._cpu = 0.0
+        self._started = None
+
+    def sample(self):
+        """Take one sample now (safe to call while the thread is running)"""
+        with self._lock:
+            row = self._row
+            row[0] = time.time()
+            for source, part in self._slices:
+                try:
+                    source.read(row[part])
+                except (OSError, ValueError, IndexError):
+                    row[part] = np.nan
+            self.ring.append(row)
+
+    def _run(self):
+        next_tick = time.monotonic()
+        while not self._stop.is_set():
+            cpu = time.thread_time()
+            self.sample()
+            self._cpu += time.thread_time() - cpu
+            next_tick += self.interval
+            self._stop.wait(max(0.0, next_tick - time.monotonic()))
+
+    def start(self):
+        self._stop.clear()
+        self._started = time.monotonic()
+        self._thread = threading.Thread(target=self._run, name='telemetry', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def overhead(self):
+        """CPU time spent sampling as a fraction of the wall time since start()"""
+        if self._started is None:
+            return 0.0
+        return self._cpu / max(time.monotonic() - self._started, 1e-9)
+
+    def window(self, since=None, until=None):
+        """(times, values) of the buffered samples between since and until"""
+        with self._lock:
+            rows = self.ring.view()
+        mask = np.ones(len(rows), dtype=bool)
+        if since is not None:
+            mask &= rows[:, 0] >= since
+        if until is not None:
+            mask &= rows[:, 0] <= until
+        rows = rows[mask]
+        return rows[:, 0], rows[:, 1:]
+
+    def save(self, path, since=None, until=None):
+        """Write the samples of a time window to an .npz file next to a result"""
+        times, values = self.window(since, until)
+        np.savez_compressed(path, time=times, values=values, fields=np.array(self.fields),
+                            interval=self.interval)
+        return len(times)
+
+
+def telemetry_path(result_path):
+    """Where the telemetry of a result file is kept: vm_hpcc_results.txt -> vm_hpcc_results.telemetry.npz"""
+    return os.path.splitext(result_path)[0] + '.telemetry.npz'
+
+
+def load_telemetry(path):
+    """(times, {field: values}) from a saved .npz"""
+    with np.load(path) as data:
+        fields = [str(f) for f in data['fields']]
+        return data['time'], {f: data['values'][:, i] for i, f in enumerate(fields)}
+
+
+def rates(times, series):
+    """Per-interval view for plotting: counters become per-second rates
+
+    Returns (midpoint times, {name: values}) including derived CPU shares
+    (busy, iowait, steal in %) and the cgroup throttled share when present.
+    """
+    dt = np.diff(times)
+    dt[dt <= 0] = np.nan
+    out = {}
+    for name, values in series.items():
+        if name in COUNTERS:
+            out[name] = np.diff(values) / dt
+        else:
+            out[name] = values[1:]
+
+    cpu = [f'cpu.{c}' for c in StatSource.CPU]
+    if all(c in series for c in cpu):
+        total = sum(np.diff(series[c]) for c in cpu)
+        total[total <= 0] = np.nan
+        idle = np.diff(series['cpu.idle']) + np.diff(series['cpu.iowait'])
+        out['cpu_busy_pct'] = (1 - idle / total) * 100
+        out['cpu_iowait_pct'] = np.diff(series['cpu.iowait']) / total * 100
+        out['cpu_steal_pct'] = np.diff(series['cpu.steal']) / total * 100
+    if 'cgroup.throttled_usec' in series:
+        out['cgroup_throttled_pct'] = np.diff(series['cgroup.throttled_usec']) / 1e6 / dt * 100
+    return (times[1:] + times[:-1]) / 2, out
+
+
+def summarize(path):
+    """Mean of the headline rates of a saved telemetry file"""
+    times, series = load_telemetry(path)
+    if len(times) < 2:
+        return {}
+    _, derived = rates(times, series)
+    names = ['cpu_busy_pct', 'cpu_iowait_pct', 'cpu_steal_pct', 'cgroup_throttled_pct', 'stat.ctxt',
+             'vmstat.pgmajfault', 'meminfo.Cached', 'disk.sectors_written', 'net.rx_bytes', 'net.tx_bytes']
+    return {n: float(np.nanmean(derived[n])) for n in names if n in derived}
+
+
+# Panels of the timeline figure: (y label, [(series, label, scale)])
+TIMELINE_PANELS = [
+    ('CPU (%)', [('cpu_busy_pct', 'busy', 1), ('cpu_iowait_pct', 'iowait', 1),
+                 ('cpu_steal_pct', 'steal', 1), ('cgroup_throttled_pct', 'throttled', 1)]),
+    ('Context switches/s', [('stat.ctxt', 'context switches', 1)]),
+    ('Page cache (MB)', [('meminfo.Cached', 'cached', 1 / 2 ** 20), ('meminfo.Dirty', 'dirty', 1 / 2 ** 20)]),
+    ('Faults/s', [('vmstat.pgmajfault', 'major faults', 1), ('cgroup.pgmajfault', 'cgroup major faults', 1)]),
+    ('I/O (MB/s)', [('disk.sectors_written', 'disk write', 512 / 2 ** 20), ('disk.sectors_read', 'disk read', 512 / 2 ** 20),
+                    ('net.rx_bytes', 'net rx', 1 / 2 ** 20), ('net.tx_bytes', 'net tx', 1 / 2 ** 20)]),
+]
+
+
+def timeline_job(path, output, benchmark=None):
+    """figure_job overlaying a run's telemetry on its benchmark samples
+
+    benchmark is an optional {label: (times, values)} of the benchmark's own
+    samples (e.g. live sysbench or iperf intervals), drawn in the top panel.
+    """
+    from render import figure_job
+
+    times, series = load_telemetry(path)
+    mid, derived = rates(times, series)
+    origin = times[0] if len(times) else 0.0
+    panels = []
+    if benchmark:
+        panels.append({'ylabel': 'Benchmark', 'lines': [
+            {'label': label, 'x': np.asarray(t) - origin, 'y': np.asarray(v)} for label, (t, v) in benchmark.items()]})
+    for ylabel, lines in TIMELINE_PANELS:
+        drawn = [{'label': label, 'x': mid - origin, 'y': derived[name] * scale}
+                 for name, label, scale in lines if name in derived and np.isfinite(derived[name]).any()]
+        if drawn:
+            panels.append({'ylabel': ylabel, 'lines': drawn})
+    return figure_job('timeline', output, {'panels': panels},
+                      {'figsize': (12, 2.2 * max(len(panels), 1)), 'dpi': 150,
+                       'title': f'Telemetry: {os.path.basename(path)}', 'xlabel': 'Time (s)'})
+
+
+def main():
+    if len(sys.argv) < 3 or sys.argv[1] not in ('record', 'summary', 'plot'):
+        print("Usage: python telemetry.py record <out.npz> [interval] [--cgroup <dir>] -- <command ...>")
+        print("       python telemetry.py summary <telemetry.npz>")
+        print("       python telemetry.py plot <telemetry.npz> <out.png> [store_dir]")
+        sys.exit(1)
+
+    if sys.argv[1] == 'summary':
+        for name, value in summarize(sys.argv[2]).items():
+            print(f"{name:>24}: {value:.4g}")
+        return
+
+    if sys.argv[1] == 'plot':
+        from render import render_all
+
+        benchmark = None
+        if len(sys.argv) > 4:
+            # Live samples recorded in the store during the same window
+            from results_store import ResultsStore
+            times, _ = load_telemetry(sys.argv[2])
+            rows = ResultsStore(sys.argv[4]).query(since=times[0], until=times[-1])
+            labels = np.array([f'{p} {b} {m}'.strip() for p, b, m in
+                               zip(rows['platform'], rows['benchmark'], rows['metric'])], dtype=object)
+            benchmark = {label: (rows['timestamp'][labels == label], rows['value'][labels == label])
+                         for label in sorted(set(labels))}
+        render_all([timeline_job(sys.argv[2], sys.argv[3], benchmark)])
+        return
+
+    rest = sys.argv[3:]
+    interval = DEFAULT_INTERVAL
+    if rest and rest[0] not in ('--', '--cgroup'):
+        interval = float(rest.pop(0))
+    cgroup = None
+    if rest and rest[0] == '--cgroup':
+        # e.g. a container's /sys/fs/cgroup/system.slice/docker-<id>.scope
+        cgroup = rest[1]
+        del rest[:2]
+        if not os.path.exists(os.path.join(cgroup, 'cpu.stat')):
+            print(f"No cgroup v2 cpu.stat in {cgroup}, sampling /proc only", file=sys.stderr)
+    command = rest[1:] if rest and rest[0] == '--' else rest
+
+    # Run a command while sampling, like `time` but for the whole host
+    with TelemetrySampler(interval, cgroup=cgroup) as sampler:
+        status = subprocess.call(command) if command else 0
+        sampler.sample()
+    count = sampler.save(sys.argv[2])
+    print(f"{count} samples of {len(sampler.fields)} fields, sampler overhead "
+          f"{sampler.overhead() * 100:.3f}% CPU", file=sys.stderr)
+    sys.exit(status)
+
+
+if __name__ == "__main__":
+    main()
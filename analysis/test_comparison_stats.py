@@ -0,0 +1,21 @@
+import numpy as np
+
+from comparison_stats import compare_matrix, compare_samples
+
+# Resamples for both sides; enough that the two CIs agree to well under a point
+RESAMPLES = 20000
+
+
+def test_matrix_ci_matches_two_sample_ci():
+    """Independent platforms get the same bootstrap CI from the matrix as from compare_samples"""
+    a = np.random.default_rng(0).normal(100, 10, 5)
+    b = a + 1
+    matrix = compare_matrix({'VM': {'x': list(a)}, 'Container': {'x': list(b)}},
+                            n_resamples=RESAMPLES, seed=1)
+    pair = compare_samples({'x': list(a)}, {'x': list(b)}, n_resamples=RESAMPLES, seed=2)['x']
+
+    # Width of the CI, not just its ends: paired resamples shrink it to about 1%
+    width = pair['ci_high'] - pair['ci_low']
+    assert abs(matrix['ci_low'][0, 1, 0] - pair['ci_low']) < 0.1 * width
+    assert abs(matrix['ci_high'][0, 1, 0] - pair['ci_high']) < 0.1 * width
+    assert not matrix['significant'][0, 1, 0]
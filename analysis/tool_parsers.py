@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+
+import os
+import re
+import sys
+import time
+from collections import namedtuple
+
+# Common record emitted by every tool parser, e.g.
+# ToolRecord('sysbench', 'memory', 'throughput', 4400.22, 'MiB/sec')
+ToolRecord = namedtuple('ToolRecord', ['tool', 'test', 'metric', 'value', 'unit'])
+
+# Bytes read from the start of a file to decide which parser handles it
+SNIFF_BYTES = 4096
+
+# File name prefixes written by run_hpc_tests.sh / run_performance_tests.sh
+PLATFORM_PREFIXES = {
+    'vm': 'VM',
+    'container': 'Container',
+    'baremetal': 'Bare-metal',
+    'gvisor': 'gVisor',
+    'kata': 'Kata',
+}
+
+# Registered parsers in sniffing order: (name, sniff(head) -> bool, parse(text) -> [ToolRecord])
+PARSERS = []
+
+
+def register_parser(name, sniff, parse):
+    """Add a parser; later registrations with the same name replace earlier ones"""
+    PARSERS[:] = [p for p in PARSERS if p[0] != name]
+    PARSERS.append((name, sniff, parse))
+
+
+def sniff(head):
+    """Name of the first registered parser that recognises the start of a log"""
+    for name, matches, _ in PARSERS:
+        if matches(head):
+            return name
+    return None
+
+
+# ----- sysbench -----
+
+SYSBENCH_TESTS = [
+    ('memory', re.compile(r'Running memory speed test')),
+    ('cpu', re.compile(r'Prime numbers limit')),
+    ('fileio', re.compile(r'Extra file open flags')),
+]
+SYSBENCH_PATTERNS = [
+    ('operations_per_sec', 'ops/sec', re.compile(r'Total operations: \d+ \(([\d.]+) per second\)')),
+    ('throughput', 'MiB/sec', re.compile(r'MiB transferred \(([\d.]+) MiB/sec\)')),
+    ('events_per_sec', 'events/sec', re.compile(r'events per second:\s+([\d.]+)')),
+    ('total_time', 's', re.compile(r'total time:\s+([\d.]+)s')),
+    ('total_events', 'events', re.compile(r'total number of events:\s+(\d+)')),
+    ('latency_min', 'ms', re.compile(r'^\s+min:\s+([\d.]+)', re.M)),
+    ('latency_avg', 'ms', re.compile(r'^\s+avg:\s+([\d.]+)', re.M)),
+    ('latency_max', 'ms', re.compile(r'^\s+max:\s+([\d.]+)', re.M)),
+    # The percentile sysbench reports is configurable (--percentile, default 95)
+    ('latency_p{}', 'ms', re.compile(r'^\s+(\d+)th percentile:\s+([\d.]+)', re.M)),
+]
+
+
+def sniff_sysbench(head):
+    return 'sysbench' in head and ('Running the test with following options' in head
+                                   or 'Running memory speed test' in head or 'Prime numbers limit' in head)
+
+
+def parse_sysbench(text):
+    """Totals and latency statistics of each sysbench run in the log
+
+    `mpirun -np N sysbench` concatenates N reports; every one is returned.
+    """
+    test = next((name for name, pattern in SYSBENCH_TESTS if pattern.search(text)), 'unknown')
+    records = []
+    for metric, unit, pattern in SYSBENCH_PATTERNS:
+        for match in pattern.finditer(text):
+            if pattern.groups == 2:
+                records.append(ToolRecord('sysbench', test, metric.format(match.group(1)),
+                                          float(match.group(2)), unit))
+            else:
+                records.append(ToolRecord('sysbench', test, metric, float(match.group(1)), unit))
+    return records
+
+
+# ----- stress-ng -----
+
+# --metrics-brief rows: stressor, bogo ops, real/usr/sys time, bogo ops/s (real), bogo ops/s (usr+sys);
+# newer versions log them as "metrc:" and append more columns, which are ignored
+STRESS_NG_ROW = re.compile(
+    r'^stress-ng: (?:info|metrc):\s+\[\d+\]\s+([a-z][\w-]*)\s+(\d+)\s+([\d.]+)\s+([\d.]+)\s+([\d.]+)'
+    r'\s+([\d.]+)\s+([\d.]+)(?=\s|$)', re.M)
+# "completed in 60.00s (1 min, 0.00 secs)" on current versions, "completed in 1 min, 0.00 secs" on older ones
+STRESS_NG_COMPLETED = re.compile(
+    r'successful run completed in (?:([\d.]+)s\b|'
+    r'(?:(\d+) days?,?\s*)?(?:(\d+) hours?,?\s*)?(?:(\d+) mins?,?\s*)?([\d.]+) secs?)')
+STRESS_NG_COLUMNS = [
+    ('bogo_ops', 'ops'),
+    ('real_time', 's'),
+    ('usr_time', 's'),
+    ('sys_time', 's'),
+    ('bogo_ops_per_sec_real', 'ops/sec'),
+    ('bogo_ops_per_sec_cpu', 'ops/sec'),
+]
+
+
+def sniff_stress_ng(head):
+    return 'stress-ng:' in head
+
+
+def parse_stress_ng(text):
+    """The --metrics-brief table, one set of records per stressor, and the run time"""
+    records = []
+    for match in STRESS_NG_ROW.finditer(text):
+        stressor = match.group(1)
+        for (metric, unit), value in zip(STRESS_NG_COLUMNS, match.groups()[1:]):
+            records.append(ToolRecord('stress-ng', stressor, metric, float(value), unit))
+
+    stressors = {r.test for r in records} or {'run'}
+    test = stressors.pop() if len(stressors) == 1 else 'run'
+    for match in STRESS_NG_COMPLETED.finditer(text):
+        total, days, hours, mins, secs = match.groups()
+        if total is not None:
+            seconds = float(total)
+        else:
+            seconds = ((int(days or 0) * 24 + int(hours or 0)) * 60 + int(mins or 0)) * 60 + float(secs)
+        records.append(ToolRecord('stress-ng', test, 'completion_time', seconds, 's'))
+    return records
+
+
+# ----- iperf -----
+
+# "[  3]  0.0-10.0 sec  1.05 GBytes  903 Mbits/sec" with, for UDP,
+# "  0.089 ms    0/  893 (0%)" after it; iperf3 appends retransmits and sender/receiver
+IPERF_LINE = re.compile(
+    r'^\[\s*(?:\d+|SUM)\]\s+([\d.]+)\s*-\s*([\d.]+)\s+sec\s+[\d.]+\s+\w?Bytes\s+([\d.]+)\s+(\w?)bits/sec'
+    r'(?:\s+([\d.]+)\s+ms\s+(\d+)\s*/\s*(\d+)\s+\(([\d.e+-]+)%\))?(.*)$', re.M)
+IPERF_SCALE = {'': 1e-6, 'K': 1e-3, 'M': 1.0, 'G': 1e3}
+IPERF_BANNER = re.compile(r'Client connecting to|Server listening on|Connecting to host')
+
+
+def sniff_iperf(head):
+    if IPERF_BANNER.search(head) and 'bits/sec' in head:
+        return True
+    return bool(IPERF_LINE.search(head))
+
+
+def parse_iperf(text):
+    """Whole-run bandwidth, and for UDP jitter and loss, of an iperf or iperf3 log
+
+    The summary is the line covering the longest interval from 0; iperf3's
+    receiver line wins over its sender line.
+    """
+    best = None
+    for match in IPERF_LINE.finditer(text):
+        start, end = float(match.group(1)), float(match.group(2))
+        if start != 0:
+            continue
+        rank = (end, match.group(5) is not None, 'receiver' in match.group(9))
+        if best is None or rank >= best[0]:
+            best = (rank, match)
+    if best is None:
+        return []
+
+    match = best[1]
+    udp = match.group(5) is not None or 'UDP' in text
+    test = 'udp' if udp else 'tcp'
+    records = [ToolRecord('iperf', test, 'bandwidth', float(match.group(3)) * IPERF_SCALE[match.group(4)], 'Mbits/sec'),
+               ToolRecord('iperf', test, 'duration', float(match.group(2)), 's')]
+    if match.group(5) is not None:
+        records += [ToolRecord('iperf', test, 'jitter', float(match.group(5)), 'ms'),
+                    ToolRecord('iperf', test, 'lost_datagrams', float(match.group(6)), 'datagrams'),
+                    ToolRecord('iperf', test, 'loss', float(match.group(8)), '%')]
+    return records
+
+
+register_parser('sysbench', sniff_sysbench, parse_sysbench)
+register_parser('stress-ng', sniff_stress_ng, parse_stress_ng)
+register_parser('iperf', sniff_iperf, parse_iperf)
+
+
+# ----- files -----
+
+def infer_platform(path):
+    """Platform from a result file name such as vm_iperf_results.txt
+
+    Falls back to the enclosing directory, e.g. results/container/run1.txt,
+    and returns '' when neither is a known prefix.
+    """
+    prefix = os.path.basename(path).split('_', 1)[0].lower()
+    if prefix in PLATFORM_PREFIXES:
+        return PLATFORM_PREFIXES[prefix]
+    parent = os.path.basename(os.path.dirname(os.path.abspath(path))).lower()
+    return PLATFORM_PREFIXES.get(parent, '')
+
+
+def parse_file(path):
+    """Sniff and parse one log; returns (tool, records), tool None if unrecognised"""
+    with open(path, 'r', errors='replace') as f:
+        head = f.read(SNIFF_BYTES)
+        tool = sniff(head)
+        if tool is None:
+            return None, []
+        text = head + f.read()
+    parse = next(p for name, _, p in PARSERS if name == tool)
+    return tool, parse(text)
+
+
+def expand_paths(paths):
+    """Files given directly plus the *.txt files of any directories"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files += sorted(os.path.join(path, n) for n in os.listdir(path) if n.endswith('.txt'))
+        else:
+            files.append(path)
+    return files
+
+
+def load_results(paths):
+    """Mean of every metric by platform: {platform: {'tool_test_metric': value}}
+
+    Every .txt file is sniffed, so logs of other tools are simply skipped.
+    Logs whose platform cannot be inferred are skipped too, and listed on
+    stderr. Repeated values (e.g. one report per MPI rank) are averaged.
+    """
+    if isinstance(paths, str):
+        paths = [paths]
+    sums = {}
+    unrecognised = []
+    for path in expand_paths(paths):
+        tool, records = parse_file(path)
+        if tool is None:
+            continue
+        if not infer_platform(path):
+            unrecognised.append(path)
+            continue
+        platform = sums.setdefault(infer_platform(path), {})
+        for r in records:
+            total = platform.setdefault(f'{r.tool}_{r.test}_{r.metric}', [0.0, 0])
+            total[0] += r.value
+            total[1] += 1
+    report_unrecognised(unrecognised)
+    return {platform: {metric: s / n for metric, (s, n) in metrics.items()}
+            for platform, metrics in sums.items()}
+
+
+def report_unrecognised(paths):
+    """Say which logs were left out for want of a platform, as bulk_ingest does"""
+    if paths:
+        print(f"Skipped {len(paths)} files with no known platform prefix "
+              f"({', '.join(sorted(PLATFORM_PREFIXES))}): " + ', '.join(paths), file=sys.stderr)
+
+
+def platform_pair(results, *metrics, platforms=('VM', 'Container')):
+    """Values of the first metric every platform has, e.g. [vm, container], else None"""
+    for metric in metrics:
+        values = [results.get(p, {}).get(metric) for p in platforms]
+        if all(v is not None for v in values):
+            return values
+    return None
+
+
+def store_rows(path, records, host=''):
+    """ResultsStore rows for a log's records, stamped with the file's mtime"""
+    timestamp = os.path.getmtime(path)
+    platform = infer_platform(path)
+    return [{'platform': platform, 'host': host, 'benchmark': r.tool, 'metric': f'{r.test}_{r.metric}',
+             'value': r.value, 'timestamp': timestamp} for r in records]
+
+
+def main():
+    args = sys.argv[1:]
+    store = None
+    if '--store' in args:
+        i = args.index('--store')
+        from results_store import ResultsStore
+        store = ResultsStore(args[i + 1])
+        del args[i:i + 2]
+    if not args:
+        print("Usage: python tool_parsers.py <file|dir> [...] [--store <store_dir>]")
+        sys.exit(1)
+
+    start = time.perf_counter()
+    files = expand_paths(args)
+    batch = []
+    unrecognised = []
+    for path in files:
+        tool, records = parse_file(path)
+        if tool is None:
+            continue
+        for r in records:
+            print(f"{os.path.basename(path)}\t{r.tool}\t{r.test}\t{r.metric}\t{r.value:g} {r.unit}")
+        if store is not None:
+            if infer_platform(path):
+                batch += store_rows(path, records)
+            else:
+                unrecognised.append(path)
+    if store is not None:
+        # One segment for the whole batch rather than one per file
+        store.append(batch)
+        report_unrecognised(unrecognised)
+    print(f"Parsed {len(files)} files in {time.perf_counter() - start:.2f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -11,8 +11,15 @@ echo "Running benchmarks in simulated container environment with ${CPU_CORES} CP
 # Create results directory
 mkdir -p /home/ubuntu/cloud_performance_test/container_results
 
-# Set CPU and memory constraints using cgroups simulation
-echo "Setting resource constraints to simulate container environment..."
+# Set CPU, memory and I/O constraints: re-run this script inside a cgroup v2
+# slice with the limits of container_config.conf, which is removed afterwards.
+# NO_CGROUP=1 runs unconstrained, as on hosts without cgroup v2.
+if [ -z "$CLOUDPERF_CGROUP" ] && [ -z "$NO_CGROUP" ]; then
+    echo "Setting resource constraints to simulate container environment..."
+    exec python3 /home/ubuntu/cloud_performance_test/analysis/cgroup_env.py run --verify \
+        --stats /home/ubuntu/cloud_performance_test/container_results/cgroup_stats.json --io-path /home/ubuntu/cloud_performance_test/container_results \
+        /home/ubuntu/cloud_performance_test/simulated_container/etc/container_config.conf -- bash "$0" "$@"
+fi
 echo "CPU: ${CPU_CORES} cores"
 echo "Memory: ${MEMORY_SIZE}MB"
 
@@ -56,6 +63,14 @@ HPL.out     output file name (if any)
 8           memory alignment in double (> 0)
 EOL
 
+# With TUNE_HPL=1, replace the fixed parameters above with tuned ones;
+# both ranks share this environment's ${MEMORY_SIZE}MB
+if [ -n "$TUNE_HPL" ]; then
+    python3 /home/ubuntu/cloud_performance_test/analysis/hpl_tuner.py --ranks 2 \
+        --mem-per-rank $((MEMORY_SIZE / 2)) --output HPL.dat \
+        --log /home/ubuntu/cloud_performance_test/container_results/hpl_tuning_log.csv
+fi
+
 # Run HPL with 2 processes (simulating 2 CPU cores)
 mpirun -np 2 ./xhpl > /home/ubuntu/cloud_performance_test/container_results/hpl_results.txt
 
@@ -65,21 +80,18 @@ stress-ng --cpu ${CPU_CORES} --timeout 60s --metrics-brief > /home/ubuntu/cloud_
 
 # Run sysbench memory test
 echo "Running sysbench memory test..."
-sysbench memory run > /home/ubuntu/cloud_performance_test/container_results/sysbench_memory_results.txt
+sysbench memory --histogram run > /home/ubuntu/cloud_performance_test/container_results/sysbench_memory_results.txt
 
 # Run IOZone disk I/O test
 echo "Running IOZone disk I/O test..."
 cd /home/ubuntu/cloud_performance_test/container_results
 iozone -a -s 1G -r 4k -i 0 -i 1 > iozone_results.txt
 
-# Run iperf network test (simulated)
+# Run the iperf3 network matrix (TCP and UDP, 1-8 streams) over the
+# ${NETWORK_TOPOLOGY} topology, built from network namespaces on this host
 echo "Running iperf network test..."
-echo "Simulated network test for container environment" > /home/ubuntu/cloud_performance_test/container_results/iperf_results.txt
-echo "Network Type: ${NETWORK_TYPE}" >> /home/ubuntu/cloud_performance_test/container_results/iperf_results.txt
-echo "Network Speed: ${NETWORK_SPEED}" >> /home/ubuntu/cloud_performance_test/container_results/iperf_results.txt
-echo "Simulated Results:" >> /home/ubuntu/cloud_performance_test/container_results/iperf_results.txt
-echo "Bandwidth: 980 Mbits/sec" >> /home/ubuntu/cloud_performance_test/container_results/iperf_results.txt
-echo "Jitter: 0.052 ms" >> /home/ubuntu/cloud_performance_test/container_results/iperf_results.txt
-echo "Lost/Total Datagrams: 0/1240" >> /home/ubuntu/cloud_performance_test/container_results/iperf_results.txt
+python3 /home/ubuntu/cloud_performance_test/analysis/net_matrix.py --topology "${NETWORK_TOPOLOGY}" \
+    --jobs ${CPU_CORES} --log-dir /home/ubuntu/cloud_performance_test/container_results/iperf_matrix --csv /home/ubuntu/cloud_performance_test/container_results/iperf_matrix.csv \
+    > /home/ubuntu/cloud_performance_test/container_results/iperf_results.txt
 
 echo "All container benchmarks completed. Results saved in /home/ubuntu/cloud_performance_test/container_results/"
@@ -58,10 +58,26 @@ Node01 slots=1
 Node02 slots=1
 EOF
 
+# ===== Optionally tune the HPL parameters =====
+
+# With TUNE_HPL=1, search N, NB, P x Q, PFACT, BCAST and DEPTH with short
+# runs and replace the fixed values above with the best ones found. Each
+# rank runs on its own node, so a rank gets a whole node's memory.
+if [ -n "$TUNE_HPL" ]; then
+    echo "Tuning HPL parameters..."
+    cd /shared
+    python3 /home/ubuntu/cloud_performance_test/analysis/hpl_tuner.py --ranks 2 --hpcc \
+        --mem-per-rank $(awk '/MemAvailable/ {print int($2 / 1024)}' /proc/meminfo) \
+        --xhpl "mpirun -np 2 -hostfile hosts hpcc" --input-name hpccinf.txt --result-file hpccoutf.txt \
+        --output /shared/hpccinf.txt --log /shared/results/hpl_tuning_log.csv
+fi
+
 # ===== Run HPCC on VMs =====
 
 echo "Running HPCC test on VMs..."
 cd /shared
+# The CPU model, clock and SIMD flags give the theoretical peak (see roofline.py)
+cat /proc/cpuinfo > /shared/results/vm_cpuinfo.txt
 mpirun -np 2 -hostfile hosts hpcc | tee /shared/results/vm_hpcc_results.txt
 
 # Check if hpccoutf.txt was created
@@ -73,6 +89,7 @@ fi
 # ===== Run HPCC on Containers =====
 
 echo "Running HPCC test on containers..."
+docker exec Master cat /proc/cpuinfo > /shared/results/container_cpuinfo.txt
 docker exec Master bash -c "cd /shared && mpirun -np 2 -hostfile hosts hpcc" | tee /shared/results/container_hpcc_results.txt
 
 # Check if hpccoutf.txt was created in the container
@@ -123,12 +140,20 @@ grep -A 2 "FFT" /shared/results/container_hpcc_results.txt | tail -n 1 | awk '{p
 # ===== Generate detailed analysis =====
 
 echo "Generating detailed HPCC analysis..."
-python3 /home/ubuntu/cloud_performance_test/analysis/analyze_hpcc.py /shared/results/vm_hpcc_results.txt /shared/results/container_hpcc_results.txt
+# Prefer hpccoutf.txt, which carries the full summary section
+VM_HPCC=/shared/results/vm_hpccoutf.txt
+CONTAINER_HPCC=/shared/results/container_hpccoutf.txt
+[ -f "$VM_HPCC" ] || VM_HPCC=/shared/results/vm_hpcc_results.txt
+[ -f "$CONTAINER_HPCC" ] || CONTAINER_HPCC=/shared/results/container_hpcc_results.txt
+python3 /home/ubuntu/cloud_performance_test/analysis/cloudperf.py report "$VM_HPCC" "$CONTAINER_HPCC" --store /shared/results/store --cache /shared/results/.cache --baselines /shared/results/regression_baselines.json \
+    --cpuinfo /shared/results/vm_cpuinfo.txt,/shared/results/container_cpuinfo.txt
 
 # Move generated files to results directory
 mv hpcc_comparison.csv /shared/results/
 mv hpcc_comparison.png /shared/results/
-mv hpcc_comparison.html /shared/results/
+mv hpcc_roofline.csv hpcc_roofline.png /shared/results/ 2>/dev/null
+mv hpcc_comparison*.html /shared/results/
+mv hpcc_regressions.json /shared/results/
 
 echo "HPC testing completed. Results are available in /shared/results/"
 echo "Summary: /shared/results/hpcc_summary.txt"